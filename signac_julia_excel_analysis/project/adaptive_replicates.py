@@ -0,0 +1,94 @@
+"""Adaptive replicate scheduling of the replicate groups"""
+# adaptive_replicates.py
+#
+# Instead of running the same number of replicates for every Excel file,
+# every replicate group starts with the initial replicates from 'init.py'
+# ('replicate_number'), and after part_2 only the groups whose standard error
+# of the mean is above the target get more replicates (a batch at a time),
+# up to a maximum number of replicates per group.  So the stable groups stop
+# early, and the compute is spent on the noisy groups.
+#
+# The standard error of a group is its std. dev. (ddof=1) / sqrt(replicates),
+# and it is compared relative to the group's mean (|std. error / mean|),
+# so the same target can be used for Excel files with different magnitudes.
+#
+# The 'python project.py adaptive-replicates' command checks the groups and
+# creates the new replicate jobs (see the project.py file).
+
+import collections
+import math
+
+import replicate_summary
+
+GroupPlan = collections.namedtuple(
+    "GroupPlan",
+    ["group_key", "status", "replicates", "mean", "relative_std_error", "new_replicate_list"],
+)
+
+
+def relative_std_error(value_list):
+    """Get the (replicates, mean, |std. error / mean|) of the replicate values.
+
+    The relative std. error is inf if there are less than 2 values, or the
+    mean is 0 and the values are not all the same.
+    """
+    count, mean, m2 = replicate_summary.welford_add(0, 0.0, 0.0, value_list)
+    if count < 2:
+        return count, mean, math.inf
+
+    std_error = replicate_summary.running_std_dev(count, m2) / math.sqrt(count)
+    if std_error == 0:
+        return count, mean, 0.0
+    if mean == 0:
+        return count, mean, math.inf
+
+    return count, mean, abs(std_error / mean)
+
+
+def plan_group(group_key, replicate_result_list, target_relative_std_error,
+               batch_replicates_int, max_replicates_int):
+    """Get the GroupPlan of a replicate group.
+
+    Parameters
+    ----------
+    replicate_result_list : list of (replicate_number_int, dot_product or None)
+        The group's replicates, where the dot_product is None if the replicate
+        is not completed yet.
+
+    Returns
+    -------
+    GroupPlan, where the status is:
+    - "pending" : Not all the replicates are completed yet.
+    - "converged" : The relative std. error is at or below the target.
+    - "capped" : The group has the max replicates, but did not converge.
+    - "added" : The 'new_replicate_list' replicate numbers need to be added.
+    """
+    if any(dot_product is None for _, dot_product in replicate_result_list):
+        return GroupPlan(group_key, "pending", len(replicate_result_list), math.nan, math.nan, [])
+
+    count, mean, group_relative_std_error = relative_std_error(
+        [dot_product for _, dot_product in replicate_result_list]
+    )
+    if group_relative_std_error <= target_relative_std_error:
+        return GroupPlan(group_key, "converged", count, mean, group_relative_std_error, [])
+    if count >= max_replicates_int:
+        return GroupPlan(group_key, "capped", count, mean, group_relative_std_error, [])
+
+    next_replicate_int = max(replicate for replicate, _ in replicate_result_list) + 1
+    new_replicate_list = list(
+        range(next_replicate_int,
+              next_replicate_int + min(batch_replicates_int, max_replicates_int - count))
+    )
+
+    return GroupPlan(group_key, "added", count, mean, group_relative_std_error, new_replicate_list)
+
+
+def jobs_saved(group_plan_list, fixed_replicates_int):
+    """Get the (adaptive jobs, fixed replicate count jobs, jobs saved) of the groups.
+
+    The adaptive jobs include the replicates being added.
+    """
+    adaptive_jobs_int = sum(p.replicates + len(p.new_replicate_list) for p in group_plan_list)
+    fixed_jobs_int = len(group_plan_list) * fixed_replicates_int
+
+    return adaptive_jobs_int, fixed_jobs_int, fixed_jobs_int - adaptive_jobs_int
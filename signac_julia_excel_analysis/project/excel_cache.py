@@ -0,0 +1,197 @@
+"""Content-addressed cache of the values read from the Excel files"""
+# excel_cache.py
+#
+# All the replicates of an Excel file need the same values, so the values
+# read from each workbook are stored once in a small '.json' file, keyed by
+# the workbook's content hash, the sheet name, and the column names.  Each
+# value keeps its own type (Example: an integer cell stays an integer), so a
+# cached value is the same as one read from the workbook.
+# If a workbook is changed, its content hash changes, so the old values are
+# never reused.  The cache is size bounded, removing the least recently used
+# entries first.
+#
+# The workbook content hashes are remembered by path, size, and mtime in a
+# small SQLite file, so an unchanged workbook is not re-hashed every time.
+# The same file keeps a running total of the entries' size, so storing an
+# entry does not list the whole cache directory; it is only listed (and the
+# total corrected) when the total is over the max size.  The SQLite file is
+# only written by one process at a time, while holding its lock (see the
+# 'sqlite_lock.py' file).
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+
+import sqlite_lock
+
+hash_index_filename = "workbook_hashes.sqlite"
+
+# The cache entry file extensions (the '.npy' entries are from the older
+# cache format, and are removed first, as they are never used)
+entry_extension_str = ".json"
+old_entry_extension_str = ".npy"
+
+# When the cache is over its max size, the least recently used entries are
+# removed until it is this fraction of the max size, so the cache directory
+# is not listed again for every new entry.
+evict_to_fraction = 0.9
+
+
+def workbook_content_hash(excel_filename):
+    """Get the sha256 hash of a workbook's content."""
+    sha256 = hashlib.sha256()
+    with open(excel_filename, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+class ExcelCache:
+    """A size bounded, least recently used cache of Excel values."""
+
+    def __init__(self, cache_directory, max_size_mb):
+        self.cache_directory = cache_directory
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.hash_index_filename = os.path.join(cache_directory, hash_index_filename)
+        self._content_hash_dict = {}
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.hash_index_filename, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS workbook_hashes ("
+            "excel_filename TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_size ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), size_bytes INTEGER)"
+        )
+        return connection
+
+    def _add_size(self, size_bytes):
+        """Add to the running total size of the entries, and get the new total.
+
+        The total starts unknown (None) for a new cache, which is treated as
+        over the max size, so the first eviction lists the cache directory.
+        """
+        with sqlite_lock.locked_connection(self.hash_index_filename, self._connect) as connection:
+            connection.execute(
+                "UPDATE cache_size SET size_bytes = size_bytes + ? WHERE id = 0", (size_bytes,)
+            )
+            row = connection.execute("SELECT size_bytes FROM cache_size WHERE id = 0").fetchone()
+
+        return None if row is None else row[0]
+
+    def _set_size(self, size_bytes):
+        with sqlite_lock.locked_connection(self.hash_index_filename, self._connect) as connection:
+            connection.execute("INSERT OR REPLACE INTO cache_size VALUES (0, ?)", (size_bytes,))
+
+    def content_hash(self, excel_filename):
+        """Get a workbook's content hash, only re-hashing it if its size or mtime changed."""
+        excel_filename = os.path.abspath(excel_filename)
+        excel_stat = os.stat(excel_filename)
+        memo_key = (excel_filename, excel_stat.st_size, excel_stat.st_mtime_ns)
+        if memo_key in self._content_hash_dict:
+            return self._content_hash_dict[memo_key]
+
+        with sqlite_lock.locked_connection(
+            self.hash_index_filename, self._connect, write_bool=False
+        ) as connection:
+            row = connection.execute(
+                "SELECT size, mtime_ns, sha256 FROM workbook_hashes WHERE excel_filename = ?",
+                (excel_filename,),
+            ).fetchone()
+        if row is not None and row[0] == excel_stat.st_size and row[1] == excel_stat.st_mtime_ns:
+            sha256 = row[2]
+        else:
+            # hash the workbook without holding the lock, so the other jobs can
+            # still use the hash index
+            sha256 = workbook_content_hash(excel_filename)
+            with sqlite_lock.locked_connection(
+                self.hash_index_filename, self._connect
+            ) as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO workbook_hashes VALUES (?, ?, ?, ?)",
+                    (excel_filename, excel_stat.st_size, excel_stat.st_mtime_ns, sha256),
+                )
+        self._content_hash_dict[memo_key] = sha256
+
+        return sha256
+
+    def entry_filename(self, excel_filename, excel_sheetname, column_name_list):
+        """Get the cache file name of a workbook's sheet and columns."""
+        key = hashlib.sha256(
+            "\t".join(
+                [self.content_hash(excel_filename), excel_sheetname] + list(column_name_list)
+            ).encode()
+        ).hexdigest()
+
+        return os.path.join(self.cache_directory, f"{key}{entry_extension_str}")
+
+    def get(self, excel_filename, excel_sheetname, column_name_list):
+        """Get the cached values dict, or None if they are not in the cache."""
+        entry_filename = self.entry_filename(excel_filename, excel_sheetname, column_name_list)
+        try:
+            with open(entry_filename, "r") as fp:
+                value_list = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(value_list, list) or len(value_list) != len(column_name_list):
+            return None
+
+        # mark the entry as recently used
+        with contextlib.suppress(OSError):
+            os.utime(entry_filename)
+
+        return dict(zip(column_name_list, value_list))
+
+    def put(self, excel_filename, excel_sheetname, column_name_list, values_dict, evict=True):
+        """Store the values dict in the cache.
+
+        If 'evict' is True, the least recently used entries are removed when
+        the cache is over its max size (use False, and call 'evict' once,
+        when storing many entries).
+        """
+        entry_filename = self.entry_filename(excel_filename, excel_sheetname, column_name_list)
+        try:
+            replaced_size_bytes = os.stat(entry_filename).st_size
+        except FileNotFoundError:
+            replaced_size_bytes = 0
+        tmp_filename = f"{entry_filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w") as fp:
+            json.dump([values_dict[c] for c in column_name_list], fp)
+        entry_size_bytes = os.stat(tmp_filename).st_size
+        os.replace(tmp_filename, entry_filename)
+
+        total_size_bytes = self._add_size(entry_size_bytes - replaced_size_bytes)
+        if evict and (total_size_bytes is None or total_size_bytes > self.max_size_bytes):
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries if the cache is over its max size.
+
+        This lists the whole cache directory, and corrects the running total size.
+        """
+        entry_list = []
+        total_size_bytes = 0
+        with os.scandir(self.cache_directory) as it:
+            for entry in it:
+                if entry.name.endswith(old_entry_extension_str):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(entry.path)
+                elif entry.name.endswith(entry_extension_str):
+                    entry_stat = entry.stat()
+                    entry_list.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry.path))
+                    total_size_bytes += entry_stat.st_size
+
+        if total_size_bytes > self.max_size_bytes:
+            for _, entry_size_bytes, entry_path in sorted(entry_list):
+                if total_size_bytes <= self.max_size_bytes * evict_to_fraction:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(entry_path)
+                total_size_bytes -= entry_size_bytes
+        self._set_size(total_size_bytes)
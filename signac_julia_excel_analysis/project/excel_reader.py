@@ -0,0 +1,168 @@
+"""Fast Excel reader for the part_1 initial parameters"""
+# excel_reader.py
+#
+# Part_1 only needs the first data row (Excel row 2) of the value_0 to
+# value_3 columns, so instead of parsing the whole sheet with
+# 'pd.read_excel', the workbooks are streamed with openpyxl's read-only
+# reader, which stops after the header row and the first data row.
+# Many workbooks can be read at the same time with a process pool.
+#
+# For the full-sheet (all rows) part_2 mode, all the data rows are streamed
+# in fixed size chunks, so the memory used is the same for any sheet length.
+
+import concurrent.futures
+import resource
+import time
+
+import numpy as np
+import openpyxl
+
+# The Excel columns used by part_1 and the 'src/julia/matrix.jl' file.
+value_column_name_list = ["value_0", "value_1", "value_2", "value_3"]
+
+
+def read_first_row_values(excel_filename, excel_sheetname, column_name_list=value_column_name_list):
+    """Read the first data row values of the given columns.
+
+    This gives the same values as 'list(pd.read_excel(...).loc[:, column])[0]',
+    but only the header row and the first data row are read.
+    """
+    workbook = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
+    try:
+        row_iter = workbook[excel_sheetname].iter_rows(min_row=1, max_row=2, values_only=True)
+        header_row = next(row_iter, ())
+        first_data_row = next(row_iter, ())
+    finally:
+        workbook.close()
+
+    header_list = list(header_row)
+    values_dict = {}
+    for column_name in column_name_list:
+        if column_name not in header_list:
+            raise ValueError(
+                f"ERROR: The '{column_name}' column is not in the {excel_filename} file."
+            )
+        column_index = header_list.index(column_name)
+        if column_index >= len(first_data_row) or first_data_row[column_index] is None:
+            raise ValueError(
+                f"ERROR: The '{column_name}' column has no data in the {excel_filename} file."
+            )
+        values_dict[column_name] = first_data_row[column_index]
+
+    return values_dict
+
+
+def read_first_row_values_cached(excel_filename, excel_sheetname, excel_cache=None):
+    """Read the first data row values, using the Excel cache if one is given."""
+    if excel_cache is None:
+        return read_first_row_values(excel_filename, excel_sheetname)
+
+    values_dict = excel_cache.get(excel_filename, excel_sheetname, value_column_name_list)
+    if values_dict is None:
+        values_dict = read_first_row_values(excel_filename, excel_sheetname)
+        excel_cache.put(excel_filename, excel_sheetname, value_column_name_list, values_dict)
+
+    return values_dict
+
+
+def iter_value_chunks(
+    excel_filename, excel_sheetname, chunk_rows=10000, column_name_list=value_column_name_list
+):
+    """Stream all the data rows of the given columns in chunks.
+
+    Yields float arrays of shape (up to 'chunk_rows', number of columns), so
+    the memory used does not depend on the number of rows in the sheet.
+    """
+    workbook = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
+    try:
+        row_iter = workbook[excel_sheetname].iter_rows(min_row=1, values_only=True)
+        header_list = list(next(row_iter, ()))
+        for column_name in column_name_list:
+            if column_name not in header_list:
+                raise ValueError(
+                    f"ERROR: The '{column_name}' column is not in the {excel_filename} file."
+                )
+        column_index_list = [header_list.index(c) for c in column_name_list]
+
+        chunk_list = []
+        for row in row_iter:
+            values = [row[i] if i < len(row) else None for i in column_index_list]
+            # skip the empty rows, like 'XLSX.eachrow' in the 'matrix.jl' file
+            if all(v is None for v in values):
+                continue
+            chunk_list.append(values)
+            if len(chunk_list) == chunk_rows:
+                yield np.array(chunk_list, dtype=float)
+                chunk_list = []
+        if chunk_list:
+            yield np.array(chunk_list, dtype=float)
+    finally:
+        workbook.close()
+
+
+def peak_rss_mb():
+    """Get the peak resident memory (RSS) of this process plus its largest child process in MB."""
+    # 'ru_maxrss' is in kB on Linux
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ) / 1024
+
+
+def read_workbooks(excel_filename_list, excel_sheetname, processes=1, excel_cache=None):
+    """Read the first data row values of many workbooks, using a process pool.
+
+    Every workbook is only read once, even if it is in the list many times
+    (i.e., for all the replicates), and only the workbooks that are not in the
+    Excel cache (if one is given) are read.  Returns a dict of
+    {excel_filename: values_dict} and prints the files/sec and peak RSS.
+    """
+    start_time = time.time()
+
+    values_by_filename_dict = {}
+    unique_excel_filename_list = []
+    for excel_filename in sorted(set(excel_filename_list)):
+        values_dict = None
+        if excel_cache is not None:
+            values_dict = excel_cache.get(excel_filename, excel_sheetname, value_column_name_list)
+        if values_dict is None:
+            unique_excel_filename_list.append(excel_filename)
+        else:
+            values_by_filename_dict[excel_filename] = values_dict
+    cache_hits = len(values_by_filename_dict)
+
+    if processes > 1 and len(unique_excel_filename_list) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            values_dict_list = list(
+                executor.map(
+                    read_first_row_values,
+                    unique_excel_filename_list,
+                    [excel_sheetname] * len(unique_excel_filename_list),
+                    chunksize=max(1, len(unique_excel_filename_list) // (processes * 4)),
+                )
+            )
+    else:
+        values_dict_list = [
+            read_first_row_values(excel_filename, excel_sheetname)
+            for excel_filename in unique_excel_filename_list
+        ]
+
+    for excel_filename, values_dict in zip(unique_excel_filename_list, values_dict_list):
+        values_by_filename_dict[excel_filename] = values_dict
+        if excel_cache is not None:
+            excel_cache.put(
+                excel_filename, excel_sheetname, value_column_name_list, values_dict, evict=False
+            )
+    if excel_cache is not None:
+        excel_cache.evict()
+
+    run_time_s = max(time.time() - start_time, 1e-9)
+
+    print('*********************************************')
+    print(f'Read {len(unique_excel_filename_list)} Excel files with {processes} processes '
+          f'({cache_hits} more from the Excel cache)')
+    print(f'files/sec = {len(values_by_filename_dict) / run_time_s:.1f}')
+    print(f'peak RSS = {peak_rss_mb():.1f} MB')
+    print('*********************************************')
+
+    return values_by_filename_dict
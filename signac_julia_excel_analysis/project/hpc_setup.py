@@ -1,12 +1,92 @@
 """Setup the HPC and custom template location"""
 # hpc_setup.py
 
-from flow.environment import DefaultSlurmEnvironment
+import math
 
-class Phoenix(DefaultSlurmEnvironment):  
+from flow.environment import DefaultSlurmEnvironment, template_filter
+
+
+def operation_footprint(operation_directives):
+    """Get the (cores, memory in GB, walltime in hours) of a single operation."""
+    cores = operation_directives["np"] * operation_directives["cpus-per-task"]
+    mem_gb = cores * operation_directives["mem-per-cpu"]
+    walltime = operation_directives["walltime"]
+    walltime_hr = walltime.total_seconds() / 3600 if hasattr(walltime, "total_seconds") else walltime
+
+    return cores, mem_gb, walltime_hr
+
+
+def jobs_per_node(operation_directives, cores_per_node, mem_per_node_gb):
+    """Get the number of operations that fit on a node at the same time."""
+    cores, mem_gb, _ = operation_footprint(operation_directives)
+
+    return max(1, min(cores_per_node // cores, int(mem_per_node_gb // mem_gb)))
+
+
+def packed_bundle_size(operation_directives, cores_per_node, mem_per_node_gb, max_walltime_hr):
+    """Get the bundle size that fills a node for the max walltime.
+
+    This is the number of operations that fit on the node at the same time,
+    times the number of back-to-back waves of them that fit in the max walltime.
+    """
+    _, _, walltime_hr = operation_footprint(operation_directives)
+    waves = max(1, math.floor(max_walltime_hr / walltime_hr))
+
+    return jobs_per_node(operation_directives, cores_per_node, mem_per_node_gb) * waves
+
+
+class Phoenix(DefaultSlurmEnvironment):
     """Subclass of DefaultSlurmEnvironment for GT Phoenix HPC."""
-    
+
     # Find the hostname by loggin in the HPC and using the 'hostname' command.
     # In this case 'hostname' produced 'login-phoenix-rh9--2.pace.gatech.edu'.
     hostname_pattern = r"login-phoenix-rh9-.\.pace\.gatech\.edu"
     template = "phoenix.sh"
+
+    # Node packing: when submitting with '--bundle N --parallel', the bundled
+    # jobs are packed onto a single node, running as many at the same time as
+    # fit in the node's cores and memory (each in its own 'srun' step), and
+    # the rest are run as soon as a running job finishes.
+    # Get the recommended bundle sizes with 'python project.py node-packing-report'.
+    node_packing_bool = True
+    cores_per_node = 24
+    mem_per_node_gb = 192
+    max_walltime_hr = 12
+
+    # Retries of the packed jobs: a failed job's srun step is retried up to
+    # 'bundle_retries_int' times, waiting 'bundle_retry_backoff_s' seconds
+    # before the first retry, and twice as long before each next retry, so a
+    # transient failure (Example: a filesystem hiccup) does not need a resubmit.
+    # The job still needs to finish in the bundle's walltime.
+    bundle_retries_int = 2
+    bundle_retry_backoff_s = 30
+
+    @template_filter
+    def node_packing_plan(cls, operations, parallel):
+        """Get the node packing plan of the bundled operations for the template."""
+        if not (cls.node_packing_bool and parallel):
+            return {"enabled": False}
+
+        footprint_list = [operation_footprint(op.directives) for op in operations]
+        max_directives = {
+            "np": max(op.directives["np"] for op in operations),
+            "cpus-per-task": max(op.directives["cpus-per-task"] for op in operations),
+            "mem-per-cpu": max(op.directives["mem-per-cpu"] for op in operations),
+            "walltime": max(f[2] for f in footprint_list),
+        }
+        slots = min(
+            len(operations), jobs_per_node(max_directives, cls.cores_per_node, cls.mem_per_node_gb)
+        )
+        waves = math.ceil(len(operations) / slots)
+
+        return {
+            "enabled": True,
+            "slots": slots,
+            "ntasks": slots * max_directives["np"],
+            "np": max_directives["np"],
+            "cpus_per_task": max_directives["cpus-per-task"],
+            "mem_per_cpu": max_directives["mem-per-cpu"],
+            "walltime_hr": waves * max_directives["walltime"],
+            "retries": cls.bundle_retries_int,
+            "retry_backoff_s": cls.bundle_retry_backoff_s,
+        }
@@ -1,9 +1,15 @@
 """Initialize signac statepoints."""
 
 import os
+import shutil
 import numpy as np
 import signac
 
+import parameter_sweep
+import results_store
+import workbook_manifest
+import workspace_shards
+
 # *******************************************
 # ENTER THE MAIN USER STATEPOINTS (START)
 # *******************************************
@@ -49,8 +55,60 @@ print(f'excel_filename_wo_ext_list = {excel_filename_wo_ext_list}')
 # This adds scalar noise to the data for each replicate with 
 # random values between 0.1 to 1.
 # replicate_number = [0, 1, 2, 3, 4]
+# NOTE: With 'python project.py adaptive-replicates', these are only the 
+# initial replicates of every Excel file, and more replicates are only
+# added to the Excel files whose std. error is above the target
+# (see the 'adaptive_...' variables in the project.py file).
 replicate_number = [0, 1]
 
+# Enter the multiplier vectors ('mult_vector_list') and noise ranges 
+# ('noise_range_list') of the dot product calculations, where every Excel file,
+# replicate number, multiplier vector, and noise range combination is a job.
+# The noise of a replicate is a random value from min/10 to max/10 of its
+# [min, max] noise range.  Each multiplier vector and noise range is a separate 
+# replicate group in part_3.
+# NOTE: The default values ([9, 8, 7, 6] and [1, 10]) are not added to the 
+# statepoint, so the jobs of a project started before these statepoints 
+# are not changed.
+# mult_vector_list = [[9, 8, 7, 6], [1, 2, 3, 4]]
+# noise_range_list = [[1, 10], [5, 10]]
+mult_vector_list = [[9, 8, 7, 6]]
+noise_range_list = [[1, 10]]
+
+# Enter the dense parameter sweeps ('parameter_sweep_list'), which sweep 
+# thousands of multiplier vectors per Excel file without creating a job per 
+# combination.  Each sweep is a single job per Excel file, which calculates all 
+# the (multiplier vector x noise range x replicate) dot products in one 
+# vectorized pass, and writes them to a single table file 
+# (see the 'parameter_sweep.py' file).
+# NOTE: Set 'mult_vector_list = []' to only run the parameter sweeps.
+# parameter_sweep_list = [
+#     {
+#         "name": "grid_1_to_9",
+#         # [start, stop, number of values] of each multiplier vector value
+#         "mult_vector_grid": [[1, 9, 9], [1, 9, 9], [1, 9, 9], [1, 9, 9]],
+#         "noise_range_list": [[1, 10], [5, 10]],
+#         "replicates_int": 10,
+#     },
+# ]
+parameter_sweep_list = []
+
+# Select the init mode:
+# - "full" : Opens and initializes the jobs of every Excel file 
+#            and replicate number, every time.
+# - "incremental" : Compares the Excel files with the manifest of the
+#                   last init ('workbook_manifest.json'), and only creates
+#                   the jobs of the new Excel files, the changed Excel files
+#                   (a changed file's old jobs are kept, but their output
+#                   files and job document are removed, so they are rerun),
+#                   and the new replicate numbers, creating only the jobs
+#                   that are not in the workspace yet.  Only the replicate
+#                   groups of these Excel files become dirty, so only they
+#                   are recalculated in part_3.
+#                   NOTE: The Excel files are always looked up automatically 
+#                   from the 'excel_directory' in this mode.
+init_mode_str = "full"
+
 
 # *******************************************
 # ENTER THE MAIN USER STATEPOINTS (END)
@@ -62,21 +120,138 @@ pr_root = os.getcwd()
 pr = signac.get_project(pr_root)
 
 
+for parameter_sweep_dict in parameter_sweep_list:
+    parameter_sweep.check_parameter_sweep(parameter_sweep_dict)
+
+
+# Reset a job, removing its output files and job document, but keeping the
+# job (its directory and statepoint), so it is rerun from part_1
+def reset_job_outputs(job):
+    for filename in os.listdir(job.path):
+        if filename == "signac_statepoint.json":
+            continue
+        file_path = os.path.join(job.path, filename)
+        if os.path.isdir(file_path) and not os.path.islink(file_path):
+            shutil.rmtree(file_path)
+        else:
+            os.remove(file_path)
+
+
+# Get the statepoints of an Excel file's replicates, multiplier vectors, 
+# and noise ranges, and its parameter sweeps
+def excel_file_statepoints(excel_filename_wo_ext_i):
+    statepoint_list = []
+    for replicate_i in replicate_number:
+        for mult_vector_i in mult_vector_list:
+            for noise_range_i in noise_range_list:
+                statepoint = {
+                    "excel_filename_wo_ext": excel_filename_wo_ext_i,
+                    "replicate_number_int": replicate_i,
+                }
+                if list(mult_vector_i) != parameter_sweep.default_mult_vector:
+                    statepoint["mult_vector"] = list(mult_vector_i)
+                if list(noise_range_i) != parameter_sweep.default_noise_range:
+                    statepoint["noise_range"] = list(noise_range_i)
+
+                statepoint_list.append(statepoint)
+
+    for parameter_sweep_dict in parameter_sweep_list:
+        statepoint_list.append(
+            {
+                "excel_filename_wo_ext": excel_filename_wo_ext_i,
+                "parameter_sweep": parameter_sweep_dict,
+            }
+        )
+
+    return statepoint_list
+
+
+# The multiplier vector, noise range, and parameter sweep statepoints, which 
+# are checked by the incremental mode (None if they are only the default values)
+if (
+    mult_vector_list == [parameter_sweep.default_mult_vector]
+    and noise_range_list == [parameter_sweep.default_noise_range]
+    and len(parameter_sweep_list) == 0
+):
+    statepoint_sweep_dict = None
+else:
+    statepoint_sweep_dict = {
+        "mult_vector_list": mult_vector_list,
+        "noise_range_list": noise_range_list,
+        "parameter_sweep_list": parameter_sweep_list,
+    }
+
 # Set all the statepoints, which will be used to create separate 
 #folders for each combination of state points.
 all_statepoints = list()
 
-for excel_filename_wo_ext_i in excel_filename_wo_ext_list:
-    for replicate_i in replicate_number:
-        statepoint = {
-            "excel_filename_wo_ext": excel_filename_wo_ext_i,
-            "replicate_number_int": replicate_i,
-        }
+if init_mode_str == "full":
+    for excel_filename_wo_ext_i in excel_filename_wo_ext_list:
+        all_statepoints.extend(excel_file_statepoints(excel_filename_wo_ext_i))
+
+elif init_mode_str == "incremental":
+    manifest_dict = workbook_manifest.load_manifest(pr_root)
+    new_dict, changed_dict, unchanged_list, removed_list = \
+        workbook_manifest.diff_workbooks(
+            excel_directory, manifest_dict, replicate_number,
+            statepoint_sweep_dict=statepoint_sweep_dict,
+        )
+
+    print('*********************************************')
+    print(f'new Excel files = {len(new_dict)}')
+    print(f'changed Excel files = {len(changed_dict)}')
+    print(f'unchanged Excel files = {len(unchanged_list)}')
+    print(f'removed Excel files (their jobs are kept) = {len(removed_list)}')
+    print('*********************************************')
+
+    reset_job_list = []
+    for excel_filename_wo_ext_i, entry_dict in {**new_dict, **changed_dict}.items():
+        old_entry_dict = manifest_dict.get(excel_filename_wo_ext_i)
+        all_statepoints.extend(excel_file_statepoints(excel_filename_wo_ext_i))
+
+        # reset the old jobs of a changed Excel file (including any adaptive
+        # replicates), so they are rerun
+        if old_entry_dict is not None and old_entry_dict["sha256"] != entry_dict["sha256"]:
+            reset_job_list.extend(pr.find_jobs({"excel_filename_wo_ext": excel_filename_wo_ext_i}))
 
-        all_statepoints.append(statepoint)
+    for job in reset_job_list:
+        print(f'resetting the outputs of job {job.id} ({job.sp.excel_filename_wo_ext} changed)')
+        reset_job_outputs(job)
+
+    # forget the reset jobs' stored results in one pass over the store and shards
+    if reset_job_list:
+        reset_job_id_list = [job.id for job in reset_job_list]
+        results_store.forget(pr_root, reset_job_id_list)
+        workspace_shards.forget(pr_root, reset_job_id_list)
+    print(f'reset jobs = {len(reset_job_list)}')
+
+else:
+    raise ValueError("ERROR: The 'init_mode_str' must be 'full' or 'incremental'.")
 
 # Initiate all statepoint createing the jobs/folders.
-for sp in all_statepoints:
-    pr.open_job(
-        statepoint=sp,
-    ).init()
+if init_mode_str == "full":
+    for sp in all_statepoints:
+        pr.open_job(
+            statepoint=sp,
+        ).init()
+
+    print(f'jobs initialized = {len(all_statepoints)}')
+
+else:
+    # create the new jobs in bulk: the workspace is listed once, and only the 
+    # jobs that are not in it yet are initialized (the job ids are only hashed)
+    existing_job_id_set = set(os.listdir(pr.workspace)) if os.path.isdir(pr.workspace) else set()
+    new_job_list = [
+        job for job in (pr.open_job(statepoint=sp) for sp in all_statepoints)
+        if job.id not in existing_job_id_set
+    ]
+    for job in new_job_list:
+        job.init()
+
+    print(f'jobs initialized = {len(new_job_list)} (already in the workspace = '
+          f'{len(all_statepoints) - len(new_job_list)})')
+
+if init_mode_str == "incremental":
+    manifest_dict.update(new_dict)
+    manifest_dict.update(changed_dict)
+    workbook_manifest.save_manifest(pr_root, manifest_dict)
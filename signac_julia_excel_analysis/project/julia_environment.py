@@ -0,0 +1,223 @@
+"""Pinned Julia environment and precompiled sysimage for the part_2 calculations"""
+# julia_environment.py
+#
+# By default, every 'julia --load matrix.jl' process installs the XLSX package
+# (if it is not installed yet), which needs network access, and JIT compiles
+# 'XLSX.openxlsx' and 'XLSX.eachrow' from scratch, which takes seconds for a
+# sub-millisecond calculation.
+#
+# The build step creates a pinned Julia project environment in 'src/julia'
+# ('Project.toml' and the resolved 'Manifest.toml', which should be
+# committed, so every node installs the same package versions), and a
+# PackageCompiler sysimage with every part_2 entry point precompiled.  The
+# check step then loads the environment with the package manager offline,
+# like on a compute node.
+# Once they are built, the 'julia' commands of part_2 (both the per-process
+# and the server modes) automatically use them, and run with the package
+# manager offline, so the compute nodes do not need network access.
+#
+# Command line usage (run from the project directory, on a node with network access):
+#   python julia_environment.py build
+#   python julia_environment.py build --skip-sysimage
+#   python julia_environment.py check
+#   python julia_environment.py cold-start
+
+import argparse
+import os
+import platform
+import shlex
+import subprocess
+import tempfile
+import time
+import tomllib
+
+julia_project_directory = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "src", "julia"
+)
+julia_manifest_file = os.path.join(julia_project_directory, "Manifest.toml")
+julia_matrix_file = os.path.join(julia_project_directory, "matrix.jl")
+julia_project_file = os.path.join(julia_project_directory, "Project.toml")
+julia_build_file = os.path.join(julia_project_directory, "build_sysimage.jl")
+julia_check_file = os.path.join(julia_project_directory, "check_environment.jl")
+julia_sysimage_file = os.path.join(
+    julia_project_directory,
+    "sysimage",
+    "dot_product_sysimage." + {"Darwin": "dylib", "Windows": "dll"}.get(platform.system(), "so"),
+)
+
+
+def manifest_problem_list():
+    """Get the reasons the 'Manifest.toml' file does not pin the 'Project.toml' packages.
+
+    Every package in the '[deps]' of the 'Project.toml' file must be in the
+    'Manifest.toml' file with the same uuid, and the registered packages (the
+    ones with a '[compat]' entry) must have a pinned version and tree hash.
+    """
+    if not os.path.isfile(julia_manifest_file):
+        return [f"There is no {julia_manifest_file} file."]
+
+    with open(julia_project_file, "rb") as fp:
+        project_dict = tomllib.load(fp)
+    with open(julia_manifest_file, "rb") as fp:
+        manifest_dict = tomllib.load(fp)
+
+    problem_list = []
+    manifest_deps_dict = manifest_dict.get("deps", {})
+    for package, uuid in project_dict.get("deps", {}).items():
+        entry_list = [e for e in manifest_deps_dict.get(package, []) if e.get("uuid") == uuid]
+        if not entry_list:
+            problem_list.append(f"The {package} package is not in the Manifest.toml file.")
+        elif package in project_dict.get("compat", {}) and not (
+            "version" in entry_list[0] and "git-tree-sha1" in entry_list[0]
+        ):
+            problem_list.append(f"The {package} package version is not pinned.")
+
+    return problem_list
+
+
+def pinned_environment_built():
+    """Check if the pinned Julia environment is built, and it pins every package."""
+    return not manifest_problem_list()
+
+
+def sysimage_built():
+    """Check if the sysimage is built."""
+    return os.path.isfile(julia_sysimage_file)
+
+
+def julia_command_list(use_built_bool=True):
+    """Get the base julia command, using the pinned environment and sysimage if they are built."""
+    command_list = ["julia"]
+    if use_built_bool and pinned_environment_built():
+        command_list.append(f"--project={julia_project_directory}")
+        if sysimage_built():
+            command_list.append(f"--sysimage={julia_sysimage_file}")
+
+    return command_list
+
+
+def julia_environment_variables(use_built_bool=True):
+    """Get the extra environment variables of the julia command."""
+    if use_built_bool and pinned_environment_built():
+        # every package is already in the pinned environment
+        return {"JULIA_PKG_OFFLINE": "true"}
+
+    return {}
+
+
+def julia_command_str():
+    """Get the base julia command (with its environment variables) for a shell command."""
+    return shlex.join(
+        [f"{key}={value}" for key, value in julia_environment_variables().items()]
+        + julia_command_list()
+    )
+
+
+def julia_subprocess_environment(use_built_bool=True):
+    """Get the environment of a julia subprocess."""
+    return {**os.environ, **julia_environment_variables(use_built_bool)}
+
+
+def write_cold_start_workbook(excel_filename):
+    """Write a small workbook in the same layout as the project's Excel files."""
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(["value_0", "value_1", "value_2", "value_3"])
+    sheet.append([1, 2, 3, 4])
+    workbook.save(excel_filename)
+
+
+def measure_cold_start(use_built_bool):
+    """Get the time (s) of a new julia process running one 'calc_dot_product'."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        excel_filename = os.path.join(output_dir, "cold_start.xlsx")
+        write_cold_start_workbook(excel_filename)
+        dot_p = f'calc_dot_product("{excel_filename}", "Sheet1", ' \
+            f'"{output_dir}/cold_start.txt", "0")'
+        start_time = time.time()
+        subprocess.run(
+            julia_command_list(use_built_bool) + ["--load", julia_matrix_file, "-e", dot_p],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            env=julia_subprocess_environment(use_built_bool),
+        )
+
+    return time.time() - start_time
+
+
+def check():
+    """Check the pinned environment pins every package, and loads with the package manager offline."""
+    problem_list = manifest_problem_list()
+    if problem_list:
+        raise RuntimeError(
+            "ERROR: The pinned Julia environment is not built or not pinned "
+            "(run 'python julia_environment.py build' on a node with network access):\n"
+            + "\n".join(problem_list)
+        )
+
+    subprocess.run(
+        ["julia", julia_check_file],
+        check=True,
+        env=julia_subprocess_environment(use_built_bool=True),
+    )
+
+
+def build(skip_sysimage_bool=False):
+    """Build the pinned environment and the sysimage, and compare the cold-start times."""
+    print('*********************************************')
+    print('Measuring the cold-start time without the pinned environment and sysimage')
+    before_s = measure_cold_start(use_built_bool=False)
+    print(f'cold-start time before = {before_s:.3f} s')
+
+    print('*********************************************')
+    print(f'Building the pinned environment in {julia_project_directory}')
+    build_command_list = ["julia", julia_build_file]
+    if not skip_sysimage_bool:
+        print(f'and the sysimage {julia_sysimage_file} (this can take several minutes)')
+        os.makedirs(os.path.dirname(julia_sysimage_file), exist_ok=True)
+        build_command_list.append(julia_sysimage_file)
+    subprocess.run(build_command_list, check=True)
+
+    print('*********************************************')
+    print(f'Checking the pinned environment with the package manager offline')
+    check()
+    print(f'Commit the {julia_manifest_file} file, so every node uses the same package versions')
+
+    print('*********************************************')
+    after_s = measure_cold_start(use_built_bool=True)
+    print(f'cold-start time before = {before_s:.3f} s')
+    print(f'cold-start time after = {after_s:.3f} s')
+    print(f'cold-start speedup = {before_s / after_s:.1f}x')
+    print(f'part_2 julia command = {julia_command_str()}')
+    print('*********************************************')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_build = subparsers.add_parser(
+        "build", help="Build the pinned environment and the sysimage."
+    )
+    parser_build.add_argument("--skip-sysimage", action="store_true",
+                              help="Only build the pinned environment.")
+    parser_check = subparsers.add_parser(
+        "check", help="Check the pinned environment works with the package manager offline."
+    )
+    parser_cold_start = subparsers.add_parser(
+        "cold-start", help="Measure the cold-start time of the current julia command."
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.skip_sysimage)
+    elif args.command == "check":
+        check()
+        print('The pinned Julia environment is OK')
+    elif args.command == "cold-start":
+        print(f'julia command = {julia_command_str()}')
+        print(f'cold-start time = {measure_cold_start(use_built_bool=True):.3f} s')
@@ -0,0 +1,336 @@
+"""Persistent Julia worker pool for the part_2 dot product calculations"""
+# julia_server.py
+#
+# Starts and talks to a pool of long-lived Julia servers
+# ('src/julia/dot_product_server.jl'), one pool per node, or per Slurm
+# allocation (bundle).  Each part_2 job sends its 'calc_dot_product' request
+# to a server over a local Unix socket instead of starting a new
+# 'julia --load matrix.jl' process, so the Julia startup, JIT compile,
+# and 'Pkg.add("XLSX")' time is only paid once per server.
+#
+# Command line usage (run from the project directory):
+#   python julia_server.py calc <excel_filename> <excel_sheetname> <output_txt_filename> <replicate_no>
+#   python julia_server.py calc ... --rows-output <output_rows_filename> --summary-output <output_summary_filename>
+#   python julia_server.py start --workers 4
+#   python julia_server.py stop --workers 4
+#   python julia_server.py benchmark --jobs 20
+
+import argparse
+import fcntl
+import getpass
+import hashlib
+import os
+import socket
+import stat
+import subprocess
+import tempfile
+import time
+import zlib
+
+import julia_environment
+
+julia_src_directory = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "src", "julia"
+)
+julia_matrix_file = os.path.join(julia_src_directory, "matrix.jl")
+julia_server_file = os.path.join(julia_src_directory, "dot_product_server.jl")
+
+# Seconds to wait for a new Julia server to answer (first start can
+# include the 'Pkg.add' download and precompiling).
+server_startup_timeout_s = 600
+
+# Seconds a Julia server waits without requests before it exits.
+server_idle_timeout_s = 3600
+
+
+def julia_command_list():
+    """Get the base julia command used for the servers and the per-process mode.
+
+    This uses the pinned environment and sysimage if they are built
+    (see the 'julia_environment.py' file).
+    """
+    return julia_environment.julia_command_list()
+
+
+def pool_directory():
+    """Get the node-local directory for the server sockets and logs.
+
+    The pool is shared by all the jobs of the same user and project on a node,
+    or in the same Slurm allocation (bundle) if running in Slurm.  The pool name
+    has a hash of the resolved 'matrix.jl' path and its modification time, so
+    different projects (or an edited 'matrix.jl') never use each other's servers.
+
+    The directory is only readable by the user, and it is not used if another
+    user owns it or it can be written by other users, as any process that can
+    write the sockets could answer the part_2 requests.
+    """
+    matrix_file = os.path.realpath(julia_matrix_file)
+    matrix_key = f"{matrix_file}:{os.stat(matrix_file).st_mtime_ns}"
+    matrix_hash = hashlib.sha256(matrix_key.encode()).hexdigest()[:12]
+    pool_name = (
+        f"sjea-{getpass.getuser()}-{os.environ.get('SLURM_JOB_ID', 'local')}-{matrix_hash}"
+    )
+    pool_dir = os.path.join(tempfile.gettempdir(), pool_name)
+    os.makedirs(pool_dir, mode=0o700, exist_ok=True)
+
+    pool_dir_stat = os.lstat(pool_dir)
+    if not stat.S_ISDIR(pool_dir_stat.st_mode) or pool_dir_stat.st_uid != os.getuid():
+        raise RuntimeError(
+            f"ERROR: The Julia server pool directory {pool_dir} is not a directory "
+            f"owned by the user {getpass.getuser()}, so it is not used."
+        )
+    if pool_dir_stat.st_mode & 0o022:
+        raise RuntimeError(
+            f"ERROR: The Julia server pool directory {pool_dir} can be written by "
+            f"other users (mode {stat.S_IMODE(pool_dir_stat.st_mode):o}), so it is not "
+            f"used.  Remove it, or run 'chmod 700 {pool_dir}'."
+        )
+
+    return pool_dir
+
+
+def worker_socket_path(worker_index):
+    """Get the socket path of a given server in the pool."""
+    return os.path.join(pool_directory(), f"worker_{worker_index}.sock")
+
+
+def worker_index_for_key(worker_key, workers):
+    """Pick the pool server for a job, spreading the jobs over all the servers."""
+    return zlib.crc32(str(worker_key).encode()) % workers
+
+
+def send_request(worker_index, request_fields, timeout_s=None):
+    """Send one request line to a server and return its reply line."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout_s)
+        sock.connect(worker_socket_path(worker_index))
+        sock.sendall(("\t".join(str(f) for f in request_fields) + "\n").encode())
+        with sock.makefile("r") as reply_file:
+            reply = reply_file.readline().strip()
+
+    return reply
+
+
+def server_is_running(worker_index):
+    """Check if a server in the pool answers a 'ping' request."""
+    try:
+        return send_request(worker_index, ["ping"], timeout_s=5) == "OK"
+    except OSError:
+        return False
+
+
+def start_server_pool(workers):
+    """Start any servers in the pool that are not already running.
+
+    A lock file keeps parallel jobs on the same node from starting
+    the same servers more than once.
+    """
+    with open(os.path.join(pool_directory(), "pool.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        started_worker_list = []
+        for worker_i in range(workers):
+            if server_is_running(worker_i):
+                continue
+
+            log_file = open(os.path.join(pool_directory(), f"worker_{worker_i}.log"), "a")
+            subprocess.Popen(
+                julia_command_list() + [
+                    julia_server_file,
+                    worker_socket_path(worker_i),
+                    str(server_idle_timeout_s),
+                ],
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True,
+                env=julia_environment.julia_subprocess_environment(),
+            )
+            log_file.close()
+            started_worker_list.append(worker_i)
+
+        start_time = time.time()
+        for worker_i in started_worker_list:
+            while not server_is_running(worker_i):
+                if time.time() - start_time > server_startup_timeout_s:
+                    raise RuntimeError(
+                        f"ERROR: The Julia server {worker_socket_path(worker_i)} did not start. "
+                        f"See the log files in {pool_directory()}."
+                    )
+                time.sleep(0.5)
+
+
+def stop_server_pool(workers):
+    """Stop all the running servers in the pool."""
+    for worker_i in range(workers):
+        if server_is_running(worker_i):
+            send_request(worker_i, ["shutdown"], timeout_s=5)
+
+
+def calc_dot_product(
+    excel_filename,
+    excel_sheetname,
+    output_txt_filename,
+    replicate_no,
+    workers=1,
+    worker_key="",
+    output_rows_filename=None,
+    output_summary_filename=None,
+    mult_vector=None,
+    noise_range=None,
+):
+    """Run 'calc_dot_product' on the server pool, starting the pool if needed.
+
+    All the file names must be absolute paths, as the servers do not run in the
+    job's directory.  The output file is identical to the one written by the
+    'julia --load matrix.jl' per-process mode.  If the rows and summary output
+    files are given, 'calc_dot_product_all_rows' is run instead.  The
+    'mult_vector' and 'noise_range' lists default to the ones in 'matrix.jl'.
+    """
+    worker_index = worker_index_for_key(worker_key, workers)
+    if not server_is_running(worker_index):
+        start_server_pool(workers)
+
+    if output_rows_filename is None:
+        request_fields = [
+            "calc_dot_product",
+            excel_filename,
+            excel_sheetname,
+            output_txt_filename,
+            replicate_no,
+        ]
+    else:
+        request_fields = [
+            "calc_dot_product_all_rows",
+            excel_filename,
+            excel_sheetname,
+            output_txt_filename,
+            output_rows_filename,
+            output_summary_filename,
+            replicate_no,
+        ]
+    if mult_vector is not None or noise_range is not None:
+        request_fields += [
+            ",".join(str(float(v)) for v in (mult_vector or [9, 8, 7, 6])),
+            ",".join(str(int(v)) for v in (noise_range or [1, 10])),
+        ]
+    reply = send_request(worker_index, request_fields)
+    if reply != "OK":
+        raise RuntimeError(f"ERROR: The Julia server failed: {reply}")
+
+
+def benchmark(excel_directory, excel_sheetname, number_of_jobs, workers):
+    """Compare the jobs per second of the per-process and server modes.
+
+    The benchmark uses the jobs in the signac project of the current directory,
+    and writes the output files to a temporary directory, so the project's
+    output files are not changed.
+    """
+    import signac
+
+    job_list = list(signac.get_project())[:number_of_jobs]
+    if len(job_list) == 0:
+        raise ValueError("ERROR: There are no jobs in the project, run 'python init.py' first.")
+
+    excel_filename_list = [
+        os.path.abspath(f"{excel_directory}/{job.sp.excel_filename_wo_ext}.xlsx")
+        for job in job_list
+    ]
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # per-process mode: a new 'julia --load matrix.jl' process per job
+        start_time = time.time()
+        for i, (job, excel_filename) in enumerate(zip(job_list, excel_filename_list)):
+            dot_p = f'calc_dot_product("{excel_filename}", "{excel_sheetname}", ' \
+                f'"{output_dir}/per_process_{i}.txt", "{job.sp.replicate_number_int}")'
+            subprocess.run(
+                julia_command_list() + ["--load", julia_matrix_file, "-e", dot_p],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                env=julia_environment.julia_subprocess_environment(),
+            )
+        per_process_time_s = time.time() - start_time
+
+        # server mode: the pool startup is timed separately, as it is
+        # only paid once per node or bundle
+        start_time = time.time()
+        start_server_pool(workers)
+        server_startup_time_s = time.time() - start_time
+
+        start_time = time.time()
+        for i, (job, excel_filename) in enumerate(zip(job_list, excel_filename_list)):
+            calc_dot_product(
+                excel_filename,
+                excel_sheetname,
+                f"{output_dir}/server_{i}.txt",
+                job.sp.replicate_number_int,
+                workers=workers,
+                worker_key=job.id,
+            )
+        server_time_s = time.time() - start_time
+
+    per_process_jobs_per_s = len(job_list) / per_process_time_s
+    server_jobs_per_s = len(job_list) / server_time_s
+    print('*********************************************')
+    print(f'number of jobs = {len(job_list)}')
+    print(f'per_process mode: {per_process_time_s:.3f} s, {per_process_jobs_per_s:.3f} jobs/s')
+    print(f'server mode startup = {server_startup_time_s:.3f} s (once per node or bundle)')
+    print(f'server mode: {server_time_s:.3f} s, {server_jobs_per_s:.3f} jobs/s')
+    print(f'server mode speedup = {server_jobs_per_s / per_process_jobs_per_s:.1f}x')
+    print('*********************************************')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_calc = subparsers.add_parser("calc", help="Run a single 'calc_dot_product' request.")
+    parser_calc.add_argument("excel_filename")
+    parser_calc.add_argument("excel_sheetname")
+    parser_calc.add_argument("output_txt_filename")
+    parser_calc.add_argument("replicate_no")
+    parser_calc.add_argument("--worker-key", default="")
+    parser_calc.add_argument("--rows-output", default=None,
+                             help="Calculate every row, writing the row dot products to this file.")
+    parser_calc.add_argument("--summary-output", default=None,
+                             help="The summary stats file of the '--rows-output' mode.")
+    parser_calc.add_argument("--mult-vector", type=float, nargs=4, default=None,
+                             help="The dot multiplication vector (default: 9 8 7 6).")
+    parser_calc.add_argument("--noise-range", type=int, nargs=2, default=None,
+                             help="The noise range, where the noise is a random value from "
+                                  "min/10 to max/10 (default: 1 10).")
+
+    parser_start = subparsers.add_parser("start", help="Start the server pool.")
+    parser_stop = subparsers.add_parser("stop", help="Stop the server pool.")
+
+    parser_benchmark = subparsers.add_parser(
+        "benchmark", help="Compare the jobs/s of the per-process and server modes."
+    )
+    parser_benchmark.add_argument("--jobs", type=int, default=20)
+    parser_benchmark.add_argument("--excel-directory", default="src/data")
+    parser_benchmark.add_argument("--excel-sheetname", default="Sheet1")
+
+    for _parser in (parser_calc, parser_start, parser_stop, parser_benchmark):
+        _parser.add_argument("--workers", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.command == "calc":
+        calc_dot_product(
+            os.path.abspath(args.excel_filename),
+            args.excel_sheetname,
+            os.path.abspath(args.output_txt_filename),
+            args.replicate_no,
+            workers=args.workers,
+            worker_key=args.worker_key,
+            output_rows_filename=args.rows_output and os.path.abspath(args.rows_output),
+            output_summary_filename=args.summary_output and os.path.abspath(args.summary_output),
+            mult_vector=args.mult_vector,
+            noise_range=args.noise_range,
+        )
+    elif args.command == "start":
+        start_server_pool(args.workers)
+    elif args.command == "stop":
+        stop_server_pool(args.workers)
+    elif args.command == "benchmark":
+        benchmark(args.excel_directory, args.excel_sheetname, args.jobs, args.workers)
@@ -0,0 +1,512 @@
+"""Local multiprocessing executor for the project's operations"""
+# local_executor.py
+#
+# Runs the eligible operations on a workstation or an interactive node across
+# a pool of worker processes, instead of one operation at a time like
+# 'python project.py run'.  The python function operations are run inside the
+# (forked) worker processes, so they do not pay the python and project import
+# time for every job, and the 'cmd' operations are run as a subprocess by the
+# worker, like signac-flow does.
+#
+# The operation directives are used as the local resource budget:
+# each operation uses 'np' * 'cpus-per-task' cores and
+# 'np' * 'cpus-per-task' * 'mem-per-cpu' GB of memory, and an operation is
+# only started if it fits in the free cores and memory.
+#
+# The eligible operations are re-evaluated as operations finish, so later
+# operations (Example: the part_3 replicate group) are started as soon as
+# they are eligible, and the operations defined later in the project are
+# started first, so the jobs move through all the parts instead of waiting
+# for every job to finish each part.
+#
+# Failures and stragglers:
+# - A failed operation is retried up to 'retries' times, waiting
+#   'retry_backoff_s' seconds before the first retry, and twice as long before
+#   each next retry (Example: for a transient filesystem error).
+# - An operation running longer than 'speculation_factor' times the median
+#   wall time of the completed operations of the same name is a straggler, and
+#   a second copy of it is started on the free cores (only for the
+#   'speculative_operation_names' operations).  The first copy to finish is
+#   used, and the other copy is cancelled: only the worker running it gets a
+#   SIGUSR1 signal, which sets its cancelled flag, and the copy stops at its
+#   next safe point (before its operation starts, or once it returns).  The
+#   signal never interrupts the operation, so it is never stopped part way
+#   through writing the results store, a SQLite file, or the replicate
+#   summary.  The cancelled copy may still write its outputs, so only
+#   speculate the operations that write the same outputs every time
+#   (Example: seeded random values), and replace their output files atomically.
+# - An operation that failed on every attempt with the same error failed
+#   deterministically.  When 'quarantine_failures' operations of the same
+#   quarantine key (Example: the same Excel file) failed deterministically,
+#   the key is passed to the 'quarantine_function', so the project can skip
+#   its jobs (see the 'quarantine.py' file).
+
+import contextlib
+import itertools
+import multiprocessing
+import os
+import re
+import signal
+import statistics
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import quarantine
+
+# The forked worker processes' copy of the project, the shared array of the
+# cancelled operation copies' tokens, the shared array of the (token, pid) of
+# the copy each worker is running, the worker's slot in that array, the token
+# of the running copy, and if the running copy was cancelled
+_worker_project = None
+_worker_cancelled_token_array = None
+_worker_running_token_array = None
+_worker_slot = None
+_worker_token = None
+_worker_cancelled_bool = False
+
+
+def _cancel_handler(signum, frame):
+    # only set the flag, which is checked at the safe points of '_run_operation',
+    # so the operation is never interrupted part way through its writes
+    global _worker_cancelled_bool
+    if _worker_token is not None and _worker_token in _worker_cancelled_token_array[:]:
+        _worker_cancelled_bool = True
+
+
+def available_cores():
+    """Get the number of cores this process is allowed to run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_mem_gb():
+    """Get the available memory (GB) of the node."""
+    try:
+        with open("/proc/meminfo", "r") as fp:
+            for line in fp:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024**2
+    except OSError:
+        pass
+
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+
+
+def operation_resources(operation_directives):
+    """Get the (cores, memory in GB) an operation uses."""
+    cores = operation_directives.get("np", 1) * operation_directives.get("cpus-per-task", 1)
+    mem_gb = cores * operation_directives.get("mem-per-cpu", 0)
+
+    return cores, mem_gb
+
+
+def _init_worker(project, cancelled_token_array, running_token_array, worker_counter):
+    global _worker_project, _worker_cancelled_token_array, _worker_running_token_array
+    global _worker_slot
+    _worker_project = project
+    _worker_cancelled_token_array = cancelled_token_array
+    _worker_running_token_array = running_token_array
+    with worker_counter.get_lock():
+        _worker_slot = worker_counter.value % (len(running_token_array) // 2)
+        worker_counter.value += 1
+
+
+# The error message of a cancelled operation copy
+cancelled_message_str = "The operation copy was cancelled."
+
+
+def _run_operation(operation_tuple, token):
+    """Run an operation in a worker process.
+
+    Returns (error message or None, wall time in seconds), so the errors do
+    not need to be pickled.
+    """
+    global _worker_token, _worker_cancelled_bool
+    start_time = time.monotonic()
+    _worker_cancelled_bool = False
+    _worker_token = token
+    # the pid is set before the token, so the main process never signals the wrong pid
+    _worker_running_token_array[2 * _worker_slot + 1] = os.getpid()
+    _worker_running_token_array[2 * _worker_slot] = token
+    # a copy cancelled before its token was set is not signalled, so check it here
+    if token in _worker_cancelled_token_array[:]:
+        _worker_cancelled_bool = True
+    error_message = None
+    try:
+        if not _worker_cancelled_bool:
+            _worker_project._execute_operation(
+                _worker_project._job_operation_from_tuple(operation_tuple)
+            )
+    except Exception:
+        error_message = traceback.format_exc()
+    finally:
+        _worker_running_token_array[2 * _worker_slot] = -1
+        _worker_token = None
+
+    if _worker_cancelled_bool:
+        return cancelled_message_str, time.monotonic() - start_time
+
+    return error_message, time.monotonic() - start_time
+
+
+class LocalExecutor:
+    """Run a project's eligible operations in a local pool of worker processes.
+
+    Parameters
+    ----------
+    project : FlowProject
+        The project.
+    cores : int
+        The number of cores to use (all the available cores if 0).
+    mem_gb : float
+        The memory (GB) to use (all the available memory if 0).
+    operation_names : list of str
+        Only run the operations matching these names, which are regular
+        expressions like 'python project.py run -o' (all if None or empty).
+    progress_interval_s : float
+        The minimum time between the progress lines.
+    retries : int
+        The number of times a failed operation is retried.
+    retry_backoff_s : float
+        The seconds before the first retry, which doubles for each next retry.
+    speculation_factor : float
+        Start a second copy of an operation running longer than this many times
+        the median wall time of its completed operations (0 to not speculate).
+    speculative_operation_names : list of str
+        Only speculate the operations matching these names (regular expressions).
+    quarantine_key_function : function(job)
+        The quarantine key of a job (Example: its Excel file name).
+    quarantine_function : function(key, operation_name, error_summary_str)
+        Called when 'quarantine_failures' operations, whose jobs all have the
+        same quarantine key, failed deterministically.
+    quarantine_failures : int
+        The number of deterministic failures before a key is quarantined
+        (0 to not quarantine).
+    """
+
+    # The number of completed operations of a name needed before its
+    # stragglers are speculated.
+    speculation_min_completed_int = 5
+
+    # The number of cancelled operation copies that are remembered (the
+    # cancelled copies only need to be remembered until they stop).
+    cancelled_tokens_int = 256
+
+    def __init__(
+        self,
+        project,
+        cores=0,
+        mem_gb=0,
+        operation_names=None,
+        progress_interval_s=5,
+        retries=0,
+        retry_backoff_s=5,
+        speculation_factor=0,
+        speculative_operation_names=None,
+        quarantine_key_function=None,
+        quarantine_function=None,
+        quarantine_failures=0,
+    ):
+        self.project = project
+        self.cores = cores if cores > 0 else available_cores()
+        self.mem_gb = mem_gb if mem_gb > 0 else available_mem_gb()
+        operation_order_list = list(project.operations)
+        self.operation_names = [
+            name for name in operation_order_list
+            if not operation_names or any(re.fullmatch(n, name) for n in operation_names)
+        ]
+        self.progress_interval_s = progress_interval_s
+        self.retries = retries
+        self.retry_backoff_s = retry_backoff_s
+        self.speculation_factor = speculation_factor
+        self.speculative_operation_names = [
+            name for name in self.operation_names
+            if any(re.fullmatch(n, name) for n in speculative_operation_names or [])
+        ]
+        self.quarantine_key_function = quarantine_key_function
+        self.quarantine_function = quarantine_function
+        self.quarantine_failures = quarantine_failures
+
+        # the operations defined later in the project are started first
+        self._priority_dict = {
+            name: -operation_order_list.index(name) for name in self.operation_names
+        }
+
+    def _eligible_operations(self):
+        """Get the eligible operations, in the order they should be started."""
+        operation_list = []
+        with self.project._buffered():
+            for name in self.operation_names:
+                operation_list.extend(
+                    self.project._next_operations(operation_names=[re.escape(name)])
+                )
+
+        return sorted(operation_list, key=lambda op: self._priority_dict[op.name])
+
+    def _print_progress(self, start_time, completed_dict, running_dict, queued, failed_dict,
+                        retry_list, speculated_int):
+        elapsed_s = max(time.monotonic() - start_time, 1e-9)
+        completed = sum(completed_dict.values())
+        per_operation_str = ", ".join(
+            f"{name}: {count}" for name, count in sorted(completed_dict.items())
+        )
+        print(
+            f"[local executor] {elapsed_s:.1f} s, completed = {completed} "
+            f"({completed / elapsed_s:.2f} ops/sec), running = {len(running_dict)}, "
+            f"queued = {queued}, retrying = {len(retry_list)}, "
+            f"speculated = {speculated_int}, failed = {len(failed_dict)}"
+            + (f" | {per_operation_str}" if per_operation_str else ""),
+            flush=True,
+        )
+
+    def _quarantine_keys(self, operation):
+        """Get the set of quarantine keys of the operation's jobs."""
+        if self.quarantine_key_function is None:
+            return set()
+
+        return {self.quarantine_key_function(job) for job in operation._jobs}
+
+    def _stragglers(self, running_dict, wall_time_dict, speculated_id_set):
+        """Get the running operations that should be speculated."""
+        attempts_running_dict = {}
+        for operation, *_ in running_dict.values():
+            attempts_running_dict[operation.id] = attempts_running_dict.get(operation.id, 0) + 1
+
+        straggler_list = []
+        for operation, _, _, operation_start_time, _ in running_dict.values():
+            wall_time_list = wall_time_dict.get(operation.name, [])
+            if (
+                operation.name in self.speculative_operation_names
+                and operation.id not in speculated_id_set
+                and attempts_running_dict[operation.id] == 1
+                and len(wall_time_list) >= self.speculation_min_completed_int
+                and time.monotonic() - operation_start_time
+                > self.speculation_factor * statistics.median(wall_time_list)
+            ):
+                straggler_list.append(operation)
+
+        return straggler_list
+
+    def run(self):
+        """Run the operations until none are eligible.
+
+        Returns
+        -------
+        dict
+            {operation id: error message} of the failed operations.
+        """
+        print('*********************************************')
+        print(f"Running locally with {self.cores} cores and {self.mem_gb:.1f} GB of memory")
+        print('*********************************************')
+
+        start_time = time.monotonic()
+        last_progress_time = start_time
+        completed_dict = {}
+        completed_id_set = set()
+        failed_dict = {}
+        running_dict = {}
+        free_cores = self.cores
+        free_mem_gb = self.mem_gb
+        queued_operation_list = []
+        evaluate_bool = True
+
+        # the retries waiting for their backoff time, as (start time, operation)
+        retry_list = []
+        attempts_dict = {}
+        error_summary_dict = {}
+        wall_time_dict = {}
+        speculated_id_set = set()
+        quarantine_failures_dict = {}
+
+        # each submitted operation copy has a token, so a (speculative) copy
+        # can be cancelled once the other copy finished
+        token_counter = itertools.count()
+        cancelled_counter = itertools.count()
+        mp_context = multiprocessing.get_context("fork")
+        cancelled_token_array = mp_context.RawArray("q", [-1] * self.cancelled_tokens_int)
+        # each worker's (token, pid) of the copy it is running, so a cancel
+        # only signals the worker running the cancelled copy
+        running_token_array = mp_context.RawArray("q", [-1] * (2 * self.cores))
+        worker_counter = mp_context.Value("i", 0)
+
+        # the forked workers inherit the signal handler, so a worker can
+        # never be killed by a cancel signal before its initializer ran
+        previous_handler = signal.signal(signal.SIGUSR1, _cancel_handler)
+
+        with ProcessPoolExecutor(
+            max_workers=self.cores,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self.project, cancelled_token_array, running_token_array, worker_counter),
+        ) as pool:
+
+            def submit(operation, cores, mem_gb):
+                token = next(token_counter)
+                future = pool.submit(
+                    _run_operation, self.project._job_operation_to_tuple(operation), token
+                )
+                running_dict[future] = (operation, cores, mem_gb, time.monotonic(), token)
+
+            def cancel_other_copies(operation):
+                for other_operation, _, _, _, other_token in running_dict.values():
+                    if other_operation.id == operation.id:
+                        cancelled_token_array[
+                            next(cancelled_counter) % self.cancelled_tokens_int
+                        ] = other_token
+                        # only signal the worker running the cancelled copy (if
+                        # it started), which ignores the signal if it already
+                        # moved on to another copy
+                        for slot in range(len(running_token_array) // 2):
+                            if (
+                                running_token_array[2 * slot] == other_token
+                                and running_token_array[2 * slot + 1] > 0
+                            ):
+                                with contextlib.suppress(ProcessLookupError):
+                                    os.kill(running_token_array[2 * slot + 1], signal.SIGUSR1)
+
+            while True:
+                if evaluate_bool:
+                    started_or_failed_id_set = {op.id for op, *_ in running_dict.values()}
+                    started_or_failed_id_set.update(failed_dict)
+                    started_or_failed_id_set.update(op.id for _, op in retry_list)
+                    started_or_failed_id_set.update(completed_id_set)
+                    queued_operation_list = [
+                        op for op in self._eligible_operations()
+                        if op.id not in started_or_failed_id_set
+                    ]
+                    evaluate_bool = False
+
+                # the retries are started first, once their backoff time passed
+                ready_retry_list = [op for t, op in retry_list if t <= time.monotonic()]
+                retry_list = [(t, op) for t, op in retry_list if t > time.monotonic()]
+                queued_operation_list = ready_retry_list + queued_operation_list
+
+                # start the queued operations that fit in the free cores and memory
+                # (an operation larger than the whole budget is run by itself)
+                not_started_list = []
+                for operation in queued_operation_list:
+                    cores, mem_gb = operation_resources(operation.directives)
+                    if (cores <= free_cores and mem_gb <= free_mem_gb) or not running_dict:
+                        submit(operation, cores, mem_gb)
+                        attempts_dict[operation.id] = attempts_dict.get(operation.id, 0) + 1
+                        free_cores -= cores
+                        free_mem_gb -= mem_gb
+                    else:
+                        not_started_list.append(operation)
+                queued_operation_list = not_started_list
+
+                # start a second copy of the stragglers on the cores that are 
+                # not needed by the queued operations
+                if self.speculation_factor > 0 and not queued_operation_list:
+                    for operation in self._stragglers(
+                        running_dict, wall_time_dict, speculated_id_set
+                    ):
+                        cores, mem_gb = operation_resources(operation.directives)
+                        if cores <= free_cores and mem_gb <= free_mem_gb:
+                            print(f"[local executor] Speculating the straggler {operation}")
+                            submit(operation, cores, mem_gb)
+                            speculated_id_set.add(operation.id)
+                            free_cores -= cores
+                            free_mem_gb -= mem_gb
+
+                if not running_dict and not retry_list:
+                    break
+                if not running_dict:
+                    time.sleep(max(0, min(t for t, _ in retry_list) - time.monotonic()))
+                    continue
+
+                wait_timeout_s = self.progress_interval_s
+                if retry_list:
+                    wait_timeout_s = min(
+                        wait_timeout_s,
+                        max(0, min(t for t, _ in retry_list) - time.monotonic()),
+                    )
+                done_set, _ = wait(list(running_dict), timeout=wait_timeout_s,
+                                   return_when=FIRST_COMPLETED)
+                for future in done_set:
+                    operation, cores, mem_gb, _, _ = running_dict.pop(future)
+                    free_cores += cores
+                    free_mem_gb += mem_gb
+                    error_message, wall_time_s = future.result()
+                    other_copy_running_bool = any(
+                        op.id == operation.id for op, *_ in running_dict.values()
+                    )
+                    if operation.id in completed_id_set:
+                        # the other (speculative) copy finished first
+                        continue
+
+                    if error_message is None:
+                        completed_id_set.add(operation.id)
+                        completed_dict[operation.name] = completed_dict.get(operation.name, 0) + 1
+                        wall_time_dict.setdefault(operation.name, []).append(wall_time_s)
+                        if other_copy_running_bool:
+                            # the other copy would overwrite the output files later
+                            cancel_other_copies(operation)
+                        continue
+
+                    error_summary_dict.setdefault(operation.id, []).append(
+                        quarantine.error_summary(error_message)
+                    )
+                    if other_copy_running_bool:
+                        # use the result of the other (speculative) copy
+                        continue
+
+                    if attempts_dict[operation.id] <= self.retries:
+                        backoff_s = self.retry_backoff_s * 2 ** (attempts_dict[operation.id] - 1)
+                        print(f"[local executor] The operation {operation} failed "
+                              f"({error_summary_dict[operation.id][-1]}), retrying in "
+                              f"{backoff_s:.1f} s (retry {attempts_dict[operation.id]} "
+                              f"of {self.retries})")
+                        retry_list.append((time.monotonic() + backoff_s, operation))
+                        continue
+
+                    failed_dict[operation.id] = error_message
+                    print(f"ERROR: The operation {operation} failed:\n{error_message}")
+
+                    # every attempt failed with the same error, so it is 
+                    # not worth running this key's operations again
+                    quarantine_key_set = self._quarantine_keys(operation)
+                    if (
+                        self.quarantine_failures > 0
+                        and len(set(error_summary_dict[operation.id])) == 1
+                        and len(quarantine_key_set) == 1
+                    ):
+                        (quarantine_key, ) = quarantine_key_set
+                        quarantine_failures_dict[quarantine_key] = \
+                            quarantine_failures_dict.get(quarantine_key, 0) + 1
+                        if quarantine_failures_dict[quarantine_key] == self.quarantine_failures:
+                            print(f"[local executor] Quarantining {quarantine_key}, after "
+                                  f"{self.quarantine_failures} operations failed on every attempt")
+                            self.quarantine_function(
+                                quarantine_key, operation.name, error_summary_dict[operation.id][-1]
+                            )
+                            # the quarantined key's retries are not run
+                            retry_list = [
+                                (t, op) for t, op in retry_list
+                                if quarantine_key not in self._quarantine_keys(op)
+                            ]
+                            evaluate_bool = True
+
+                # only re-evaluate the eligible operations once the queue can
+                # not keep the pool busy, or the progress interval passed, as
+                # the evaluation checks every job
+                if done_set and (
+                    not queued_operation_list
+                    or time.monotonic() - last_progress_time >= self.progress_interval_s
+                ):
+                    evaluate_bool = True
+
+                if time.monotonic() - last_progress_time >= self.progress_interval_s:
+                    self._print_progress(start_time, completed_dict, running_dict,
+                                         len(queued_operation_list), failed_dict,
+                                         retry_list, len(speculated_id_set))
+                    last_progress_time = time.monotonic()
+
+        signal.signal(signal.SIGUSR1, previous_handler)
+        self._print_progress(start_time, completed_dict, running_dict, 0, failed_dict,
+                             retry_list, len(speculated_id_set))
+
+        return failed_dict
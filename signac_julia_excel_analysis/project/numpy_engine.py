@@ -0,0 +1,272 @@
+"""NumPy engine for the part_2 dot product calculations"""
+# numpy_engine.py
+#
+# A vectorized version of the 'calc_dot_product' function in the
+# 'src/julia/matrix.jl' file.  The Excel row 2 values (value_0 to value_3) of
+# many jobs are stacked into one matrix, and all the dot products are
+# calculated with a single matrix multiplication.
+#
+# In the full-sheet (all rows) mode, the dot product of every data row is
+# calculated chunk by chunk as the sheet is streamed, and written to a compact
+# binary file (little-endian float64, one value per row), with the summary
+# stats (rows, mean, std. dev., min, max, sum) of the rows.  Each workbook is
+# streamed once for all its replicates in the batch, as the replicates only
+# differ by their random scalar noise value (and multiplier vector).
+#
+# Each job's multiplier vector and noise range are its 'mult_vector' and
+# 'noise_range' statepoints (see the 'init.py' file), which default to the
+# 'mult_vector' below and a noise range of [1, 10].
+
+import contextlib
+import decimal
+import json
+import math
+import os
+import zlib
+
+import numpy as np
+
+# The dot multiplication vector, which is the same as the 'mult_vector'
+# in the 'src/julia/matrix.jl' file.
+mult_vector = np.array([9, 8, 7, 6], dtype=float)
+
+
+def replicate_random_value(
+    excel_filename_wo_ext, replicate_number_int, random_seed_int, noise_range=(1, 10)
+):
+    """Get the random scalar noise value for a single replicate.
+
+    This is the same as 'rand(noise_range[1]:noise_range[2])/10' in the
+    'src/julia/matrix.jl' file (a value from 0.1 to 1.0 for the default
+    noise range), but each replicate gets its own seeded random number
+    generator, so the value is reproducible and does not depend on which
+    other jobs are calculated in the same batch.
+    """
+    rng = np.random.default_rng(
+        [
+            random_seed_int,
+            replicate_number_int,
+            zlib.crc32(str(excel_filename_wo_ext).encode()),
+        ]
+    )
+
+    return rng.integers(noise_range[0], noise_range[1] + 1) / 10
+
+
+def calc_dot_products(row_values_matrix, random_values, mult_vector_matrix=None):
+    """Calculate the dot products of all the rows with the 'mult_vector'.
+
+    Parameters
+    ----------
+    row_values_matrix : array-like, shape (number_of_jobs, 4)
+        The value_0 to value_3 values for each job.
+    random_values : array-like, shape (number_of_jobs,)
+        The random scalar noise value for each job.
+    mult_vector_matrix : array-like, shape (number_of_jobs, 4), optional
+        The multiplier vector of each job (default: the 'mult_vector' for all jobs).
+    """
+    row_values_matrix = np.asarray(row_values_matrix, dtype=float)
+    if mult_vector_matrix is None:
+        return (row_values_matrix @ mult_vector) * np.asarray(random_values, dtype=float)
+
+    return np.einsum(
+        "ij,ij->i", row_values_matrix, np.asarray(mult_vector_matrix, dtype=float)
+    ) * np.asarray(random_values, dtype=float)
+
+
+def calc_sweep_dot_products(row_values, mult_vector_matrix, random_value_matrix):
+    """Calculate the dot products of every multiplier vector, noise range, and replicate.
+
+    Parameters
+    ----------
+    row_values : array-like, shape (4,)
+        The value_0 to value_3 values of the Excel file.
+    mult_vector_matrix : array-like, shape (number_of_mult_vectors, 4)
+        The multiplier vectors.
+    random_value_matrix : array-like, shape (number_of_noise_ranges, replicates)
+        The random scalar noise value of each noise range and replicate.
+
+    Returns
+    -------
+    array, shape (number_of_mult_vectors, number_of_noise_ranges, replicates)
+    """
+    base_dot_products = np.asarray(mult_vector_matrix, dtype=float) @ np.asarray(
+        row_values, dtype=float
+    )
+
+    return base_dot_products[:, None, None] * np.asarray(random_value_matrix, dtype=float)[None]
+
+
+@contextlib.contextmanager
+def atomic_open(filename, mode="w"):
+    """Write a file, which only replaces 'filename' once it is fully written.
+
+    Each process writes its own temporary file, so two copies of the same
+    operation (Example: a speculated straggler in the 'local_executor.py'
+    file) never write to the same file, and a cancelled copy never leaves
+    a partly written output file.
+    """
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_filename, mode) as fp:
+            yield fp
+        os.replace(temporary_filename, filename)
+    finally:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+
+def julia_float_string(value):
+    """Get the text of a float in the same format as Julia's 'string(::Float64)'.
+
+    Both Python's 'repr' and Julia write the shortest digits that read back
+    as the same float, but Julia only writes the digits without an exponent
+    from 1e-4 up to (not including) 1e6, and writes an exponent as
+    '1.0e-5' or '1.234567e6' (Python: '1e-05' and '1234567.0').
+    """
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Inf" if value > 0 else "-Inf"
+    if value == 0:
+        return "-0.0" if math.copysign(1.0, value) < 0 else "0.0"
+
+    sign_str = "-" if value < 0 else ""
+    _, digit_tuple, exponent_int = decimal.Decimal(repr(abs(value))).normalize().as_tuple()
+    digits_str = "".join(str(d) for d in digit_tuple)
+    # the position of the decimal point from the first digit
+    point_int = exponent_int + len(digits_str)
+
+    if -4 < point_int <= 6:
+        if point_int <= 0:
+            return f"{sign_str}0.{'0' * -point_int}{digits_str}"
+        if point_int >= len(digits_str):
+            return f"{sign_str}{digits_str}{'0' * (point_int - len(digits_str))}.0"
+        return f"{sign_str}{digits_str[:point_int]}.{digits_str[point_int:]}"
+
+    return f"{sign_str}{digits_str[0]}.{digits_str[1:] or '0'}e{point_int - 1}"
+
+
+def write_dot_product_output_file(output_txt_filename, dot_product):
+    """Write the dot product output file in the same format as 'matrix.jl'."""
+    with atomic_open(output_txt_filename, "w") as fp:
+        fp.write(julia_float_string(dot_product))
+        fp.write("\nDot_Product                Calculations         Completed ")
+
+
+def chunk_row_stats(values):
+    """Get the (count, mean, M2, min, max) of a chunk of values, where M2 is the
+    sum of the squared differences from the mean."""
+    mean = values.mean()
+    return len(values), mean, float(((values - mean) ** 2).sum()), values.min(), values.max()
+
+
+def combine_row_stats(stats_a, stats_b):
+    """Combine the (count, mean, M2, min, max) of two sets of values (Chan et al.)."""
+    if stats_a is None:
+        return stats_b
+    count_a, mean_a, m2_a, min_a, max_a = stats_a
+    count_b, mean_b, m2_b, min_b, max_b = stats_b
+    count = count_a + count_b
+    delta = mean_b - mean_a
+
+    return (
+        count,
+        mean_a + delta * count_b / count,
+        m2_a + m2_b + delta**2 * count_a * count_b / count,
+        min(min_a, min_b),
+        max(max_a, max_b),
+    )
+
+
+def stream_row_dot_products(
+    value_chunk_iter, random_value_list, output_rows_filename_list, mult_vector_list=None
+):
+    """Calculate and write the dot products of every row for each replicate.
+
+    Parameters
+    ----------
+    value_chunk_iter : iterable of arrays, shape (chunk_rows, 4)
+        The value_0 to value_3 values of the rows, in chunks
+        (see 'excel_reader.iter_value_chunks').
+    random_value_list : list of float
+        The random scalar noise value of each replicate.
+    output_rows_filename_list : list of str
+        The binary rows output file of each replicate.
+    mult_vector_list : list of lists, optional
+        The multiplier vector of each replicate (default: the 'mult_vector').
+
+    Returns
+    -------
+    list of dict
+        The summary stats of each replicate's row dot products.
+    """
+    # the base (no noise) row dot products are only calculated once 
+    # for each different multiplier vector
+    if mult_vector_list is None:
+        mult_vector_list = [mult_vector] * len(random_value_list)
+    unique_mult_vectors, mult_vector_index_array = np.unique(
+        np.asarray(mult_vector_list, dtype=float).reshape(-1, 4), axis=0, return_inverse=True
+    )
+    mult_vector_index_array = mult_vector_index_array.reshape(-1)
+
+    base_stats_list = [None] * len(unique_mult_vectors)
+    with contextlib.ExitStack() as stack:
+        fp_list = [stack.enter_context(atomic_open(f, "wb")) for f in output_rows_filename_list]
+        for value_chunk in value_chunk_iter:
+            base_dot_products_matrix = value_chunk @ unique_mult_vectors.T
+            for i in range(len(unique_mult_vectors)):
+                base_stats_list[i] = combine_row_stats(
+                    base_stats_list[i], chunk_row_stats(base_dot_products_matrix[:, i])
+                )
+            for fp, random_value, i in zip(fp_list, random_value_list, mult_vector_index_array):
+                (base_dot_products_matrix[:, i] * random_value).astype("<f8").tofile(fp)
+
+    if base_stats_list[0] is None:
+        raise ValueError("ERROR: The Excel sheet has no data rows.")
+
+    # scaling all the values by a positive random value scales the stats
+    summary_dict_list = []
+    for r, i in zip(random_value_list, mult_vector_index_array):
+        count, mean, m2, min_value, max_value = base_stats_list[i]
+        summary_dict_list.append(
+            {
+                "rows": count,
+                "mean": float(mean * r),
+                "std_dev": float(np.sqrt(m2 / (count - 1)) * r) if count > 1 else 0.0,
+                "min": float(min_value * r),
+                "max": float(max_value * r),
+                "sum": float(mean * r * count),
+            }
+        )
+
+    return summary_dict_list
+
+
+def stream_column_means(value_chunk_iter):
+    """Get the (rows, mean value_0 to value_3 values) of every row, streaming the chunks.
+
+    As the dot product is linear, the mean row dot product of any multiplier
+    vector is the mean values' dot product with it.
+    """
+    rows_int = 0
+    column_sums = np.zeros(4)
+    for value_chunk in value_chunk_iter:
+        rows_int += len(value_chunk)
+        column_sums += value_chunk.sum(axis=0)
+    if rows_int == 0:
+        raise ValueError("ERROR: The Excel sheet has no data rows.")
+
+    return rows_int, column_sums / rows_int
+
+
+def write_row_summary_file(output_summary_filename, summary_dict):
+    """Write the summary stats of the row dot products (JSON)."""
+    with atomic_open(output_summary_filename, "w") as fp:
+        json.dump(summary_dict, fp, indent=2)
+
+
+def read_row_dot_products(output_rows_filename):
+    """Read the row dot products of a job (memory-mapped, so it is not loaded all at once)."""
+    return np.memmap(output_rows_filename, dtype="<f8", mode="r")
@@ -0,0 +1,327 @@
+"""Per-operation profiling of the project's operations"""
+# operation_profiler.py
+#
+# Records the resources used by every operation that is run (with 'run',
+# 'run-local', or in a submitted job script), using the signac-flow project
+# hooks, into a SQLite side store in the project's 'analysis' directory,
+# so the job documents are not rewritten.  For each operation it records:
+# - the wall time and the CPU time (user + system) of the python process,
+# - the CPU time of its subprocesses (Example: Julia) and the time spent
+#   waiting for the subprocesses run in a 'timed_subprocess' block (the
+#   Julia runs of the python operations).  It is not recorded (NULL) for the
+#   'cmd' operations, as the operation is the subprocess, so its runtime is
+#   the operation's wall time,
+# - the peak memory (RSS) of the python process and of its subprocesses,
+# - the bytes read and written by the python process.
+#
+# The time of every evaluation of the project's labels and of the operations'
+# pre and post conditions is also measured (Example: in 'status' or 'run'),
+# and the number of evaluations and their total and max times are recorded
+# once per pass, at the end of the project's buffered mode.
+#
+# The 'profile-report' project.py command rolls the records up into
+# per-operation histograms, flags the outliers, and compares the measured
+# walltime and memory with the operations' directives.
+#
+# The store is only written by one process at a time, while holding its lock
+# (see the 'sqlite_lock.py' file), as SQLite's own locking is not reliable on
+# a network/parallel filesystem.  It is off by default (see the
+# 'operation_profiling_bool' variable in the 'project.py' file), as every
+# operation adds a record.
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import resource
+import socket
+import sqlite3
+import time
+
+import sqlite_lock
+
+# The profile store file name, which is stored in the project's 'analysis' directory.
+profile_store_filename = "operation_profile.sqlite"
+
+# The total time (s) this process spent in the 'timed_subprocess' blocks
+_subprocess_s = 0.0
+
+
+@contextlib.contextmanager
+def timed_subprocess():
+    """Add the time of the subprocess run in the block to the operation's 'subprocess_s'."""
+    global _subprocess_s
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _subprocess_s += time.perf_counter() - start_time
+
+
+def read_proc_io():
+    """Get the (bytes read, bytes written) of this process (0, 0 if unknown)."""
+    try:
+        io_dict = {}
+        with open("/proc/self/io", "r") as fp:
+            for line in fp:
+                key, value = line.split(":")
+                io_dict[key] = int(value)
+        return io_dict["rchar"], io_dict["wchar"]
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def reset_peak_rss():
+    """Reset this process' peak RSS, so it is only the operation's peak (Linux only)."""
+    with contextlib.suppress(OSError):
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+
+
+def read_peak_rss_mb():
+    """Get the peak RSS (MB) of this process since the last reset."""
+    try:
+        with open("/proc/self/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class OperationProfiler:
+    """Record the resources used by a project's operations with the project hooks.
+
+    Parameters
+    ----------
+    project : FlowProject
+        The project.
+    cmd_operation_names : set of str
+        The 'cmd' operation names, whose runtime is their subprocess' runtime.
+    """
+
+    def __init__(self, project, cmd_operation_names=()):
+        self.store_filename = os.path.join(project.path, "analysis", profile_store_filename)
+        self.cmd_operation_names = set(cmd_operation_names)
+        self._start_dict = {}
+        # {(kind, name): [evaluations, total_s, max_s]} since the last write
+        self._evaluation_dict = {}
+        self._evaluation_started = time.time()
+
+    def install(self, project):
+        """Add the profiler to the project's hooks, and time its labels and conditions."""
+        project.project_hooks.on_start.append(self.on_start)
+        project.project_hooks.on_success.append(self.on_success)
+        project.project_hooks.on_exception.append(self.on_exception)
+
+        project._label_functions = {
+            self._timed("label", label_name or getattr(
+                label_function, "_label_name", label_function.__name__
+            ), label_function): label_name
+            for label_function, label_name in project._label_functions.items()
+        }
+        for operation_name, operation in project._operations.items():
+            for kind, condition_list in [
+                ("pre", operation._preconditions), ("post", operation._postconditions)
+            ]:
+                for i, condition in enumerate(condition_list):
+                    condition._callback = self._timed(
+                        kind,
+                        f"{operation_name} [{i}] {condition._callback.__name__}",
+                        condition._callback,
+                    )
+        # the evaluations after the last pass
+        atexit.register(self.write_evaluations)
+
+    def _timed(self, kind, name, function):
+        @functools.wraps(function)
+        def timed_function(*args):
+            start_time = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                evaluation_s = time.perf_counter() - start_time
+                evaluation = self._evaluation_dict.setdefault((kind, name), [0, 0.0, 0.0])
+                evaluation[0] += 1
+                evaluation[1] += evaluation_s
+                evaluation[2] = max(evaluation[2], evaluation_s)
+
+        return timed_function
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.store_filename), exist_ok=True)
+        connection = sqlite3.connect(self.store_filename, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS operation_profiles ("
+            "operation TEXT, "
+            "job_ids TEXT, "
+            "jobs INTEGER, "
+            "hostname TEXT, "
+            "started REAL, "
+            "succeeded INTEGER, "
+            "wall_s REAL, "
+            "cpu_s REAL, "
+            "subprocess_cpu_s REAL, "
+            "subprocess_s REAL, "
+            "peak_rss_mb REAL, "
+            "subprocess_peak_rss_mb REAL, "
+            "read_bytes INTEGER, "
+            "written_bytes INTEGER)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluation_profiles ("
+            "kind TEXT, "
+            "name TEXT, "
+            "hostname TEXT, "
+            "started REAL, "
+            "evaluations INTEGER, "
+            "total_s REAL, "
+            "max_s REAL)"
+        )
+        return connection
+
+    def _connect_read_only(self):
+        # the reads do not create the tables, as they only hold the shared lock
+        return sqlite3.connect(self.store_filename, timeout=60)
+
+    def on_start(self, operation_name, *jobs):
+        reset_peak_rss()
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._start_dict[(operation_name, tuple(j.id for j in jobs))] = (
+            time.time(),
+            time.perf_counter(),
+            self_usage.ru_utime + self_usage.ru_stime,
+            children_usage.ru_utime + children_usage.ru_stime,
+            read_proc_io(),
+            _subprocess_s,
+        )
+
+    def on_success(self, operation_name, *jobs):
+        self._record(operation_name, jobs, True)
+
+    def on_exception(self, operation_name, error, *jobs):
+        self._record(operation_name, jobs, False)
+
+    def _record(self, operation_name, jobs, succeeded_bool):
+        job_ids = tuple(j.id for j in jobs)
+        start = self._start_dict.pop((operation_name, job_ids), None)
+        if start is None:
+            return
+        (
+            started, start_perf_counter, start_cpu_s, start_children_cpu_s, start_io,
+            start_subprocess_s,
+        ) = start
+
+        wall_s = time.perf_counter() - start_perf_counter
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        read_bytes, written_bytes = read_proc_io()
+        subprocess_cpu_s = children_usage.ru_utime + children_usage.ru_stime - start_children_cpu_s
+
+        row = (
+            operation_name,
+            json.dumps(job_ids),
+            len(job_ids),
+            socket.gethostname(),
+            started,
+            int(succeeded_bool),
+            wall_s,
+            self_usage.ru_utime + self_usage.ru_stime - start_cpu_s,
+            subprocess_cpu_s,
+            None if operation_name in self.cmd_operation_names
+            else _subprocess_s - start_subprocess_s,
+            read_peak_rss_mb(),
+            # the subprocesses' peak RSS is the max of every subprocess waited
+            # for by this process, so it is only an upper bound
+            children_usage.ru_maxrss / 1024 if subprocess_cpu_s > 0 else 0.0,
+            read_bytes - start_io[0],
+            written_bytes - start_io[1],
+        )
+        try:
+            with sqlite_lock.locked_connection(self.store_filename, self._connect) as connection:
+                connection.execute(
+                    "INSERT INTO operation_profiles VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+        except (sqlite3.Error, OSError) as err:
+            # the profile is only for information, so the operation still succeeds
+            print(f"WARNING: Can not write the operation profile {self.store_filename}: {err}")
+
+    def write_evaluations(self):
+        """Record the label and condition evaluations since the last write."""
+        evaluation_dict, self._evaluation_dict = self._evaluation_dict, {}
+        started, self._evaluation_started = self._evaluation_started, time.time()
+        if len(evaluation_dict) == 0:
+            return
+        hostname = socket.gethostname()
+        try:
+            with sqlite_lock.locked_connection(self.store_filename, self._connect) as connection:
+                connection.executemany(
+                    "INSERT INTO evaluation_profiles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (kind, name, hostname, started, *evaluation)
+                        for (kind, name), evaluation in evaluation_dict.items()
+                    ],
+                )
+        except (sqlite3.Error, OSError) as err:
+            print(f"WARNING: Can not write the evaluation profile {self.store_filename}: {err}")
+
+    def _read_table(self, table_name):
+        if not os.path.isfile(self.store_filename):
+            return []
+        with sqlite_lock.locked_connection(
+            self.store_filename, self._connect_read_only, write_bool=False
+        ) as connection:
+            if connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+            ).fetchone() is None:
+                return []
+            cursor = connection.execute(f"SELECT * FROM {table_name}")
+            column_list = [c[0] for c in cursor.description]
+            return [dict(zip(column_list, row)) for row in cursor]
+
+    def read_profiles(self):
+        """Get all the operation profile records as a list of dicts."""
+        return self._read_table("operation_profiles")
+
+    def read_evaluation_profiles(self):
+        """Get all the label and condition evaluation records as a list of dicts."""
+        return self._read_table("evaluation_profiles")
+
+
+def text_histogram(value_list, bins=10, width=40, unit=""):
+    """Get a text histogram of the values as a list of lines."""
+    import numpy as np
+
+    value_array = np.asarray(value_list, dtype=float)
+    if value_array.min() == value_array.max():
+        # a single bin, as np.histogram would make bins from value - 0.5 to
+        # value + 0.5 (Example: negative times or memory for a small value)
+        counts, edges = np.array([len(value_array)]), np.array([value_array.min()] * 2)
+    else:
+        counts, edges = np.histogram(value_array, bins=bins)
+    max_count = max(counts.max(), 1)
+    return [
+        f"{edges[i]:>12.4g} - {edges[i + 1]:<12.4g}{unit} | "
+        f"{'#' * int(round(width * count / max_count)):<{width}} {count}"
+        for i, count in enumerate(counts)
+    ]
+
+
+def outliers(record_list, key, factor):
+    """Get the records whose value is more than 'factor' times the median absolute
+    deviation above the median."""
+    import numpy as np
+
+    value_array = np.array([r[key] for r in record_list])
+    median = np.median(value_array)
+    mad = np.median(np.abs(value_array - median))
+    if mad == 0:
+        mad = max(median * 0.1, 1e-9)
+
+    return [r for r in record_list if (r[key] - median) / mad > factor]
@@ -0,0 +1,133 @@
+"""Dense multiplier vector and noise range sweeps of the Excel files"""
+# parameter_sweep.py
+#
+# A few multiplier vectors and noise ranges can be run as regular jobs, with
+# the 'mult_vector' and 'noise_range' statepoints (see the 'init.py' file).
+# But sweeping thousands of multiplier vectors per Excel file that way would
+# create one job (directory) per Excel file, multiplier vector, noise range,
+# and replicate.
+#
+# Instead, a parameter sweep is a single job per Excel file, whose
+# 'parameter_sweep' statepoint describes the whole sweep:
+#   {
+#       "name": "grid_1_to_9",
+#       # [start, stop, number of values] of each of the 4 multiplier vector
+#       # values, where every combination of the values is used
+#       "mult_vector_grid": [[1, 9, 9], [1, 9, 9], [1, 9, 9], [1, 9, 9]],
+#       # the noise ranges, where the noise is a random value from min/10 to max/10
+#       "noise_range_list": [[1, 10], [5, 10]],
+#       "replicates_int": 10,
+#   }
+# The (multiplier vector x noise range x replicate) dot products of the
+# Excel file are calculated in one vectorized pass (see the
+# 'calc_sweep_dot_products' function in the 'numpy_engine.py' file), and
+# written to a single table file in the job's directory, with one row per
+# multiplier vector and noise range (see 'table_dtype').  The replicate noise
+# values are the same as the "numpy" part_2 engine's, so a sweep row gives the
+# same dot products as the regular jobs with that multiplier vector and noise range.
+#
+# Read a table in a notebook with:
+#   import parameter_sweep
+#   table = parameter_sweep.read_table(job.fn(parameter_sweep.table_filename))
+#   table["mult_vector"], table["noise_range"], table["dot_product_avg"], ...
+
+import itertools
+import os
+
+import numpy as np
+
+# The default multiplier vector and noise range, which are the same as
+# the ones in the 'src/julia/matrix.jl' file.
+default_mult_vector = [9, 8, 7, 6]
+default_noise_range = [1, 10]
+
+# The table file name, which is stored in each sweep job's directory.
+table_filename = "parameter_sweep_table.npy"
+
+
+def check_parameter_sweep(parameter_sweep_dict):
+    """Check that a parameter sweep statepoint is valid (raises a ValueError if not)."""
+    for key in ("name", "mult_vector_grid", "noise_range_list", "replicates_int"):
+        if key not in parameter_sweep_dict:
+            raise ValueError(f"ERROR: The parameter sweep is missing the '{key}' value.")
+    if len(parameter_sweep_dict["mult_vector_grid"]) != 4 or any(
+        len(grid) != 3 or grid[2] < 1 for grid in parameter_sweep_dict["mult_vector_grid"]
+    ):
+        raise ValueError(
+            "ERROR: The 'mult_vector_grid' must be 4 [start, stop, number of values] lists."
+        )
+    if len(parameter_sweep_dict["noise_range_list"]) == 0 or any(
+        len(noise_range) != 2 or not 1 <= noise_range[0] <= noise_range[1]
+        for noise_range in parameter_sweep_dict["noise_range_list"]
+    ):
+        raise ValueError(
+            "ERROR: The 'noise_range_list' must be [min, max] lists, with 1 <= min <= max."
+        )
+    if parameter_sweep_dict["replicates_int"] < 1:
+        raise ValueError("ERROR: The 'replicates_int' must be at least 1.")
+
+
+def sweep_mult_vectors(parameter_sweep_dict):
+    """Get every multiplier vector of the sweep's grid, shape (number_of_mult_vectors, 4)."""
+    axis_value_list = [
+        np.linspace(start, stop, int(number_of_values))
+        for start, stop, number_of_values in parameter_sweep_dict["mult_vector_grid"]
+    ]
+
+    return np.array(list(itertools.product(*axis_value_list)), dtype=float).reshape(-1, 4)
+
+
+def table_dtype(replicates_int):
+    """Get the table dtype, with one row per multiplier vector and noise range."""
+    return np.dtype(
+        [
+            ("mult_vector", "<f8", (4,)),
+            ("noise_range", "<i8", (2,)),
+            ("dot_product", "<f8", (replicates_int,)),
+            ("dot_product_avg", "<f8"),
+            ("dot_product_std_dev", "<f8"),
+        ]
+    )
+
+
+def make_table(mult_vector_matrix, noise_range_list, dot_product_tensor):
+    """Get the table of the (multiplier vector x noise range x replicate) dot products.
+
+    The std. dev. of the replicates uses ddof=1, like the part_3 replicate
+    averages (nan if there is only 1 replicate).
+    """
+    number_of_mult_vectors, number_of_noise_ranges, replicates_int = dot_product_tensor.shape
+    table = np.zeros(
+        number_of_mult_vectors * number_of_noise_ranges, dtype=table_dtype(replicates_int)
+    )
+    table["mult_vector"] = np.repeat(mult_vector_matrix, number_of_noise_ranges, axis=0)
+    table["noise_range"] = np.tile(np.asarray(noise_range_list), (number_of_mult_vectors, 1))
+    table["dot_product"] = dot_product_tensor.reshape(-1, replicates_int)
+    table["dot_product_avg"] = table["dot_product"].mean(axis=1)
+    if replicates_int > 1:
+        table["dot_product_std_dev"] = table["dot_product"].std(axis=1, ddof=1)
+    else:
+        table["dot_product_std_dev"] = np.nan
+
+    return table
+
+
+def write_table(filename, table):
+    """Atomically write a sweep table, so a partly written table is never read.
+
+    Each process writes its own temporary file, so two copies of a sweep
+    (Example: a speculated straggler) never write to the same file.
+    """
+    temporary_filename = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_filename, "wb") as fp:
+            np.save(fp, table)
+        os.replace(temporary_filename, filename)
+    finally:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+
+def read_table(filename):
+    """Read a sweep table (memory-mapped, so it is not loaded all at once)."""
+    return np.load(filename, mmap_mode="r")
@@ -0,0 +1,182 @@
+"""Output file prefetch benchmark on a simulated network filesystem"""
+# prefetch_benchmark.py
+#
+# Measures the wall time of getting every job's part_2 result from its
+# 'dot_product_output_file.txt' file, the way the labels and part_3 do (the
+# part_2b label, the part_3 dirty replicate groups, and the replicate dot
+# products), with:
+# - the sequential path : One output file at a time
+#                         ('output_prefetch_threads_int = 1').
+# - the prefetch : The output files are read with N threads at the same time
+#                  (see the 'prefetch' function in the 'results_index.py' file).
+# in this project (so run it in a project with the part_2 jobs completed).
+#
+# A network or parallel filesystem (Example: NFS, GPFS, or Lustre) is
+# simulated on the local disk by adding '--latency-ms' to every stat and open
+# of the output files, like a round trip to the file server.  The waiting
+# threads overlap, like they do on a real network filesystem.  Use
+# '--latency-ms 0' to only measure the local disk.
+#
+# The results store and the workspace shards are not used, as they do not
+# read the output files, and a temporary results index is used:
+# - cold : The index is empty, so every output file is stat'ed and parsed.
+# - warm : The index has every job, so the output files are only stat'ed.
+# The project's own results index and files are not changed.
+#
+# Command line usage (run from the project directory):
+#   python prefetch_benchmark.py
+#   python prefetch_benchmark.py --latency-ms 0 2 10 --threads 4 16 64 --report prefetch.json
+
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import project
+import results_index
+
+
+@contextlib.contextmanager
+def simulated_latency(latency_s, output_filename):
+    """Add 'latency_s' to every os.stat and open of the output files."""
+    original_stat = os.stat
+    original_open = builtins.open
+
+    def latency_stat(path, *args, **kwargs):
+        if str(path).endswith(output_filename):
+            time.sleep(latency_s)
+        return original_stat(path, *args, **kwargs)
+
+    def latency_open(file, *args, **kwargs):
+        if str(file).endswith(output_filename):
+            time.sleep(latency_s)
+        return original_open(file, *args, **kwargs)
+
+    os.stat = latency_stat
+    builtins.open = latency_open
+    try:
+        yield
+    finally:
+        os.stat = original_stat
+        builtins.open = original_open
+
+
+def use_temporary_index(pr, index_filename):
+    """Use a new in-memory results index, stored in the 'index_filename' file."""
+    index = results_index.ResultsIndex(pr.path)
+    index.index_filename = index_filename
+    results_index._indexes[pr.path] = index
+
+
+def read_results(pr, jobs):
+    """Get the jobs' results like the labels and part_3 do (prefetched if threads > 1)."""
+    with results_index.snapshot():
+        project.prefetch_dot_product_results(jobs)
+        completed_list = [project.part_2b_dot_product_calcs_completed_properly(j) for j in jobs]
+        dirty_group_key_list = sorted(project.dirty_replicate_group_keys(pr))
+        dot_product_list = [project.dot_product_result(j).dot_product for j in jobs]
+
+    return completed_list, dirty_group_key_list, dot_product_list
+
+
+def time_read_results(pr, jobs, threads_int, latency_s, cache_str, index_filename, repeats):
+    """Get the wall times (s) and the results of reading the jobs' results 'repeats' times."""
+    output_filename = f"{project.dot_product_output_filename_str}.txt"
+    project.output_prefetch_threads_int = threads_int
+    seconds_list = []
+    for _ in range(repeats):
+        if cache_str == "cold" and os.path.isfile(index_filename):
+            os.remove(index_filename)
+        use_temporary_index(pr, index_filename)
+        with simulated_latency(latency_s, output_filename):
+            start_time = time.perf_counter()
+            results = read_results(pr, jobs)
+            seconds_list.append(time.perf_counter() - start_time)
+
+    return seconds_list, results
+
+
+def benchmark(pr, latency_ms_list, threads_list, repeats):
+    """Measure the sequential and prefetched reads at each latency, cache state, and threads."""
+    jobs = [j for j in pr if project.is_regular_job(j)]
+    report_dict = {"jobs": len(jobs), "repeats": repeats, "runs": []}
+    temporary_directory = tempfile.mkdtemp(prefix="prefetch_benchmark_")
+    index_filename = os.path.join(temporary_directory, results_index.results_index_filename)
+    try:
+        for latency_ms in latency_ms_list:
+            for cache_str in ("cold", "warm"):
+                sequential_s = None
+                sequential_results = None
+                for threads_int in [1] + [t for t in threads_list if t > 1]:
+                    seconds_list, results = time_read_results(
+                        pr, jobs, threads_int, latency_ms / 1000, cache_str, index_filename, repeats
+                    )
+                    median_s = statistics.median(seconds_list)
+                    if threads_int == 1:
+                        sequential_s = median_s
+                        sequential_results = results
+                    report_dict["runs"].append(
+                        {
+                            "latency_ms": latency_ms,
+                            "cache": cache_str,
+                            "threads": threads_int,
+                            "median_s": median_s,
+                            "min_s": min(seconds_list),
+                            "speedup": sequential_s / median_s if median_s > 0 else None,
+                            "results_match": results == sequential_results,
+                        }
+                    )
+    finally:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        results_index._indexes.pop(pr.path, None)
+
+    return report_dict
+
+
+def print_report(report_dict):
+    print('*********************************************')
+    print(f'Output file reads of {report_dict["jobs"]} jobs ({report_dict["repeats"]} repeats), '
+          f'threads = 1 is the sequential path')
+    print('*********************************************')
+    print(f"{'latency (ms)': <14} {'cache': <7} {'threads': <9} {'median (s)': <12} "
+          f"{'speedup': <9} {'results match': <14}")
+    for run_dict in report_dict["runs"]:
+        speedup_str = "-" if run_dict["speedup"] is None else f"{run_dict['speedup']:.2f}x"
+        print(f"{run_dict['latency_ms']: <14} {run_dict['cache']: <7} {run_dict['threads']: <9} "
+              f"{run_dict['median_s']: <12.4f} {speedup_str: <9} {str(run_dict['results_match']): <14}")
+    print('*********************************************')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0, 2, 10],
+                        help="The simulated latencies (ms) of each stat and open of an output file.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[4, 16, 64],
+                        help="The numbers of prefetch threads to compare to the sequential path.")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="The number of times each read is measured.")
+    parser.add_argument("--report", default=None,
+                        help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    if not os.path.isfile("project.py"):
+        sys.exit("ERROR: Run the prefetch benchmark from the project directory.")
+    if project.workspace_storage_mode_str == "sharded":
+        sys.exit("ERROR: The output files are packed in the workspace shards, so they are "
+                 "not read from the job directories.")
+
+    # only use the output files (not the results store)
+    project.results_store_bool = False
+
+    pr = project.Project()
+    prefetch_report_dict = benchmark(pr, args.latency_ms, args.threads, args.repeats)
+    print_report(prefetch_report_dict)
+    if args.report is not None:
+        with open(args.report, "w") as fp:
+            json.dump(prefetch_report_dict, fp, indent=2)
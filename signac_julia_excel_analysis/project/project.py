@@ -1,14 +1,37 @@
 """Basic example of a signac project reading Excel files and calc dot product"""
 # project.py
 
+import argparse
+import contextlib
+import json
+import math
 import os
-import numpy as np
-import pandas as pd
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
 
 import flow
 from flow import FlowProject, aggregator
 from flow.environment import DefaultSlurmEnvironment
+from flow.project import FlowCmdOperation
+import adaptive_replicates
 import hpc_setup
+import julia_environment
+import local_executor
+import operation_profiler
+import quarantine
+import replicate_summary
+import results_index
+import results_store
+import workspace_shards
+
+# NOTE: The analysis modules (pandas, and the 'excel_cache', 'excel_reader', 
+# and 'numpy_engine' files, which import NumPy and openpyxl) are only imported
+# inside the operations and commands that use them, so 'python project.py status'
+# (which only evaluates the labels) starts quickly, and does not need them
+# installed.  Check the startup time with 'python startup_benchmark.py'.
 
 # ******************************************************
 # SIGNAC'S STARTING CODE SECTION (START)
@@ -20,6 +43,31 @@ class Project(FlowProject):
     def __init__(self):
         super().__init__()
 
+        # record the resources used by every operation, and the label and
+        # condition evaluation times (see 'operation_profiling_bool')
+        self._operation_profiler = None
+        if operation_profiling_bool:
+            self._operation_profiler = operation_profiler.OperationProfiler(
+                self,
+                cmd_operation_names={
+                    name for name, op in self._operations.items()
+                    if isinstance(op, FlowCmdOperation)
+                },
+            )
+            self._operation_profiler.install(self)
+
+    @contextlib.contextmanager
+    def _buffered(self):
+        """Use a single results index snapshot while the labels and conditions are evaluated."""
+        with super()._buffered(), results_index.snapshot():
+            # read the output files every job's labels and conditions need at 
+            # the same time, instead of one at a time while they are evaluated
+            prefetch_dot_product_results([job for job in self if is_regular_job(job)])
+            yield
+        if self._operation_profiler is not None:
+            # one record of each label and condition per pass
+            self._operation_profiler.write_evaluations()
+
 # ******************************************************
 # SIGNAC'S STARTING CODE SECTION (END)
 # ******************************************************
@@ -39,6 +87,15 @@ directory_path_to_excel_files_str = "src/data"
 dot_product_output_filename_str = "dot_product_output_file"
 output_avg_std_of_replicates_txt_filename = "output_avg_std_of_replicates_txt_filename"
 
+# The per-row dot products (binary little-endian float64) and their summary 
+# stats (JSON) files, which are only written in the "all_rows" part_2 mode
+dot_product_rows_filename_str = "dot_product_rows_float64"
+dot_product_summary_filename_str = "dot_product_summary"
+
+# The parameter sweep table file (.npy), which is only written for the 
+# parameter sweep jobs (see the 'parameter_sweep.py' file)
+parameter_sweep_table_filename_str = "parameter_sweep_table"
+
 # Set the walltime, memory, and number of CPUs and GPUs needed
 # for each individual job, based on the part/section.
 # *******************************************************
@@ -82,6 +139,185 @@ part_3_mem_per_cpu_gb = 4
 part_3_gpus_per_task = 0
 part_3_walltime_hr = 0.75
 
+# Select how the part_1 Excel values are read:
+# - "per_job" : Runs the 'part_1_initial_parameters_command' for every job.
+# - "bulk" : Runs the 'part_1_bulk_initial_parameters_command' once for all
+#            the jobs, which reads every Excel file only once (not once per 
+#            replicate) with 'part_1_bulk_processes_int' processes at the same 
+#            time, and reports the files/sec and peak memory (RSS).
+# - "fused" : Runs the 'part_1_2_fused_dot_product_calcs_command' for batches
+#             of up to 'part_1_2_fused_batch_size_int' jobs, which reads the
+#             Excel values (part_1) and runs the part_2 dot product calculations
+#             in one operation, passing the values straight to the part_2 
+#             engine, so each job only needs one scheduler slot (no queue wait
+#             between part_1 and part_2), and each Excel file in the batch is
+#             read once for all its replicates.  With the "julia" engine, all 
+#             the jobs in the batch are calculated by a single julia process.
+# All the modes only read the header and first data row of the Excel files.
+part_1_ingestion_mode_str = "per_job"
+part_1_bulk_processes_int = 4
+part_1_2_fused_batch_size_int = 1000
+
+# The values read from each Excel file are stored once for all the replicates 
+# in the 'excel_cache' directory, keyed by the Excel file's content hash,
+# so a changed Excel file is always re-read.  The least recently used values
+# are removed when the cache is larger than the 'excel_cache_max_size_mb'.
+# Set the 'excel_cache_max_size_mb = 0' to not use the cache.
+excel_cache_directory_str = "excel_cache"
+excel_cache_max_size_mb = 1024
+
+# Select the engine for the part_2 dot product calculations:
+# - "julia" : Runs the 'calc_dot_product' function in the 'src/julia/matrix.jl'
+#             file for each job (see 'part_2_julia_execution_mode_str').
+# - "numpy" : Stacks the Excel values of many jobs (up to 
+#             'part_2_numpy_batch_size_int' jobs) into one matrix and calculates
+#             all the dot products with a single matrix multiplication 
+#             (see the 'numpy_engine.py' file).  The random scalar noise uses a 
+#             seeded random number generator for each replicate, set by the 
+#             'part_2_random_seed_int', so the results are reproducible.
+# NOTE: DO NOT CHANGE THE ENGINE AFTER STARTING PROJECT, ONLY AT THE BEGINNING
+part_2_dot_product_engine_str = "julia"
+part_2_numpy_batch_size_int = 1000
+part_2_random_seed_int = 12345
+
+# Select which Excel rows the part_2 dot products are calculated for:
+# - "first_row" : Only the first data row (Excel row 2).
+# - "all_rows" : Every data row, streaming the sheet (in chunks of 
+#                'part_2_stream_chunk_rows_int' rows for the "numpy" engine, 
+#                and row by row with 'XLSX.eachrow' for the "julia" engine), 
+#                so the memory used is the same for any sheet length.  The row 
+#                dot products are written to the 'dot_product_rows_float64.bin' 
+#                file, their stats to the 'dot_product_summary.json' file, and
+#                the mean row dot product to the 'dot_product_output_file.txt' 
+#                file, which is used in part_3.
+# NOTE: DO NOT CHANGE THE MODE AFTER STARTING PROJECT, ONLY AT THE BEGINNING
+part_2_rows_mode_str = "first_row"
+part_2_stream_chunk_rows_int = 10000
+
+# Also store every part_2 result in a single project-level file
+# ('analysis/results_store_v1.bin', see the 'results_store.py' file), so the 
+# labels and part_3 read all the results from one memory-mapped file, instead
+# of opening every job's 'dot_product_output_file.txt' file.  The jobs that are
+# not in the store (Example: in a project started before the store was used)
+# still use their output files, or add them all to the store with
+# 'python project.py results-store migrate'.
+# NOTE: A job in the store stays completed even if its output file is removed,
+# so use 'python project.py results-store forget -j <job_id>' to rerun it.
+results_store_bool = True
+
+# The jobs' 'dot_product_output_file.txt' files that are not in the results
+# store (or the workspace shards) are read with 'output_prefetch_threads_int'
+# threads at the same time (see the 'prefetch' function in the 
+# 'results_index.py' file), before the labels and conditions are evaluated
+# (Example: in 'status' or 'run') and before part_3 gets the replicate values,
+# instead of one file at a time.  On a network or parallel filesystem 
+# (Example: NFS, GPFS, or Lustre), each file read is mostly waiting for a round
+# trip to the file server, so reading them at the same time cuts the wall time.
+# Measure it on your filesystem with 'python prefetch_benchmark.py'.
+# Use 1 to read the files one at a time.
+output_prefetch_threads_int = 16
+
+# Select how the job documents and part_2 output files are stored:
+# - "per_job_files" : Every job's directory has its 'signac_job_document.json'
+#                     file and part_2 output files.
+# - "sharded" : The job documents (the part_1 values) and the part_2 output 
+#               files are packed into 'workspace_shards_int' SQLite shard files
+#               in the 'workspace_shards' directory (see the 
+#               'workspace_shards.py' file), so each job's directory only has 
+#               its 'signac_statepoint.json' file, which signac needs.  
+#               This cuts the number of files (inodes) and the stat calls on 
+#               a parallel filesystem (Example: GPFS or Lustre).  The part_2 
+#               output files are packed as soon as each part_2 operation is 
+#               done.  Use 'python project.py workspace-shards pack' to pack 
+#               an existing project, and 'unpack' to move them back to files.
+# NOTE: DO NOT CHANGE THE 'workspace_shards_int' AFTER STARTING PROJECT.  
+#       Use about one shard per 1000 jobs.
+workspace_storage_mode_str = "per_job_files"
+workspace_shards_int = 16
+
+# The adaptive replicate settings, used by the 
+# 'python project.py adaptive-replicates' command (see the 
+# 'adaptive_replicates.py' file).  Every replicate group starts with the 
+# 'replicate_number' replicates in the 'init.py' file, and after part_2 only 
+# the groups whose relative std. error of the mean (|std. error / mean|) is 
+# above 'adaptive_target_relative_std_error' get 'adaptive_batch_replicates_int' 
+# more replicates, up to 'adaptive_max_replicates_int' replicates per group.
+# The saved jobs are reported against 'adaptive_fixed_replicates_int' 
+# replicates for every group.
+adaptive_target_relative_std_error = 0.05
+adaptive_batch_replicates_int = 2
+adaptive_max_replicates_int = 10
+adaptive_fixed_replicates_int = 10
+
+# Select how the part_3 replicate averages and std. devs. are calculated:
+# - "per_group" : Runs the 'part_3_analysis_replicate_averages_command' once 
+#                 per replicate group, appending each group's row to the
+#                 replicate summary file.
+# - "whole_project" : Runs the 'part_3_analysis_whole_project_command' once, 
+#                     which gathers all the replicate dot products in one pass,
+#                     calculates the avg and std. dev. of every new group with a 
+#                     single grouped reduction (the other groups only add
+#                     their new replicates), and atomically writes the whole 
+#                     replicate summary file.
+part_3_analysis_mode_str = "per_group"
+
+# Select how the part_2 Julia dot product calculations are run:
+# - "per_process" : Starts a new 'julia --load matrix.jl' process for every job,
+#                   which pays the Julia startup, JIT compile, and 'Pkg.add'
+#                   time for every job.
+# - "server" : Keeps a pool of long-lived Julia servers per node (or per 
+#              Slurm allocation/bundle) running, and each job sends its
+#              'calc_dot_product' request to them over a local socket 
+#              (see the 'julia_server.py' file).
+# NOTE: Compare the two modes with 'python julia_server.py benchmark'.
+part_2_julia_execution_mode_str = "per_process"
+
+# The number of Julia servers in the pool per node or bundle 
+# (only used in the "server" mode).
+part_2_julia_server_workers_int = 1
+
+# The local resources used by 'python project.py run-local', which runs the 
+# eligible operations across a pool of worker processes on this computer
+# (Example: a workstation or an interactive node), only starting an operation
+# if its cores and memory (from the 'np', 'cpus-per-task', and 'mem-per-cpu'
+# directives above) fit in the free cores and memory.
+# Set them to 0 to use all the available cores or memory.
+local_executor_cores_int = 0
+local_executor_mem_gb = 0
+
+# The failed and straggler operations in 'python project.py run-local' 
+# (see the 'local_executor.py' file):
+# - A failed operation (Example: a transient filesystem error) is retried up to
+#   'local_executor_retries_int' times, waiting 'local_executor_retry_backoff_s'
+#   seconds before the first retry, and twice as long before each next retry.
+# - A second copy of a NumPy part_2 operation (the "numpy" engine or a 
+#   parameter sweep) is started if it runs longer than 
+#   'local_executor_speculation_factor' times the median wall time of the 
+#   completed ones, and the first copy to finish is used (0 to not speculate).
+#   The Julia part_2 operations are not speculated, as their random noise 
+#   is not seeded, so two copies would write different dot products.
+# - An Excel file is quarantined (see the 'quarantine.py' file) after 
+#   'local_executor_quarantine_failures_int' of its operations failed on every
+#   attempt with the same error (0 to not quarantine).  The part_1 and part_2 
+#   operations skip the jobs of the quarantined Excel files, so the other 
+#   replicate groups can finish.  See the quarantined Excel files with 
+#   'python project.py quarantine list'.
+local_executor_retries_int = 2
+local_executor_retry_backoff_s = 5
+local_executor_speculation_factor = 3
+local_executor_quarantine_failures_int = 2
+
+# Record the wall time, CPU time, peak memory (RSS), bytes read and written,
+# and the subprocess (Julia) runtime of every operation that is run, and the
+# time of every label and pre/post condition evaluation in the
+# 'analysis/operation_profile.sqlite' file (see the 'operation_profiler.py' file).
+# Use 'python project.py profile-report' to see the per-part histograms and 
+# outliers, and the suggested walltime and memory directives above.
+# It is off by default, as every operation writes a record to the same
+# file (one operation at a time, see the 'sqlite_lock.py' file), so it is
+# best turned on for a profiling run, not for every run of a large project.
+operation_profiling_bool = False
+
 # ******************************************************
 # TYPICAL USER VARIBLES THAT CHANGE (END)
 # ******************************************************
@@ -101,9 +337,79 @@ project_directory = f"{os.getcwd()}"
 print(f"project_directory = {project_directory}")
 
 
+# Get the project's workspace shards (only used in the "sharded" workspace mode)
+def get_workspace_shards(project):
+    """Get the project's workspace shards."""
+    return workspace_shards.WorkspaceShards(project.path, workspace_shards_int)
+
+
+# Check if the job's document is in the workspace shards, reading all the
+# shards only once per results index snapshot (Example: in 'status')
+def sharded_document_exists(job):
+    """Check if the job's document is in the workspace shards."""
+    if results_index.snapshot_active():
+        return job.id in results_index.memoize(
+            ("sharded_document_job_ids", job.project.path),
+            lambda: workspace_shards.read_all_document_job_ids(job.project.path),
+        )
+
+    return get_workspace_shards(job.project).read_document(job.id) is not None
+
+
+# Get the job's document values, from its shard in the "sharded" workspace mode
+def job_document(job):
+    """Get the job's document."""
+    if workspace_storage_mode_str == "sharded":
+        document = get_workspace_shards(job.project).read_document(job.id)
+        if document is not None:
+            return document
+
+    return job.doc
+
+
+# The parameter sweep jobs (see the 'parameter_sweep_list' in the 'init.py' file) 
+# are only run by the 'part_2_parameter_sweep_command', not the other operations
+def is_parameter_sweep_job(job):
+    """Check if the job is a parameter sweep job."""
+    return "parameter_sweep" in job.cached_statepoint
+
+
+def is_regular_job(job):
+    """Check if the job is a regular (not a parameter sweep) job."""
+    return "parameter_sweep" not in job.cached_statepoint
+
+
+# Get the job's multiplier vector and noise range (see the 'init.py' file),
+# which are only in the statepoint if they are not the default values
+def job_mult_vector_noise_range(job):
+    """Get the job's (mult_vector, noise_range), or None if they are the default values."""
+    if "mult_vector" not in job.cached_statepoint and "noise_range" not in job.cached_statepoint:
+        return None
+
+    import parameter_sweep
+
+    return (
+        job.cached_statepoint.get("mult_vector", parameter_sweep.default_mult_vector),
+        job.cached_statepoint.get("noise_range", parameter_sweep.default_noise_range),
+    )
+
+
+# Check if the job's Excel file is quarantined (see the 'quarantine.py' file),
+# reading the quarantine list only once per results index snapshot
+def is_quarantined(job):
+    """Check if the job's Excel file is in the quarantine list."""
+    return job.sp.excel_filename_wo_ext in results_index.memoize(
+        ("quarantined_excel_files", job.project.path),
+        lambda: set(quarantine.load_quarantine(job.project.path)),
+    )
+
+
 @Project.label
 def part_1_initial_parameters_completed(job):
     """Check that the data is generated and in the json files."""
+    if workspace_storage_mode_str == "sharded" and sharded_document_exists(job):
+        return True
+
     data_written_bool = False
     if job.isfile(f"{'signac_job_document.json'}"):
         data_written_bool = True
@@ -111,6 +417,43 @@ def part_1_initial_parameters_completed(job):
     return data_written_bool
 
 
+# Set the job.doc values from the Excel file values
+def set_initial_parameters(job, excel_values_dict):
+    """Set the system's job parameters in the json file."""
+    # Creating a new json file with user built variables (doc)
+    document_dict = {
+        "value_0_int": excel_values_dict['value_0'],
+        "value_1_int": excel_values_dict['value_1'],
+        "value_2_int": excel_values_dict['value_2'],
+        "value_3_int": excel_values_dict['value_3'],
+        "excel_filename_wo_ext": job.sp.excel_filename_wo_ext,
+        # Print the 'replicate number' on the .doc file also
+        "replicate_number_int": job.sp.replicate_number_int,
+    }
+
+    # in the "sharded" workspace mode, the document is stored in the job's shard
+    if workspace_storage_mode_str == "sharded":
+        get_workspace_shards(job.project).update_documents({job.id: document_dict})
+    else:
+        job.doc.update(document_dict)
+
+
+# Get the project's Excel cache (None if the cache is not used)
+def get_excel_cache():
+    """Get the project's Excel values cache."""
+    if excel_cache_max_size_mb <= 0:
+        return None
+
+    import excel_cache
+
+    return excel_cache.ExcelCache(
+        f'{project_directory}/{excel_cache_directory_str}', excel_cache_max_size_mb
+    )
+
+
+@Project.pre(lambda job: part_1_ingestion_mode_str == "per_job")
+@Project.pre(is_regular_job)
+@Project.pre(lambda job: not is_quarantined(job))
 @Project.post(part_1_initial_parameters_completed)
 @Project.operation(directives=
     {
@@ -123,12 +466,7 @@ def part_1_initial_parameters_completed(job):
 )
 def part_1_initial_parameters_command(job):
     """Set the system's job parameters in the json file."""
-    
-    # If any previous replicate averages and std_devs exist delete them, 
-    # because they will need recalculated as more state points were added.
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_filename}.txt'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_filename}.txt')
-
+    import excel_reader
 
     # Note: the sp=setpoint variables (from init.py file), doc=user documented variables
 
@@ -140,20 +478,51 @@ def part_1_initial_parameters_command(job):
     
     print('*********************************************')
     print(f'excel_filename = {excel_filename}\n')
-    excel_df = pd.read_excel(excel_filename, "Sheet1")
-    print(f'excel_df =\n {excel_df}')
+    excel_values_dict = excel_reader.read_first_row_values_cached(
+        excel_filename, "Sheet1", get_excel_cache()
+    )
+    print(f'excel_values_dict =\n {excel_values_dict}')
     print('*********************************************')
 
-    # Creating a new json file with user built variables (doc)
-    job.doc.value_0_int = list(excel_df.loc[:, 'value_0'])[0]
-    job.doc.value_1_int = list(excel_df.loc[:, 'value_1'])[0]
-    job.doc.value_2_int = list(excel_df.loc[:, 'value_2'])[0]
-    job.doc.value_3_int = list(excel_df.loc[:, 'value_3'])[0]
+    set_initial_parameters(job, excel_values_dict)
 
-    job.doc.excel_filename_wo_ext = job.sp.excel_filename_wo_ext
-    
-    # Print the 'replicate number' on the .doc file also
-    job.doc.replicate_number_int = job.sp.replicate_number_int
+
+@Project.pre(lambda *jobs: part_1_ingestion_mode_str == "bulk")
+@Project.post(lambda *jobs: all(
+    part_1_initial_parameters_completed(j) or is_quarantined(j) for j in jobs
+))
+@Project.operation(directives=
+    {
+        "np": part_1_ntasks,
+        "cpus-per-task": part_1_bulk_processes_int,
+        "gpus-per-task": part_1_gpus_per_task,
+        "mem-per-cpu": part_1_mem_per_cpu_gb,
+        "walltime": part_1_walltime_hr,
+    }, aggregator=aggregator(select=is_regular_job)
+)
+def part_1_bulk_initial_parameters_command(*jobs):
+    """Set the job parameters of all the jobs, reading each Excel file only once."""
+    import excel_reader
+
+    jobs_to_run = [
+        j for j in jobs if not part_1_initial_parameters_completed(j) and not is_quarantined(j)
+    ]
+    excel_filename_dict = {
+        j.id: f'{project_directory}/'
+              f'{directory_path_to_excel_files_str}/'
+              f'{j.sp.excel_filename_wo_ext}.xlsx'
+        for j in jobs_to_run
+    }
+
+    excel_values_by_filename_dict = excel_reader.read_workbooks(
+        list(excel_filename_dict.values()),
+        "Sheet1",
+        processes=part_1_bulk_processes_int,
+        excel_cache=get_excel_cache(),
+    )
+
+    for j in jobs_to_run:
+        set_initial_parameters(j, excel_values_by_filename_dict[excel_filename_dict[j.id]])
 
 # ******************************************************
 # CREATE THE INITIAL VARIABLES, WHICH WILL BE STORED IN 
@@ -165,9 +534,127 @@ def part_1_initial_parameters_command(job):
 # ******************************************************
 
 # Replaces runs can be looped together to average as needed
+# (the cached statepoint has plain values, Example: the 'mult_vector' list,
+# which can be compared and written as JSON)
 def statepoint_without_replicate(job):
-    keys = sorted(tuple(j for j in job.sp.keys() if j not in {"replicate_number_int"}))
-    return [(key, job.sp[key]) for key in keys]
+    statepoint = job.cached_statepoint
+    keys = sorted(tuple(j for j in statepoint.keys() if j not in {"replicate_number_int"}))
+    return [(key, statepoint[key]) for key in keys]
+
+
+# The replicate groups are keyed by their statepoint without the replicate
+def replicate_group_key(job):
+    """Get the replicate group key of the job."""
+    return json.dumps(statepoint_without_replicate(job))
+
+
+# Get the per-group replicate summary store of the project, which also
+# writes the replicate averages and std. devs. summary file
+def get_replicate_summary(project):
+    """Get the project's replicate summary store."""
+    return replicate_summary.ReplicateSummary(
+        f'{project.path}/analysis/{output_avg_std_of_replicates_txt_filename}.txt'
+    )
+
+
+# The fingerprint of a group's member jobs' output files, which 
+# changes if any member's output changes or a member is added or removed
+def replicate_group_fingerprint(jobs):
+    """Get the output files fingerprint of a replicate group's jobs."""
+    member_output_list = []
+    for job in jobs:
+        job_result = dot_product_result(job)
+        member_output_list.append((job.id, job_result.output_mtime_ns, job_result.output_size))
+
+    return replicate_summary.group_fingerprint(member_output_list)
+
+
+# Get the replicate groups that need (re)calculated in part_3
+def dirty_replicate_group_keys(project):
+    """Get the set of replicate group keys whose stored fingerprint is out of date."""
+    def find_dirty_group_keys():
+        group_jobs_dict = defaultdict(list)
+        for job in project:
+            if is_regular_job(job):
+                group_jobs_dict[replicate_group_key(job)].append(job)
+
+        stored_fingerprint_dict = get_replicate_summary(project).read_fingerprints()
+
+        return {
+            group_key for group_key, group_jobs in group_jobs_dict.items()
+            if stored_fingerprint_dict.get(group_key) != replicate_group_fingerprint(group_jobs)
+        }
+
+    return results_index.memoize(("dirty_replicate_groups", project.path), find_dirty_group_keys)
+
+
+# Update the running replicate statistics of the groups, only adding the
+# new (or changed) replicates' dot products, and store them
+def update_replicate_group_stats(project, group_jobs_dict):
+    """Update and store the running statistics of the replicate groups.
+
+    Parameters
+    ----------
+    group_jobs_dict : dict
+        {group_key: list of the group's jobs}
+
+    Returns
+    -------
+    list of the stored group rows, and the number of added replicates.
+    """
+    replicate_summary_store = get_replicate_summary(project)
+    stored_group_stats_dict = replicate_summary_store.read_group_stats(list(group_jobs_dict))
+
+    group_change_dict = {}
+    group_fingerprint_dict = {}
+    for group_key, group_jobs in group_jobs_dict.items():
+        group_job_dict = {job.id: job for job in group_jobs}
+        current_member_dict = {}
+        for job in group_jobs:
+            job_result = dot_product_result(job)
+            current_member_dict[job.id] = (job_result.output_mtime_ns, job_result.output_size)
+
+        def get_dot_product(job_id):
+            job_dot_product = dot_product_result(group_job_dict[job_id]).dot_product
+            if job_dot_product is None:
+                raise ValueError("ERROR: The format of the dot_product output files are wrong.")
+            return job_dot_product
+
+        group_stats, stored_member_dict = stored_group_stats_dict.get(group_key, (None, {}))
+        group_change_dict[group_key] = replicate_summary.group_member_changes(
+            group_stats, stored_member_dict, current_member_dict, get_dot_product
+        )
+        group_fingerprint_dict[group_key] = replicate_summary.group_fingerprint(
+            [(job_id, *member_output) for job_id, member_output in current_member_dict.items()]
+        )
+
+    # the groups without stored statistics are calculated with one grouped
+    # reduction, and the others only add their new (or changed) replicates
+    group_stats_dict = replicate_summary.update_groups_stats(group_change_dict)
+
+    group_row_list = []
+    member_change_list = []
+    added_replicates_int = 0
+    for group_key, (_, added_member_dict, removed_job_id_list) in group_change_dict.items():
+        count, mean, m2 = group_stats_dict[group_key]
+        added_replicates_int += len(added_member_dict)
+        group_row_list.append(
+            (
+                group_key,
+                group_jobs_dict[group_key][0].sp.excel_filename_wo_ext,
+                group_fingerprint_dict[group_key],
+                count,
+                mean,
+                m2,
+                replicate_summary.running_std_dev(count, m2),
+            )
+        )
+        member_change_list.append((group_key, added_member_dict, removed_job_id_list))
+
+    # store (or replace) only these groups' rows, which also updates the summary file
+    replicate_summary_store.write_groups(group_row_list, member_change_list)
+
+    return group_row_list, added_replicates_int
 
 # ******************************************************
 # FUNCTIONS ARE FOR GETTTING AND AGGREGATING DATA (END)
@@ -178,42 +665,125 @@ def statepoint_without_replicate(job):
 # PERFORM THE dot_product CALCULATIONS (START)
 # ******************************************************
 
+# Get the dot_product output file results from the project's results index
+# (analysis/results_index.sqlite), which only re-reads the output file
+# if it changed since it was last indexed.
+def dot_product_result(job):
+    """Get the indexed dot_product output file result of the job."""
+    job_result = stored_dot_product_result(job)
+    if job_result is not None:
+        return job_result
+
+    return results_index.job_result(job, f"{dot_product_output_filename_str}.txt")
+
+
+# Get the job's result from the results store or the workspace shards, 
+# which does not need to read the job's output file
+def stored_dot_product_result(job):
+    """Get the stored dot_product result of the job (None if it is not stored)."""
+    if results_store_bool:
+        job_result = results_store.job_result(job)
+        if job_result is not None:
+            return job_result
+
+    if workspace_storage_mode_str == "sharded":
+        return sharded_dot_product_result(job)
+
+    return None
+
+
+# Read the output files of the jobs that are not stored yet at the same time 
+# (with 'output_prefetch_threads_int' threads) into the results index snapshot,
+# so the following 'dot_product_result' calls do not read them one at a time
+def prefetch_dot_product_results(jobs):
+    """Read the jobs' (not stored) dot_product output files concurrently."""
+    if output_prefetch_threads_int <= 1 or not results_index.snapshot_active():
+        return
+
+    results_index.prefetch(
+        [job for job in jobs if stored_dot_product_result(job) is None],
+        f"{dot_product_output_filename_str}.txt",
+        output_prefetch_threads_int,
+    )
+
+
+# Get the result of the job's output file packed in the workspace shards,
+# reading all the shards only once per results index snapshot (Example: in 'status')
+def sharded_dot_product_result(job):
+    """Get the JobResult of the job's packed output file (None if it is not packed)."""
+    output_filename = f"{dot_product_output_filename_str}.txt"
+    if results_index.snapshot_active():
+        packed_file = results_index.memoize(
+            ("sharded_output_files", job.project.path),
+            lambda: workspace_shards.read_all_files(job.project.path, output_filename),
+        ).get(job.id)
+    else:
+        packed_file = get_workspace_shards(job.project).read_file(job.id, output_filename)
+    if packed_file is None:
+        return None
+
+    content, output_mtime_ns, output_size = packed_file
+    return results_index.parse_dot_product_output(content.decode())._replace(
+        output_mtime_ns=output_mtime_ns, output_size=output_size
+    )
+
+
+# Check if every job in the project completed the dot_product calculations
+# (the jobs of the quarantined Excel files are skipped)
+def all_dot_product_calcs_completed(project):
+    """Check if the dot_product calcs of every (not quarantined) job completed properly."""
+    return results_index.memoize(
+        ("all_dot_product_calcs_completed", project.path),
+        lambda: all(
+            dot_product_result(job).completed for job in project
+            if is_regular_job(job) and not is_quarantined(job)
+        ),
+    )
+
+
+# Add the jobs' dot_product output file results to the project's results store,
+# and pack the output files into the workspace shards in the "sharded" mode
+def store_dot_product_results(*jobs):
+    """Add the jobs' dot_product results to the results store (and the workspace shards)."""
+    if results_store_bool and len(jobs) > 0:
+        results_store.store_output_files(
+            jobs[0].project.path,
+            {job.id: job.fn(f"{dot_product_output_filename_str}.txt") for job in jobs},
+        )
+
+    if workspace_storage_mode_str == "sharded" and len(jobs) > 0:
+        get_workspace_shards(jobs[0].project).pack_files(
+            jobs,
+            [
+                f"{dot_product_rows_filename_str}.bin",
+                f"{dot_product_summary_filename_str}.json",
+                f"{dot_product_output_filename_str}.txt",
+            ],
+        )
+
+
 # check to see if the dot_product calculations started
 @Project.label 
 def part_2a_dot_product_calcs_started(job):
     """Check to see if the dot_product calculations started."""
-    output_started_bool = False
-    if job.isfile(f"{dot_product_output_filename_str}.txt"):
-        output_started_bool = True
-
-    return output_started_bool
+    return dot_product_result(job).started
 
 
 # check to see if the dot_product calculations completed correctly
 @Project.label
 def part_2b_dot_product_calcs_completed_properly(job):
     """Check if the dot_product calcs completed properly."""
-    job_run_properly_bool = False
-    output_log_file = f"{dot_product_output_filename_str}.txt"
-    if job.isfile(output_log_file):
-        with open(job.fn(output_log_file), "r") as fp:
-            output_line = fp.readlines()
-            for i, line in enumerate(output_line):
-                split_move_line = line.split()
-                if "Dot_Product" in line and len(split_move_line) == 3:
-                    if (
-                        split_move_line[0] == "Dot_Product"
-                        and split_move_line[1] == "Calculations"
-                        and split_move_line[2] == "Completed"
-                    ):
-                        job_run_properly_bool = True
-    else:
-        job_run_properly_bool = False
-
-    return job_run_properly_bool
+    return dot_product_result(job).completed
 
 
 
+# add the result to the results store after the julia command succeeds
+@Project.operation_hooks.on_success(
+    lambda operation_name, *jobs: store_dot_product_results(*jobs)
+)
+@Project.pre(lambda job: part_2_dot_product_engine_str == "julia")
+@Project.pre(is_regular_job)
+@Project.pre(lambda job: not is_quarantined(job))
 @Project.pre(part_1_initial_parameters_completed)
 @Project.post(part_2a_dot_product_calcs_started)
 @Project.post(part_2b_dot_product_calcs_completed_properly)
@@ -230,24 +800,428 @@ def part_2_julia_dot_product_calcs_command(job):
     """Run the julia dot product calculations via a bash command."""
 
     julia_file = "../../src/julia/matrix.jl"
-    excel_filename_julia = f'{job.doc.excel_filename_wo_ext}.xlsx'
+    excel_filename_julia = f'{job.sp.excel_filename_wo_ext}.xlsx'
     excel_sheetname_julia = f'Sheet1'
     dot_product_output_filename_julia = "dot_product_output_file.txt"
-    dot_p = f'calc_dot_product("../../{directory_path_to_excel_files_str}/{excel_filename_julia}", ' \
-        f'"{excel_sheetname_julia}", "{dot_product_output_filename_julia}", "{job.doc.replicate_number_int}") '
+    dot_product_rows_filename_julia = f"{dot_product_rows_filename_str}.bin"
+    dot_product_summary_filename_julia = f"{dot_product_summary_filename_str}.json"
+
+    # the multiplier vector and noise range are only passed if they are 
+    # not the default values in the 'matrix.jl' file
+    mult_vector_noise_range = job_mult_vector_noise_range(job)
+    sweep_args_julia = ""
+    if mult_vector_noise_range is not None:
+        mult_vector_julia, noise_range_julia = mult_vector_noise_range
+        sweep_args_julia = f', {[float(v) for v in mult_vector_julia]}, ' \
+            f'{[int(v) for v in noise_range_julia]}'
+
+    if part_2_rows_mode_str == "first_row":
+        dot_p = f'calc_dot_product("../../{directory_path_to_excel_files_str}/{excel_filename_julia}", ' \
+            f'"{excel_sheetname_julia}", "{dot_product_output_filename_julia}", "{job.sp.replicate_number_int}"' \
+            f'{sweep_args_julia}) '
+
+    elif part_2_rows_mode_str == "all_rows":
+        dot_p = f'calc_dot_product_all_rows("../../{directory_path_to_excel_files_str}/{excel_filename_julia}", ' \
+            f'"{excel_sheetname_julia}", "{dot_product_output_filename_julia}", ' \
+            f'"{dot_product_rows_filename_julia}", "{dot_product_summary_filename_julia}", ' \
+            f'"{job.sp.replicate_number_int}"{sweep_args_julia}) '
+
+    else:
+        raise ValueError("ERROR: The 'part_2_rows_mode_str' must be 'first_row' or 'all_rows'.")
     
 
     # Run the julia command to do dot product
     print('*********************************************')
     print(f"Running job id {job}")
-    run_command = f"julia --load '{julia_file}' -e '{dot_p}'"\
-   
+    if part_2_julia_execution_mode_str == "per_process":
+        # uses the pinned environment and sysimage if they are built
+        # (see the 'julia_environment.py' file)
+        run_command = f"{julia_environment.julia_command_str()} --load '{julia_file}' -e '{dot_p}'"
+
+    elif part_2_julia_execution_mode_str == "server":
+        # the servers do not run in the job's directory, so use full paths
+        run_command = f"python '{project_directory}/julia_server.py' calc " \
+            f"'{project_directory}/{directory_path_to_excel_files_str}/{excel_filename_julia}' " \
+            f"'{excel_sheetname_julia}' '{job.fn(dot_product_output_filename_julia)}' " \
+            f"'{job.sp.replicate_number_int}' " \
+            f"--workers {part_2_julia_server_workers_int} --worker-key {job.id}"
+        if part_2_rows_mode_str == "all_rows":
+            run_command += f" --rows-output '{job.fn(dot_product_rows_filename_julia)}' " \
+                f"--summary-output '{job.fn(dot_product_summary_filename_julia)}'"
+        if mult_vector_noise_range is not None:
+            run_command += f" --mult-vector {' '.join(str(float(v)) for v in mult_vector_julia)} " \
+                f"--noise-range {' '.join(str(int(v)) for v in noise_range_julia)}"
+
+    else:
+        raise ValueError(
+            "ERROR: The 'part_2_julia_execution_mode_str' must be 'per_process' or 'server'."
+        )
+
     print(f'run command = {run_command}')
     print('*********************************************')
 
     return run_command
 
 
+# Get the jobs' random scalar noise values and multiplier vectors for the "numpy" engine
+def numpy_random_values_mult_vectors(jobs):
+    """Get the jobs' (random scalar noise values, multiplier vectors or None if all default)."""
+    import numpy_engine
+    import parameter_sweep
+
+    random_value_list = []
+    mult_vector_list = []
+    for j in jobs:
+        mult_vector_noise_range = job_mult_vector_noise_range(j)
+        if mult_vector_noise_range is None:
+            mult_vector_noise_range = (
+                parameter_sweep.default_mult_vector, parameter_sweep.default_noise_range
+            )
+        random_value_list.append(
+            numpy_engine.replicate_random_value(
+                j.sp.excel_filename_wo_ext,
+                j.sp.replicate_number_int,
+                part_2_random_seed_int,
+                mult_vector_noise_range[1],
+            )
+        )
+        mult_vector_list.append(mult_vector_noise_range[0])
+
+    # the default multiplier vector is used for all the jobs if none is set
+    if all(job_mult_vector_noise_range(j) is None for j in jobs):
+        mult_vector_list = None
+
+    return random_value_list, mult_vector_list
+
+
+# Stream every row of each Excel file once for all its replicates in the batch
+def numpy_all_rows_dot_product_calcs(jobs_to_run):
+    """Calculate the dot products of every Excel row of the jobs with NumPy."""
+    import excel_reader
+    import numpy_engine
+
+    excel_filename_jobs_dict = defaultdict(list)
+    for j in jobs_to_run:
+        excel_filename_jobs_dict[j.sp.excel_filename_wo_ext].append(j)
+
+    print('*********************************************')
+    print(f"Streaming all the rows of {len(excel_filename_jobs_dict)} Excel files "
+          f"for {len(jobs_to_run)} jobs in the NumPy batch")
+    print('*********************************************')
+    for excel_filename_wo_ext, excel_jobs in excel_filename_jobs_dict.items():
+        excel_filename = f'{project_directory}/'\
+                         f'{directory_path_to_excel_files_str}/'\
+                         f'{excel_filename_wo_ext}.xlsx'
+        random_value_list, mult_vector_list = numpy_random_values_mult_vectors(excel_jobs)
+        summary_dict_list = numpy_engine.stream_row_dot_products(
+            excel_reader.iter_value_chunks(
+                excel_filename, "Sheet1", chunk_rows=part_2_stream_chunk_rows_int
+            ),
+            random_value_list,
+            [j.fn(f"{dot_product_rows_filename_str}.bin") for j in excel_jobs],
+            mult_vector_list,
+        )
+
+        # the output file is written last, as it marks the job as completed
+        for j, summary_dict in zip(excel_jobs, summary_dict_list):
+            numpy_engine.write_row_summary_file(
+                j.fn(f"{dot_product_summary_filename_str}.json"), summary_dict
+            )
+            numpy_engine.write_dot_product_output_file(
+                j.fn(f"{dot_product_output_filename_str}.txt"), summary_dict["mean"]
+            )
+        store_dot_product_results(*excel_jobs)
+
+
+# Calculate the first row dot products of many jobs with one matrix multiplication
+def numpy_first_row_dot_product_calcs(jobs_to_run, row_values_list):
+    """Calculate the dot products of the jobs' Excel row 2 values with NumPy."""
+    import numpy as np
+    import numpy_engine
+
+    row_values_matrix = np.array(row_values_list)
+    random_value_list, mult_vector_list = numpy_random_values_mult_vectors(jobs_to_run)
+
+    dot_products = numpy_engine.calc_dot_products(
+        row_values_matrix, np.array(random_value_list), mult_vector_list
+    )
+
+    for j, dot_product in zip(jobs_to_run, dot_products):
+        numpy_engine.write_dot_product_output_file(
+            j.fn(f"{dot_product_output_filename_str}.txt"), dot_product
+        )
+    store_dot_product_results(*jobs_to_run)
+
+
+@Project.pre(lambda *jobs: part_2_dot_product_engine_str == "numpy")
+@Project.pre(lambda *jobs: all(
+    part_1_initial_parameters_completed(j) or is_quarantined(j) for j in jobs
+))
+@Project.post(lambda *jobs: all(
+    part_2a_dot_product_calcs_started(j) or is_quarantined(j) for j in jobs
+))
+@Project.post(lambda *jobs: all(
+    part_2b_dot_product_calcs_completed_properly(j) or is_quarantined(j) for j in jobs
+))
+@Project.operation(directives=
+    {
+        "np": part_2_ntasks,
+        "cpus-per-task": part_2_cpus_per_task,
+        "gpus-per-task": part_2_gpus_per_task,
+        "mem-per-cpu": part_2_mem_per_cpu_gb,
+        "walltime": part_2_walltime_hr,
+    }, aggregator=aggregator.groupsof(
+        part_2_numpy_batch_size_int, sort_by="excel_filename_wo_ext", select=is_regular_job
+    )
+)
+def part_2_numpy_dot_product_calcs_command(*jobs):
+    """Run the dot product calculations for a batch of jobs with NumPy."""
+
+    # only calculate the jobs in the batch that are not completed (or quarantined) yet
+    jobs_to_run = [
+        j for j in jobs
+        if not part_2b_dot_product_calcs_completed_properly(j) and not is_quarantined(j)
+    ]
+
+    if part_2_rows_mode_str == "all_rows":
+        numpy_all_rows_dot_product_calcs(jobs_to_run)
+        return
+    elif part_2_rows_mode_str != "first_row":
+        raise ValueError("ERROR: The 'part_2_rows_mode_str' must be 'first_row' or 'all_rows'.")
+
+    print('*********************************************')
+    print(f"Running {len(jobs_to_run)} of {len(jobs)} jobs in the NumPy batch")
+    print('*********************************************')
+
+    # the Excel row 2 values were already stored in the job.doc in part_1
+    job_document_list = [job_document(j) for j in jobs_to_run]
+    numpy_first_row_dot_product_calcs(
+        jobs_to_run,
+        [
+            [d["value_0_int"], d["value_1_int"], d["value_2_int"], d["value_3_int"]]
+            for d in job_document_list
+        ],
+    )
+
+
+# Run the julia dot product calculations of many jobs in a single julia process
+def julia_batch_dot_product_calcs(jobs_to_run, row_values_list):
+    """Run the julia dot product calculations of the jobs in one julia process."""
+
+    def julia_string(value):
+        # a julia string literal, where '$' is not interpolated
+        return json.dumps(str(value)).replace("$", "\\$")
+
+    calc_call_list = []
+    for j, row_values in zip(jobs_to_run, row_values_list):
+        # the multiplier vector and noise range are only passed if they are 
+        # not the default values in the 'matrix.jl' file
+        sweep_args_julia = ""
+        if job_mult_vector_noise_range(j) is not None:
+            mult_vector_julia, noise_range_julia = job_mult_vector_noise_range(j)
+            sweep_args_julia = f', {[float(v) for v in mult_vector_julia]}, ' \
+                f'{[int(v) for v in noise_range_julia]}'
+
+        if part_2_rows_mode_str == "first_row":
+            calc_call_list.append(
+                f'calc_dot_product_values('
+                f'{", ".join(repr(float(v)) for v in row_values)}, '
+                f'{julia_string(j.fn(f"{dot_product_output_filename_str}.txt"))}, '
+                f'"{j.sp.replicate_number_int}"{sweep_args_julia})'
+            )
+        else:
+            excel_filename = f'{project_directory}/'\
+                             f'{directory_path_to_excel_files_str}/'\
+                             f'{j.sp.excel_filename_wo_ext}.xlsx'
+            calc_call_list.append(
+                f'calc_dot_product_all_rows('
+                f'{julia_string(excel_filename)}, "Sheet1", '
+                f'{julia_string(j.fn(f"{dot_product_output_filename_str}.txt"))}, '
+                f'{julia_string(j.fn(f"{dot_product_rows_filename_str}.bin"))}, '
+                f'{julia_string(j.fn(f"{dot_product_summary_filename_str}.json"))}, '
+                f'"{j.sp.replicate_number_int}"{sweep_args_julia})'
+            )
+
+    # the calls are run from a script file, as a batch can be longer than 
+    # the max length of a command line argument
+    with tempfile.NamedTemporaryFile("w", suffix=".jl") as script_file:
+        script_file.write("\n".join(calc_call_list) + "\n")
+        script_file.flush()
+        try:
+            # uses the pinned environment and sysimage if they are built
+            # (see the 'julia_environment.py' file)
+            with operation_profiler.timed_subprocess():
+                subprocess.run(
+                    julia_environment.julia_command_list()
+                    + ["--load", julia_environment.julia_matrix_file, script_file.name],
+                    check=True,
+                    env=julia_environment.julia_subprocess_environment(),
+                )
+        finally:
+            # store the results of the jobs that were calculated, even if a 
+            # later job in the batch failed
+            store_dot_product_results(
+                *[j for j in jobs_to_run if j.isfile(f"{dot_product_output_filename_str}.txt")]
+            )
+
+
+@Project.pre(lambda *jobs: part_1_ingestion_mode_str == "fused")
+@Project.post(lambda *jobs: all(
+    part_1_initial_parameters_completed(j) or is_quarantined(j) for j in jobs
+))
+@Project.post(lambda *jobs: all(
+    part_2a_dot_product_calcs_started(j) or is_quarantined(j) for j in jobs
+))
+@Project.post(lambda *jobs: all(
+    part_2b_dot_product_calcs_completed_properly(j) or is_quarantined(j) for j in jobs
+))
+@Project.operation(directives=
+    {
+        "np": part_2_ntasks,
+        "cpus-per-task": part_2_cpus_per_task,
+        "gpus-per-task": part_2_gpus_per_task,
+        "mem-per-cpu": max(part_1_mem_per_cpu_gb, part_2_mem_per_cpu_gb),
+        "walltime": part_1_walltime_hr + part_2_walltime_hr,
+    }, aggregator=aggregator.groupsof(
+        part_1_2_fused_batch_size_int, sort_by="excel_filename_wo_ext", select=is_regular_job
+    )
+)
+def part_1_2_fused_dot_product_calcs_command(*jobs):
+    """Read the Excel values and run the dot product calculations of a batch of jobs."""
+    import excel_reader
+
+    # only calculate the jobs in the batch that are not completed (or quarantined) yet
+    jobs_to_run = [
+        j for j in jobs
+        if not part_2b_dot_product_calcs_completed_properly(j) and not is_quarantined(j)
+    ]
+
+    # part_1: read each Excel file only once for all its replicates in the batch
+    excel_cache_for_batch = get_excel_cache()
+    excel_values_by_name_dict = {}
+    for j in jobs_to_run:
+        if j.sp.excel_filename_wo_ext not in excel_values_by_name_dict:
+            excel_filename = f'{project_directory}/'\
+                             f'{directory_path_to_excel_files_str}/'\
+                             f'{j.sp.excel_filename_wo_ext}.xlsx'
+            excel_values_by_name_dict[j.sp.excel_filename_wo_ext] = \
+                excel_reader.read_first_row_values_cached(
+                    excel_filename, "Sheet1", excel_cache_for_batch
+                )
+        if not part_1_initial_parameters_completed(j):
+            set_initial_parameters(j, excel_values_by_name_dict[j.sp.excel_filename_wo_ext])
+
+    row_values_list = [
+        [
+            excel_values_by_name_dict[j.sp.excel_filename_wo_ext][column_name]
+            for column_name in excel_reader.value_column_name_list
+        ]
+        for j in jobs_to_run
+    ]
+
+    print('*********************************************')
+    print(f"Running part_1 and part_2 of {len(jobs_to_run)} of {len(jobs)} jobs "
+          f"({len(excel_values_by_name_dict)} Excel files) in the fused batch")
+    print('*********************************************')
+
+    # part_2: the values are passed straight to the dot product calculations
+    if part_2_rows_mode_str not in ("first_row", "all_rows"):
+        raise ValueError("ERROR: The 'part_2_rows_mode_str' must be 'first_row' or 'all_rows'.")
+    if part_2_dot_product_engine_str == "numpy":
+        if part_2_rows_mode_str == "all_rows":
+            numpy_all_rows_dot_product_calcs(jobs_to_run)
+        else:
+            numpy_first_row_dot_product_calcs(jobs_to_run, row_values_list)
+    elif part_2_dot_product_engine_str == "julia":
+        julia_batch_dot_product_calcs(jobs_to_run, row_values_list)
+    else:
+        raise ValueError("ERROR: The 'part_2_dot_product_engine_str' must be 'julia' or 'numpy'.")
+
+
+# check to see if the parameter sweep table is written
+@Project.label
+def part_2_parameter_sweep_completed(job):
+    """Check if the parameter sweep table of a parameter sweep job is written."""
+    return is_parameter_sweep_job(job) and job.isfile(f"{parameter_sweep_table_filename_str}.npy")
+
+
+@Project.pre(lambda *jobs: not is_quarantined(jobs[0]))
+@Project.post(lambda *jobs: all(part_2_parameter_sweep_completed(j) for j in jobs))
+@Project.operation(directives=
+    {
+        "np": part_2_ntasks,
+        "cpus-per-task": part_2_cpus_per_task,
+        "gpus-per-task": part_2_gpus_per_task,
+        "mem-per-cpu": part_2_mem_per_cpu_gb,
+        "walltime": part_2_walltime_hr,
+    }, aggregator=aggregator.groupby("excel_filename_wo_ext", select=is_parameter_sweep_job)
+)
+def part_2_parameter_sweep_command(*jobs):
+    """Calculate the parameter sweeps of an Excel file in one vectorized pass per sweep."""
+    import numpy as np
+    import excel_reader
+    import numpy_engine
+    import parameter_sweep
+
+    # only calculate the sweeps that are not completed yet
+    jobs_to_run = [j for j in jobs if not part_2_parameter_sweep_completed(j)]
+    excel_filename_wo_ext = jobs[0].sp.excel_filename_wo_ext
+    excel_filename = f'{project_directory}/'\
+                     f'{directory_path_to_excel_files_str}/'\
+                     f'{excel_filename_wo_ext}.xlsx'
+
+    # the Excel file is only read once for all its sweeps, where the "all_rows" 
+    # mode uses the mean row values, as the mean row dot product of any 
+    # multiplier vector is the mean row values' dot product with it
+    if part_2_rows_mode_str == "first_row":
+        excel_values_dict = excel_reader.read_first_row_values_cached(
+            excel_filename, "Sheet1", get_excel_cache()
+        )
+        row_values = [excel_values_dict[c] for c in excel_reader.value_column_name_list]
+    elif part_2_rows_mode_str == "all_rows":
+        _, row_values = numpy_engine.stream_column_means(
+            excel_reader.iter_value_chunks(
+                excel_filename, "Sheet1", chunk_rows=part_2_stream_chunk_rows_int
+            )
+        )
+    else:
+        raise ValueError("ERROR: The 'part_2_rows_mode_str' must be 'first_row' or 'all_rows'.")
+
+    print('*********************************************')
+    print(f"Running {len(jobs_to_run)} parameter sweeps of {excel_filename_wo_ext}")
+    for j in jobs_to_run:
+        parameter_sweep_dict = j.cached_statepoint["parameter_sweep"]
+        parameter_sweep.check_parameter_sweep(parameter_sweep_dict)
+        mult_vector_matrix = parameter_sweep.sweep_mult_vectors(parameter_sweep_dict)
+
+        # the same random scalar noise values as the "numpy" engine's replicates
+        random_value_matrix = np.array(
+            [
+                [
+                    numpy_engine.replicate_random_value(
+                        excel_filename_wo_ext, replicate_i, part_2_random_seed_int, noise_range
+                    )
+                    for replicate_i in range(parameter_sweep_dict["replicates_int"])
+                ]
+                for noise_range in parameter_sweep_dict["noise_range_list"]
+            ]
+        )
+
+        dot_product_tensor = numpy_engine.calc_sweep_dot_products(
+            row_values, mult_vector_matrix, random_value_matrix
+        )
+        parameter_sweep.write_table(
+            j.fn(f"{parameter_sweep_table_filename_str}.npy"),
+            parameter_sweep.make_table(
+                mult_vector_matrix, parameter_sweep_dict["noise_range_list"], dot_product_tensor
+            ),
+        )
+        print(f"sweep {parameter_sweep_dict['name']}: {len(mult_vector_matrix)} multiplier vectors x "
+              f"{len(parameter_sweep_dict['noise_range_list'])} noise ranges x "
+              f"{parameter_sweep_dict['replicates_int']} replicates = {dot_product_tensor.size} dot products")
+    print('*********************************************')
+
+
 # ******************************************************
 # PERFORM THE dot_product CALCULATIONS (END)
 # ******************************************************
@@ -260,35 +1234,22 @@ def part_2_julia_dot_product_calcs_command(job):
 # Check if the average and std. dev. of all the replicates is completed
 @Project.label
 def part_3_analysis_replica_averages_completed(*jobs):
-    """Check that the replicate dot_product averages files are written ."""
-
-    # If any previous replicate averages and std_devs exist delete them, 
-    # because they will need recalculated as more state points were added.
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_filename}.txt'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_filename}.txt')
+    """Check that the replicate groups of the jobs are calculated and not dirty."""
 
-    file_written_bool_list = []
-    all_file_written_bool_pass = False
-    for job in jobs:
-        file_written_bool = False
-
-        if (
-            job.isfile(
-                f"../../analysis/{output_avg_std_of_replicates_txt_filename}.txt"
-            )
-        ):
-            file_written_bool = True
-
-        file_written_bool_list.append(file_written_bool)
+    # A group is dirty if any of its member jobs' output files changed (or a
+    # member was added or removed) since the group was calculated.
+    # This only reads the files, so it is safe to check in 'status'.
+    dirty_group_key_set = dirty_replicate_group_keys(jobs[0]._project)
 
-    if False not in file_written_bool_list:
-        all_file_written_bool_pass = True
-
-    return all_file_written_bool_pass
+    return all(
+        is_regular_job(job) and replicate_group_key(job) not in dirty_group_key_set for job in jobs
+    )
 
 
-@Project.pre(lambda *jobs: all(part_2b_dot_product_calcs_completed_properly(j)
-                               for j in jobs[0]._project))
+# Each replicate group is started as soon as all its own replicates are 
+# completed, instead of waiting for every job in the project
+@Project.pre(lambda *jobs: part_3_analysis_mode_str == "per_group")
+@Project.pre(lambda *jobs: all(part_2b_dot_product_calcs_completed_properly(j) for j in jobs))
 @Project.post(part_3_analysis_replica_averages_completed)
 @Project.operation(directives=
      {
@@ -297,88 +1258,80 @@ def part_3_analysis_replica_averages_completed(*jobs):
         "gpus-per-task": part_3_gpus_per_task,
         "mem-per-cpu": part_3_mem_per_cpu_gb,
         "walltime": part_3_walltime_hr,
-     }, aggregator=aggregator.groupby(key=statepoint_without_replicate, sort_by="excel_filename_wo_ext", sort_ascending=False)
+     }, aggregator=aggregator.groupby(key=statepoint_without_replicate, sort_by="excel_filename_wo_ext", sort_ascending=False, select=is_regular_job)
 )
 def part_3_analysis_replicate_averages_command(*jobs):
     # Get the individial averages of the values from each state point,
     # and print the values in each separate folder.    
 
 
-    # List the output column headers
-    output_column_dot_product_input_title = 'excel_filename_wo_ext' 
-    output_column_dot_product_avg_title = 'dot_product_avg'
-    output_column_dot_product_std_dev_title = 'dot_product_std_dev'  
-
-    # create the lists for avg and std dev calcs
-    excel_filename_wo_ext_repilcate_list = []
-    dot_product_replicate_list = []
-    
-
-    # write the output file before the for loop, so it gets all the 
-    # values in the loops
-    output_txt_file_header = \
-        f"{output_column_dot_product_input_title: <40} " \
-        f"{output_column_dot_product_avg_title: <20} " \
-        f"{output_column_dot_product_std_dev_title: <20} " \
-        f" \n"
-
-    write_file_name_and_path = f'analysis/{output_avg_std_of_replicates_txt_filename}.txt' 
-    if os.path.isfile(write_file_name_and_path):
-        replicate_calc_txt_file = open(write_file_name_and_path, "a")
-    else:
-        replicate_calc_txt_file = open(write_file_name_and_path, "w")
-        replicate_calc_txt_file.write(output_txt_file_header)
-
-    # Loop over all the jobs that have the same "dot_product" (in sort_by="dot_product"). 
-    for job in jobs:
-        # get the individual values
-        output_file = f"{dot_product_output_filename_str}.txt"
-        with open(job.fn(output_file), "r") as fp:
-            output_line = fp.readlines()
-            split_output_line = output_line  
-            for i, line in enumerate(output_line):
-                split_line = line.split() 
-                if len(split_line) == 1:
-                   excel_filename_wo_ext_repilcate_list.append(job.doc.excel_filename_wo_ext) 
-                   dot_product_replicate_list.append(float(split_line[0])) 
-                
-
-                elif not (
-                    len(split_line) == 3 
-                      and split_line[0] == 'Dot_Product' 
-                      and split_line[1] == 'Calculations'
-                      and split_line[2] == 'Completed'
-                    ):
-                    raise ValueError("ERROR: The format of the dot_product output files are wrong.")
-
     # Check that the dot_product are all the same and the aggregate function worked, 
     # grouping all the replicates of dot_product
-    for j in range(0, len(excel_filename_wo_ext_repilcate_list)):
-        if excel_filename_wo_ext_repilcate_list[0] != excel_filename_wo_ext_repilcate_list[j]:
+    excel_filename_wo_ext_aggregate = jobs[0].sp.excel_filename_wo_ext
+    for job in jobs:
+        if job.sp.excel_filename_wo_ext != excel_filename_wo_ext_aggregate:
             raise ValueError(
                 "ERROR: The dot_product values are not grouping properly in the aggregate function."
                 )
-        excel_filename_wo_ext_aggregate = excel_filename_wo_ext_repilcate_list[0] 
 
-    # Calculate the means and standard devs
+    # Update the group's running means and standard devs with only the
+    # new (or changed) replicates, which also updates the summary file
+    # (reading the group's output files at the same time)
+    with results_index.snapshot():
+        prefetch_dot_product_results(jobs)
+        (group_row, ), added_replicates_int = update_replicate_group_stats(
+            jobs[0]._project, {replicate_group_key(jobs[0]): list(jobs)}
+        )
+
     print(f'********************')
     print(f'dot_product_aggregate = {excel_filename_wo_ext_aggregate}')
     print(f'********************')
     print(f'********************')
-    print(f'dot_product_replicate_list = {dot_product_replicate_list}')
+    print(f'added replicates = {added_replicates_int} (replicates = {group_row[3]})')
+    print(f'dot_product_avg = {group_row[4]}, dot_product_std_dev = {group_row[6]}')
 
-    dot_product_avg = np.mean(dot_product_replicate_list)
-    dot_product_avg_std = np.std(dot_product_replicate_list, ddof=1)
 
-   
-    replicate_calc_txt_file.write(
-        f"{excel_filename_wo_ext_aggregate: <40} "
-        f"{dot_product_avg: <20} "
-        f"{dot_product_avg_std: <20} "
-        f" \n"
-    )
 
-    replicate_calc_txt_file.close()
+@Project.pre(lambda *jobs: part_3_analysis_mode_str == "whole_project")
+@Project.pre(lambda *jobs: all_dot_product_calcs_completed(jobs[0]._project))
+@Project.post(lambda *jobs: all(
+    is_quarantined(j) or part_3_analysis_replica_averages_completed(j) for j in jobs
+))
+@Project.operation(directives=
+     {
+        "np": part_3_ntasks,
+        "cpus-per-task": part_3_cpus_per_task,
+        "gpus-per-task": part_3_gpus_per_task,
+        "mem-per-cpu": part_3_mem_per_cpu_gb,
+        "walltime": part_3_walltime_hr,
+     }, aggregator=aggregator(select=is_regular_job)
+)
+def part_3_analysis_whole_project_command(*jobs):
+    """Calculate the replicate averages and std. devs. of all the dirty groups in one pass."""
+    # gather the jobs of all the dirty groups in one pass (skipping the 
+    # groups of the quarantined Excel files), reading the output files at the same time
+    with results_index.snapshot():
+        prefetch_dot_product_results(jobs)
+        dirty_group_key_set = dirty_replicate_group_keys(jobs[0]._project)
+        dirty_group_jobs_dict = defaultdict(list)
+        for job in jobs:
+            if replicate_group_key(job) in dirty_group_key_set and not is_quarantined(job):
+                dirty_group_jobs_dict[replicate_group_key(job)].append(job)
+
+        # calculate the dirty groups without stored statistics with one grouped
+        # reduction, and update the others with only their new (or changed)
+        # replicates, which also updates the summary file
+        group_row_list, added_replicates_int = update_replicate_group_stats(
+            jobs[0]._project, dirty_group_jobs_dict
+        )
+
+    print(f'********************')
+    print(f'recalculated dirty groups = {len(group_row_list)}')
+    print(f'added replicates = {added_replicates_int}')
+    print(replicate_summary.summary_header, end='')
+    for group_row in group_row_list:
+        print(replicate_summary.summary_row(group_row[1], group_row[4], group_row[6]), end='')
+    print(f'********************')
 
 
 # ******************************************************
@@ -390,12 +1343,552 @@ def part_3_analysis_replicate_averages_command(*jobs):
 # ******************************************************
 
 
+# ******************************************************
+# CUSTOM PROJECT.PY COMMANDS (START)
+# ******************************************************
+
+def node_packing_report_command(pr, args):
+    """Print the packed bundle sizes, allocations, and core-hours of the eligible jobs."""
+    env = hpc_setup.Phoenix
+
+    with pr._buffered():
+        eligible_operation_list = list(pr._next_operations())
+
+    operation_names = sorted({op.name for op in eligible_operation_list})
+    print('*********************************************')
+    print(f'Node packing report (dry run) for {env.cores_per_node} cores and '
+          f'{env.mem_per_node_gb} GB per node, with a max walltime of {env.max_walltime_hr} hr')
+    print('*********************************************')
+    for name in operation_names:
+        name_operation_list = [op for op in eligible_operation_list if op.name == name]
+        directives = name_operation_list[0].directives
+        cores, _, walltime_hr = hpc_setup.operation_footprint(directives)
+        slots = hpc_setup.jobs_per_node(directives, env.cores_per_node, env.mem_per_node_gb)
+        bundle_size = hpc_setup.packed_bundle_size(
+            directives, env.cores_per_node, env.mem_per_node_gb, env.max_walltime_hr
+        )
+
+        # each allocation requests the cores of its concurrent jobs for 
+        # the number of back-to-back waves of jobs in it
+        number_of_jobs = len(name_operation_list)
+        packed_core_hours = 0
+        for bundle_start in range(0, number_of_jobs, bundle_size):
+            bundle_jobs = min(bundle_size, number_of_jobs - bundle_start)
+            bundle_slots = min(slots, bundle_jobs)
+            packed_core_hours += bundle_slots * cores * math.ceil(bundle_jobs / bundle_slots) * walltime_hr
+
+        print(f'{name}')
+        print(f'    eligible jobs = {number_of_jobs}')
+        print(f'    jobs per node at the same time = {slots}, bundle size = {bundle_size}')
+        print(f'    allocations: unpacked = {number_of_jobs}, '
+              f'packed = {math.ceil(number_of_jobs / bundle_size)}')
+        print(f'    requested core-hours: unpacked = {number_of_jobs * cores * walltime_hr:.2f}, '
+              f'packed = {packed_core_hours:.2f}')
+        print(f'    submit with: python project.py submit -o {name} '
+              f'--bundle {min(bundle_size, number_of_jobs)} --parallel')
+    print('*********************************************')
+
+
+def run_local_command(pr, args):
+    """Run the eligible operations across a local pool of worker processes."""
+    parser = argparse.ArgumentParser(prog="project.py run-local")
+    parser.add_argument("-o", "--operation", nargs="+", default=None,
+                        help="Only run these operations (regular expressions, default: all).")
+    parser.add_argument("--cores", type=int, default=local_executor_cores_int,
+                        help="The number of cores to use (0 = all available).")
+    parser.add_argument("--mem-gb", type=float, default=local_executor_mem_gb,
+                        help="The memory (GB) to use (0 = all available).")
+    parser.add_argument("--progress-interval", type=float, default=5,
+                        help="The seconds between the progress lines.")
+    parser.add_argument("--retries", type=int, default=local_executor_retries_int,
+                        help="The number of times a failed operation is retried.")
+    parser.add_argument("--retry-backoff", type=float, default=local_executor_retry_backoff_s,
+                        help="The seconds before the first retry (doubles for each next retry).")
+    parser.add_argument("--speculation-factor", type=float,
+                        default=local_executor_speculation_factor,
+                        help="Start a second copy of the NumPy part_2 operations running longer "
+                             "than this many times their median wall time (0 = do not speculate).")
+    parser.add_argument("--quarantine-failures", type=int,
+                        default=local_executor_quarantine_failures_int,
+                        help="Quarantine an Excel file after this many of its operations "
+                             "failed on every attempt (0 = do not quarantine).")
+    parsed_args = parser.parse_args(args)
+
+    # Only the NumPy part_2 operations are speculated, as their replicate noise
+    # is seeded, so both copies write the same dot products, and each copy
+    # writes its own temporary files, which only replace the output files 
+    # once they are complete (see 'atomic_open' in the 'numpy_engine.py' file).
+    # The Julia operations' noise is not seeded, so a second copy could 
+    # overwrite the stored result with a different value.
+    # The quarantine key is the Excel file, as a missing or corrupt Excel file
+    # fails all its jobs.
+    failed_dict = local_executor.LocalExecutor(
+        pr,
+        cores=parsed_args.cores,
+        mem_gb=parsed_args.mem_gb,
+        operation_names=parsed_args.operation,
+        progress_interval_s=parsed_args.progress_interval,
+        retries=parsed_args.retries,
+        retry_backoff_s=parsed_args.retry_backoff,
+        speculation_factor=parsed_args.speculation_factor,
+        speculative_operation_names=[
+            "part_2_numpy_dot_product_calcs_command", "part_2_parameter_sweep_command"
+        ],
+        quarantine_key_function=lambda job: job.sp.excel_filename_wo_ext,
+        quarantine_function=lambda excel_filename_wo_ext, operation_name, error_summary_str: (
+            quarantine.add(pr.path, [excel_filename_wo_ext], operation_name, error_summary_str)
+        ),
+        quarantine_failures=parsed_args.quarantine_failures,
+    ).run()
+    if failed_dict:
+        sys.exit(f"ERROR: {len(failed_dict)} operations failed.")
+
+
+def profile_report_command(pr, args):
+    """Print the per-operation profile histograms, outliers, and suggested directives."""
+    import numpy as np
+
+    parser = argparse.ArgumentParser(prog="project.py profile-report")
+    parser.add_argument("-o", "--operation", nargs="+", default=None,
+                        help="Only report these operations (regular expressions, default: all).")
+    parser.add_argument("--bins", type=int, default=10,
+                        help="The number of histogram bins.")
+    parser.add_argument("--outlier-factor", type=float, default=5,
+                        help="Flag the operations more than this many median absolute "
+                             "deviations above the median.")
+    parser.add_argument("--headroom", type=float, default=1.5,
+                        help="The suggested directives are the max measured value times this.")
+    parsed_args = parser.parse_args(args)
+
+    profile_record_list = operation_profiler.OperationProfiler(pr).read_profiles()
+    default_directives_dict = pr._get_default_directives()
+    operation_name_list = [
+        name for name in pr.operations
+        if not parsed_args.operation or any(re.fullmatch(n, name) for n in parsed_args.operation)
+    ]
+
+    print('*********************************************')
+    print(f'Operation profile report ({len(profile_record_list)} recorded operations)')
+    print('*********************************************')
+    for name in operation_name_list:
+        record_list = [r for r in profile_record_list if r["operation"] == name]
+        if len(record_list) == 0:
+            continue
+        succeeded_record_list = [r for r in record_list if r["succeeded"]] or record_list
+        for r in succeeded_record_list:
+            r["total_peak_rss_mb"] = max(r["peak_rss_mb"], r["subprocess_peak_rss_mb"])
+        wall_s_array = np.array([r["wall_s"] for r in succeeded_record_list])
+
+        print(f'{name}')
+        print(f'    operations = {len(record_list)} '
+              f'(failed = {len(record_list) - sum(r["succeeded"] for r in record_list)}), '
+              f'jobs = {sum(r["jobs"] for r in succeeded_record_list)}')
+        print(f'    wall time (s): p50 = {np.percentile(wall_s_array, 50):.4g}, '
+              f'p90 = {np.percentile(wall_s_array, 90):.4g}, max = {wall_s_array.max():.4g}')
+        # the subprocess runtime is not recorded for the 'cmd' operations,
+        # which are the subprocess
+        subprocess_s_list = [
+            r["subprocess_s"] for r in succeeded_record_list if r["subprocess_s"] is not None
+        ]
+        print(f'    mean: CPU time = {np.mean([r["cpu_s"] for r in succeeded_record_list]):.4g} s, '
+              f'subprocess CPU time = '
+              f'{np.mean([r["subprocess_cpu_s"] for r in succeeded_record_list]):.4g} s, '
+              f'subprocess runtime = '
+              + (f'{np.mean(subprocess_s_list):.4g} s' if subprocess_s_list
+                 else 'not recorded (a cmd operation, see the wall time)'))
+        print(f'    mean: bytes read = {np.mean([r["read_bytes"] for r in succeeded_record_list]):.0f}, '
+              f'bytes written = {np.mean([r["written_bytes"] for r in succeeded_record_list]):.0f}')
+        print(f'    wall time histogram:')
+        for line in operation_profiler.text_histogram(wall_s_array, bins=parsed_args.bins, unit=" s"):
+            print(f'        {line}')
+        print(f'    peak RSS histogram:')
+        for line in operation_profiler.text_histogram(
+            [r["total_peak_rss_mb"] for r in succeeded_record_list], bins=parsed_args.bins, unit=" MB"
+        ):
+            print(f'        {line}')
+
+        for key, unit in [("wall_s", "s"), ("total_peak_rss_mb", "MB")]:
+            for r in operation_profiler.outliers(succeeded_record_list, key, parsed_args.outlier_factor):
+                print(f'    OUTLIER: {key} = {r[key]:.4g} {unit}, host = {r["hostname"]}, '
+                      f'jobs = {", ".join(json.loads(r["job_ids"])[:3])}'
+                      f'{" ..." if r["jobs"] > 3 else ""}')
+
+        # compare the measured max values with the directives
+        directives = default_directives_dict.get(name, {})
+        cores = directives.get("np", 1) * directives.get("cpus-per-task", 1)
+        suggested_walltime_hr = wall_s_array.max() * parsed_args.headroom / 3600
+        suggested_mem_per_cpu_gb = max(
+            r["total_peak_rss_mb"] for r in succeeded_record_list
+        ) * parsed_args.headroom / 1024 / cores
+        print(f'    directives: walltime = {directives.get("walltime")} hr '
+              f'(suggested {suggested_walltime_hr:.4g} hr), '
+              f'mem-per-cpu = {directives.get("mem-per-cpu")} GB '
+              f'(suggested {suggested_mem_per_cpu_gb:.4g} GB)')
+
+    # the recorded label and condition evaluations (Example: of 'status' and 'run')
+    evaluation_record_list = operation_profiler.OperationProfiler(pr).read_evaluation_profiles()
+    print('*********************************************')
+    print('Label and condition evaluation times')
+    if len(evaluation_record_list) == 0:
+        print('    No label or condition evaluations are recorded.')
+    evaluation_dict = {}
+    for r in evaluation_record_list:
+        evaluation_dict.setdefault((r["kind"], r["name"]), []).append(r)
+    for (kind, name), record_list in sorted(
+        evaluation_dict.items(), key=lambda item: -sum(r["total_s"] for r in item[1])
+    ):
+        evaluations = sum(r["evaluations"] for r in record_list)
+        total_s = sum(r["total_s"] for r in record_list)
+        print(f'    {kind} {name}: passes = {len(record_list)}, '
+              f'evaluations = {evaluations}, total = {total_s:.4g} s, '
+              f'mean = {total_s / evaluations * 1e6:.1f} us, '
+              f'max = {max(r["max_s"] for r in record_list) * 1e6:.1f} us')
+    print('*********************************************')
+
+
+def results_store_command(pr, args):
+    """Migrate, compact, or forget the jobs in the project's results store."""
+    parser = argparse.ArgumentParser(prog="project.py results-store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_migrate = subparsers.add_parser(
+        "migrate", help="Add the output files of the jobs that are not in the store."
+    )
+    parser_compact = subparsers.add_parser(
+        "compact", help="Rewrite the store with only the current result of every job."
+    )
+    parser_forget = subparsers.add_parser(
+        "forget", help="Remove jobs from the store, so their output files are used (or rerun)."
+    )
+    parser_forget.add_argument("-j", "--job-id", nargs="+", required=True)
+    parsed_args = parser.parse_args(args)
+
+    print('*********************************************')
+    if parsed_args.command == "migrate":
+        store = results_store.get_store(pr.path)
+        store.update()
+        job_output_filename_dict = {}
+        sharded_job_result_dict = {}
+        for job in pr:
+            output_filename = job.fn(f"{dot_product_output_filename_str}.txt")
+            if store.job_result(job.id) is not None:
+                continue
+            if os.path.isfile(output_filename):
+                job_output_filename_dict[job.id] = output_filename
+            elif workspace_storage_mode_str == "sharded":
+                job_result = sharded_dot_product_result(job)
+                if job_result is not None:
+                    sharded_job_result_dict[job.id] = job_result
+        results_store.store_output_files(pr.path, job_output_filename_dict)
+        results_store.append_records(pr.path, results_store.make_records(sharded_job_result_dict))
+        print(f'Added {len(job_output_filename_dict) + len(sharded_job_result_dict)} jobs '
+              f'to the results store {results_store.store_filename(pr.path)}')
+
+    elif parsed_args.command == "compact":
+        number_of_records, number_of_current_records = results_store.compact(pr.path)
+        print(f'Compacted the results store from {number_of_records} '
+              f'to {number_of_current_records} records')
+
+    elif parsed_args.command == "forget":
+        results_store.forget(pr.path, parsed_args.job_id)
+        print(f'Removed {len(parsed_args.job_id)} jobs from the results store')
+    print('*********************************************')
+
+
+def count_files(directory):
+    """Get the (number of files, number of directories) in a directory tree."""
+    files_int = 0
+    directories_int = 0
+    for _, directory_name_list, filename_list in os.walk(directory):
+        files_int += len(filename_list)
+        directories_int += len(directory_name_list)
+
+    return files_int, directories_int
+
+
+def workspace_shards_command(pr, args):
+    """Pack or unpack the job documents and output files, or report the file counts."""
+    parser = argparse.ArgumentParser(prog="project.py workspace-shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_pack = subparsers.add_parser(
+        "pack", help="Move the job documents and part_2 output files into the shards."
+    )
+    parser_unpack = subparsers.add_parser(
+        "unpack", help="Move the job documents and files from the shards back to the jobs."
+    )
+    parser_unpack.add_argument("-j", "--job-id", nargs="+", default=None,
+                               help="Only unpack these jobs (default: all).")
+    parser_report = subparsers.add_parser(
+        "report", help="Report the number of files in the workspace and the shards."
+    )
+    parsed_args = parser.parse_args(args)
+
+    shards = get_workspace_shards(pr)
+    print('*********************************************')
+    if parsed_args.command == "pack":
+        if workspace_storage_mode_str != "sharded":
+            sys.exit("ERROR: Set 'workspace_storage_mode_str = \"sharded\"' before packing.")
+        job_list = list(pr)
+        document_job_list = [j for j in job_list if j.isfile("signac_job_document.json")]
+        shards.update_documents({j.id: j.doc() for j in document_job_list})
+        for j in document_job_list:
+            os.remove(j.fn("signac_job_document.json"))
+        store_dot_product_results(
+            *[j for j in job_list if j.isfile(f"{dot_product_output_filename_str}.txt")]
+        )
+        print(f'Packed the documents of {len(document_job_list)} jobs and the output files '
+              f'into {workspace_shards.shards_directory(pr.path)}')
+
+    elif parsed_args.command == "unpack":
+        if parsed_args.job_id is None:
+            job_list = list(pr)
+        else:
+            job_list = [pr.open_job(id=job_id) for job_id in parsed_args.job_id]
+        for j in job_list:
+            shards.unpack(j)
+        print(f'Unpacked {len(job_list)} jobs into their directories')
+
+    elif parsed_args.command == "report":
+        workspace_files_int, workspace_directories_int = count_files(pr.workspace)
+        shard_files_int, _ = count_files(workspace_shards.shards_directory(pr.path))
+        print(f'workspace storage mode = {workspace_storage_mode_str}')
+        print(f'jobs = {len(pr)}')
+        print(f'workspace: files = {workspace_files_int}, '
+              f'directories = {workspace_directories_int}')
+        print(f'shards: files = {shard_files_int}')
+        print(f'total files and directories (inodes) = '
+              f'{workspace_files_int + workspace_directories_int + shard_files_int}')
+    print('*********************************************')
+
+
+def parameter_sweep_command(pr, args):
+    """Report the parameter sweep jobs, or export their tables to a single CSV file."""
+    import numpy as np
+    import pandas as pd
+    import parameter_sweep
+
+    parser = argparse.ArgumentParser(prog="project.py parameter-sweep")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser_report = subparsers.add_parser(
+        "report", help="Report the sweeps' size, and the best multiplier vectors."
+    )
+    parser_report.add_argument("--top", type=int, default=3,
+                               help="The number of highest average dot products to list per sweep.")
+    parser_export = subparsers.add_parser(
+        "export", help="Write the replicate averages and std. devs. of all the sweeps to a CSV file."
+    )
+    parser_export.add_argument("-o", "--output", default="analysis/parameter_sweep_summary.csv")
+    parsed_args = parser.parse_args(args)
+
+    sweep_job_list = sorted(
+        [j for j in pr if is_parameter_sweep_job(j)],
+        key=lambda j: (j.sp.excel_filename_wo_ext, j.cached_statepoint["parameter_sweep"]["name"]),
+    )
+    print('*********************************************')
+    if parsed_args.command == "report":
+        dot_products_int = 0
+        table_bytes_int = 0
+        for j in sweep_job_list:
+            parameter_sweep_dict = j.cached_statepoint["parameter_sweep"]
+            print(f'{j.sp.excel_filename_wo_ext}, sweep {parameter_sweep_dict["name"]} (job id {j.id})')
+            if not part_2_parameter_sweep_completed(j):
+                print('    not completed')
+                continue
+            table = parameter_sweep.read_table(j.fn(f"{parameter_sweep_table_filename_str}.npy"))
+            dot_products_int += table["dot_product"].size
+            table_bytes_int += os.path.getsize(j.fn(f"{parameter_sweep_table_filename_str}.npy"))
+            print(f'    multiplier vector and noise range rows = {len(table)}, '
+                  f'dot products = {table["dot_product"].size}')
+            for row_i in np.argsort(table["dot_product_avg"])[::-1][:parsed_args.top]:
+                print(f'    mult_vector = {table["mult_vector"][row_i].tolist()}, '
+                      f'noise_range = {table["noise_range"][row_i].tolist()}, '
+                      f'dot_product_avg = {table["dot_product_avg"][row_i]:.6g}, '
+                      f'dot_product_std_dev = {table["dot_product_std_dev"][row_i]:.6g}')
+        print('*********************************************')
+        print(f'sweep jobs = {len(sweep_job_list)}, '
+              f'completed = {sum(part_2_parameter_sweep_completed(j) for j in sweep_job_list)}')
+        print(f'dot products = {dot_products_int} in {table_bytes_int / 1e6:.3f} MB of tables '
+              f'(as regular jobs, this is {dot_products_int} job directories)')
+
+    elif parsed_args.command == "export":
+        table_df_list = []
+        for j in sweep_job_list:
+            if not part_2_parameter_sweep_completed(j):
+                continue
+            table = parameter_sweep.read_table(j.fn(f"{parameter_sweep_table_filename_str}.npy"))
+            table_df_list.append(
+                pd.DataFrame(
+                    {
+                        "excel_filename_wo_ext": j.sp.excel_filename_wo_ext,
+                        "sweep_name": j.cached_statepoint["parameter_sweep"]["name"],
+                        **{f"mult_vector_{i}": table["mult_vector"][:, i] for i in range(4)},
+                        "noise_range_min": table["noise_range"][:, 0],
+                        "noise_range_max": table["noise_range"][:, 1],
+                        "replicates": table["dot_product"].shape[1],
+                        "dot_product_avg": table["dot_product_avg"],
+                        "dot_product_std_dev": table["dot_product_std_dev"],
+                    }
+                )
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(parsed_args.output)), exist_ok=True)
+        summary_df = pd.concat(table_df_list, ignore_index=True) if table_df_list else pd.DataFrame()
+        summary_df.to_csv(parsed_args.output, index=False)
+        print(f'Wrote {len(summary_df)} rows of {len(table_df_list)} sweeps to {parsed_args.output}')
+    print('*********************************************')
+
+
+def add_adaptive_replicates(pr, dry_run_bool=False):
+    """Add the replicates of the groups whose std. error is above the target.
+
+    Returns the list of the groups' GroupPlans.
+    """
+    group_jobs_dict = defaultdict(list)
+    for job in pr:
+        if is_regular_job(job):
+            group_jobs_dict[replicate_group_key(job)].append(job)
+
+    group_plan_list = []
+    with results_index.snapshot():
+        for group_key, group_jobs in sorted(group_jobs_dict.items()):
+            replicate_result_list = []
+            for job in group_jobs:
+                job_result = dot_product_result(job)
+                replicate_result_list.append(
+                    (job.sp.replicate_number_int,
+                     job_result.dot_product if job_result.completed else None)
+                )
+            group_plan_list.append(
+                adaptive_replicates.plan_group(
+                    group_key,
+                    replicate_result_list,
+                    adaptive_target_relative_std_error,
+                    adaptive_batch_replicates_int,
+                    adaptive_max_replicates_int,
+                )
+            )
+
+    print('*********************************************')
+    print(f'Adaptive replicates (target relative std. error = '
+          f'{adaptive_target_relative_std_error}, max replicates = {adaptive_max_replicates_int})')
+    print('*********************************************')
+    print(f"{'excel_filename_wo_ext': <40} {'status': <10} {'replicates': <11} "
+          f"{'dot_product_avg': <20} {'relative_std_error': <20} new_replicates")
+    for group_plan in group_plan_list:
+        print(f"{group_jobs_dict[group_plan.group_key][0].sp.excel_filename_wo_ext: <40} "
+              f"{group_plan.status: <10} {group_plan.replicates: <11} "
+              f"{group_plan.mean: <20.6g} {group_plan.relative_std_error: <20.4g} "
+              f"{group_plan.new_replicate_list}")
+
+    if not dry_run_bool:
+        for group_plan in group_plan_list:
+            for replicate_i in group_plan.new_replicate_list:
+                statepoint = group_jobs_dict[group_plan.group_key][0].sp()
+                statepoint["replicate_number_int"] = replicate_i
+                pr.open_job(statepoint=statepoint).init()
+
+    status_count_dict = {
+        status: sum(p.status == status for p in group_plan_list)
+        for status in ("converged", "capped", "added", "pending")
+    }
+    adaptive_jobs_int, fixed_jobs_int, saved_jobs_int = adaptive_replicates.jobs_saved(
+        group_plan_list, adaptive_fixed_replicates_int
+    )
+    print('*********************************************')
+    print(f'groups = {len(group_plan_list)}, '
+          + ", ".join(f'{status} = {count}' for status, count in status_count_dict.items()))
+    print(f'replicates added = {sum(len(p.new_replicate_list) for p in group_plan_list)}'
+          + (' (dry run, no jobs created)' if dry_run_bool else ''))
+    print(f'jobs: adaptive = {adaptive_jobs_int}, fixed {adaptive_fixed_replicates_int} '
+          f'replicates = {fixed_jobs_int}, saved = {saved_jobs_int}'
+          + ('' if status_count_dict["converged"] + status_count_dict["capped"]
+             == len(group_plan_list) else ' (so far)'))
+    print('*********************************************')
+
+    return group_plan_list
+
+
+def adaptive_replicates_command(pr, args):
+    """Add the replicates of the groups whose std. error is above the target."""
+    parser = argparse.ArgumentParser(prog="project.py adaptive-replicates")
+    parser.add_argument("--run", action="store_true",
+                        help="Run the project's operations (like 'python project.py run') "
+                             "and add the replicates, until no more replicates are added.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only print the groups, without creating the new replicate jobs.")
+    parsed_args = parser.parse_args(args)
+    if parsed_args.run and parsed_args.dry_run:
+        parser.error("The '--run' and '--dry-run' options can not be used together.")
+
+    while True:
+        if parsed_args.run:
+            pr.run()
+        group_plan_list = add_adaptive_replicates(pr, parsed_args.dry_run)
+        if not parsed_args.run or not any(p.new_replicate_list for p in group_plan_list):
+            break
+        # add the new jobs to the project's aggregates (Example: the part_3 groups)
+        pr._reregister_aggregates()
+
+
+def quarantine_command(pr, args):
+    """List the quarantined Excel files, or add/remove Excel files to/from the quarantine list."""
+    parser = argparse.ArgumentParser(prog="project.py quarantine")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List the quarantined Excel files and their errors.")
+    parser_add = subparsers.add_parser(
+        "add", help="Quarantine Excel files, so their part_1 and part_2 operations are skipped."
+    )
+    parser_add.add_argument("excel_filename_wo_ext", nargs="+")
+    parser_remove = subparsers.add_parser(
+        "remove", help="Remove (fixed) Excel files from the quarantine list, so they are run again."
+    )
+    parser_remove.add_argument("excel_filename_wo_ext", nargs="+")
+    parsed_args = parser.parse_args(args)
+
+    print('*********************************************')
+    if parsed_args.command == "list":
+        quarantine_dict = quarantine.load_quarantine(pr.path)
+        for excel_filename_wo_ext, entry_dict in sorted(quarantine_dict.items()):
+            print(f'{excel_filename_wo_ext}: {entry_dict["operation"]} at {entry_dict["time"]}')
+            print(f'    {entry_dict["error"]}')
+        print(f'quarantined Excel files = {len(quarantine_dict)} '
+              f'({quarantine.quarantine_path(pr.path)})')
+
+    elif parsed_args.command == "add":
+        quarantine.add(pr.path, parsed_args.excel_filename_wo_ext, "manual", "")
+        print(f'quarantined = {", ".join(parsed_args.excel_filename_wo_ext)}')
+
+    elif parsed_args.command == "remove":
+        removed_list = quarantine.remove(pr.path, parsed_args.excel_filename_wo_ext)
+        print(f'removed from the quarantine = {", ".join(removed_list) or "none"}')
+    print('*********************************************')
+
+
+# Custom project.py commands, which are run instead of the signac-flow 
+# commands (Example: 'python project.py node-packing-report')
+custom_command_dict = {
+    "node-packing-report": node_packing_report_command,
+    "run-local": run_local_command,
+    "profile-report": profile_report_command,
+    "results-store": results_store_command,
+    "adaptive-replicates": adaptive_replicates_command,
+    "workspace-shards": workspace_shards_command,
+    "parameter-sweep": parameter_sweep_command,
+    "quarantine": quarantine_command,
+}
+
+# ******************************************************
+# CUSTOM PROJECT.PY COMMANDS (END)
+# ******************************************************
+
+
 # ******************************************************
 # SIGNACS'S ENDING CODE SECTION (START)
 # ******************************************************
 if __name__ == "__main__":
     pr = Project()
-    pr.main()
+    if len(sys.argv) > 1 and sys.argv[1] in custom_command_dict:
+        custom_command_dict[sys.argv[1]](pr, sys.argv[2:])
+    else:
+        pr.main()
 # ******************************************************
 # SIGNACS'S ENDING CODE SECTION (END)
 # ******************************************************
@@ -0,0 +1,94 @@
+"""Quarantine list of the Excel files whose operations always fail"""
+# quarantine.py
+#
+# When an operation fails on every attempt with the same error (Example: a
+# missing or corrupt Excel file), retrying it again only wastes the compute.
+# So the local executor (see the 'local_executor.py' file) adds the Excel
+# file to the project's quarantine list ('analysis/quarantine.json'), and the
+# part_1 and part_2 operations skip the jobs of the quarantined Excel files,
+# so the rest of the project (and the part_3 replicate groups that do not
+# include them) can finish.
+#
+# The quarantine list is a JSON file, so it can also be edited by hand.
+# After fixing an Excel file, remove it from the list with
+# 'python project.py quarantine remove <excel_filename_wo_ext>'.
+
+import contextlib
+import fcntl
+import json
+import os
+import time
+
+# The quarantine list file name, which is stored in the project's 'analysis' directory.
+quarantine_filename = "quarantine.json"
+
+
+def quarantine_path(project_path):
+    """Get the quarantine list file of a project."""
+    return os.path.join(project_path, "analysis", quarantine_filename)
+
+
+@contextlib.contextmanager
+def _lock(project_path):
+    os.makedirs(os.path.dirname(quarantine_path(project_path)), exist_ok=True)
+    with open(f"{quarantine_path(project_path)}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def load_quarantine(project_path):
+    """Get the {excel_filename_wo_ext: entry dict} of the quarantined Excel files."""
+    try:
+        with open(quarantine_path(project_path), "r") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_quarantine(project_path, quarantine_dict):
+    write_filename = quarantine_path(project_path)
+    with open(f"{write_filename}.tmp", "w") as fp:
+        json.dump(quarantine_dict, fp, indent=2, sort_keys=True)
+    os.replace(f"{write_filename}.tmp", write_filename)
+
+
+def add(project_path, excel_filename_wo_ext_list, operation_name, error_summary_str):
+    """Add the Excel files to the quarantine list."""
+    with _lock(project_path):
+        quarantine_dict = load_quarantine(project_path)
+        for excel_filename_wo_ext in excel_filename_wo_ext_list:
+            quarantine_dict[excel_filename_wo_ext] = {
+                "operation": operation_name,
+                "error": error_summary_str,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        _save_quarantine(project_path, quarantine_dict)
+
+
+def remove(project_path, excel_filename_wo_ext_list):
+    """Remove the Excel files from the quarantine list, and get the removed ones."""
+    with _lock(project_path):
+        quarantine_dict = load_quarantine(project_path)
+        removed_list = [n for n in excel_filename_wo_ext_list if n in quarantine_dict]
+        for excel_filename_wo_ext in removed_list:
+            del quarantine_dict[excel_filename_wo_ext]
+        _save_quarantine(project_path, quarantine_dict)
+
+    return removed_list
+
+
+def error_summary(error_message):
+    """Get the last line of an error message (Example: the exception of a traceback).
+
+    For a chained traceback (Example: signac-flow's UserOperationError, which
+    includes the job id), this is the original exception, so the same error
+    of different jobs has the same summary.
+    """
+    original_error_message = error_message.split(
+        "The above exception was the direct cause of the following exception:"
+    )[0]
+    line_list = [
+        line.strip() for line in original_error_message.strip().splitlines() if line.strip()
+    ]
+
+    return line_list[-1] if line_list else ""
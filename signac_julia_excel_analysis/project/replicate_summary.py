@@ -0,0 +1,435 @@
+"""Per-group store of the replicate averages and std. devs."""
+# replicate_summary.py
+#
+# Every replicate group (keyed by its 'statepoint_without_replicate') has its
+# own row in a SQLite store next to the replicate summary text file, with the
+# fingerprint of its member jobs' output files (job id, mtime, and size) from
+# when the group was calculated.  A group is dirty only if the current
+# fingerprint of its member jobs is different (a member's output changed, or a
+# member was added or removed), so part_3 only recalculates the dirty groups,
+# and checking if a group is dirty does not change any files.
+#
+# The replicate summary text file is rewritten from the store after every
+# part_3 update, while holding a lock file, and it is replaced atomically.
+#
+# Each group also stores its running statistics (the replicate count, mean,
+# and M2, the sum of the squared differences from the mean) and the member
+# results they include, so when replicates are added (or changed) only the
+# new (or changed) replicates are added to the statistics with Welford's
+# algorithm, instead of recalculating the whole group.  The groups without
+# stored statistics (Example: the first part_3 run) are calculated with one
+# grouped reduction of all their values.
+#
+# If any group has a 'mult_vector' or 'noise_range' statepoint (see the
+# 'init.py' file), the summary text file also has these columns, so the
+# groups of the same Excel file can be told apart.
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import urllib.request
+
+import numpy as np
+
+summary_store_filename = "replicate_summary.sqlite"
+
+summary_header = \
+    f"{'excel_filename_wo_ext': <40} " \
+    f"{'dot_product_avg': <20} " \
+    f"{'dot_product_std_dev': <20} " \
+    f" \n"
+
+
+summary_sweep_header = \
+    f"{'excel_filename_wo_ext': <40} " \
+    f"{'dot_product_avg': <20} " \
+    f"{'dot_product_std_dev': <20} " \
+    f"{'mult_vector': <28} " \
+    f"{'noise_range': <12} " \
+    f" \n"
+
+
+def summary_row(excel_filename_wo_ext, dot_product_avg, dot_product_std_dev):
+    """Get the summary file row of a replicate group."""
+    return \
+        f"{excel_filename_wo_ext: <40} " \
+        f"{dot_product_avg: <20} " \
+        f"{dot_product_std_dev: <20} " \
+        f" \n"
+
+
+def summary_sweep_row(
+    excel_filename_wo_ext, dot_product_avg, dot_product_std_dev, mult_vector, noise_range
+):
+    """Get the summary file row of a replicate group, with its multiplier vector and noise range."""
+    return \
+        f"{excel_filename_wo_ext: <40} " \
+        f"{dot_product_avg: <20} " \
+        f"{dot_product_std_dev: <20} " \
+        f"{str(mult_vector or 'default'): <28} " \
+        f"{str(noise_range or 'default'): <12} " \
+        f" \n"
+
+
+def group_mult_vector_noise_range(group_key):
+    """Get the (mult_vector, noise_range) statepoints of a group (None if not set)."""
+    statepoint_dict = dict(json.loads(group_key))
+
+    return statepoint_dict.get("mult_vector"), statepoint_dict.get("noise_range")
+
+
+def group_fingerprint(member_output_list):
+    """Get the fingerprint of a group's member job output files.
+
+    Parameters
+    ----------
+    member_output_list : list of (job_id, output_mtime_ns, output_size)
+    """
+    sha1 = hashlib.sha1()
+    for member_output in sorted(member_output_list):
+        sha1.update(("\t".join(str(m) for m in member_output) + "\n").encode())
+
+    return sha1.hexdigest()
+
+
+def welford_add(count, mean, m2, value_list):
+    """Add the values to the running (count, mean, M2) statistics."""
+    for value in value_list:
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+
+    return count, mean, m2
+
+
+def welford_remove(count, mean, m2, value_list):
+    """Remove the values from the running (count, mean, M2) statistics."""
+    for value in value_list:
+        if count <= 1:
+            count, mean, m2 = 0, 0.0, 0.0
+            continue
+        mean_without_value = (count * mean - value) / (count - 1)
+        m2 -= (value - mean) * (value - mean_without_value)
+        count -= 1
+        mean = mean_without_value
+
+    return count, mean, max(m2, 0.0)
+
+
+def running_std_dev(count, m2):
+    """Get the std. dev. (ddof=1) of the running statistics (nan if count < 2)."""
+    if count < 2:
+        return float("nan")
+
+    return math.sqrt(m2 / (count - 1))
+
+
+def group_member_changes(group_stats, stored_member_dict, current_member_dict, get_dot_product):
+    """Get a group's new, changed, and removed members since its statistics were stored.
+
+    Parameters
+    ----------
+    group_stats : (count, mean, M2) or None
+        The stored running statistics of the group (None if not stored).
+    stored_member_dict : dict
+        {job_id: (output_mtime_ns, output_size, dot_product)} of the members
+        included in the stored statistics.
+    current_member_dict : dict
+        {job_id: (output_mtime_ns, output_size)} of the group's current members.
+    get_dot_product : function(job_id)
+        Get a member's dot product, which is only called for the new or
+        changed members.
+
+    Returns
+    -------
+    The (count, mean, M2) of the kept members (None if the group is
+    recalculated from all its members), {job_id: (output_mtime_ns,
+    output_size, dot_product)} of the added members, and the list of the
+    removed member job ids.
+    """
+    if group_stats is None or group_stats[0] != len(stored_member_dict):
+        # the statistics do not match their members (Example: a store made
+        # before the running statistics were stored), so they are recalculated
+        removed_job_id_list = list(stored_member_dict)
+        kept_group_stats = None
+        stored_member_dict = {}
+    else:
+        removed_job_id_list = [
+            job_id for job_id, member in stored_member_dict.items()
+            if current_member_dict.get(job_id) != tuple(member[:2])
+        ]
+        kept_group_stats = welford_remove(
+            *group_stats, [stored_member_dict[job_id][2] for job_id in removed_job_id_list]
+        )
+
+    removed_job_id_set = set(removed_job_id_list)
+    added_member_dict = {
+        job_id: (*member_output, get_dot_product(job_id))
+        for job_id, member_output in current_member_dict.items()
+        if job_id not in stored_member_dict or job_id in removed_job_id_set
+    }
+
+    return kept_group_stats, added_member_dict, removed_job_id_list
+
+
+def grouped_stats(group_value_dict):
+    """Get the (count, mean, M2) of many groups' values with one grouped reduction.
+
+    Parameters
+    ----------
+    group_value_dict : dict
+        {group_key: list of the group's values}
+
+    Returns
+    -------
+    dict
+        {group_key: (count, mean, M2)}
+    """
+    group_key_list = list(group_value_dict)
+    group_index_array = np.repeat(
+        np.arange(len(group_key_list)), [len(group_value_dict[k]) for k in group_key_list]
+    )
+    value_array = np.array(
+        [value for group_key in group_key_list for value in group_value_dict[group_key]],
+        dtype=float,
+    )
+    count_array = np.bincount(group_index_array, minlength=len(group_key_list))
+    sum_array = np.bincount(group_index_array, weights=value_array, minlength=len(group_key_list))
+    mean_array = np.divide(
+        sum_array, count_array, out=np.zeros(len(group_key_list)), where=count_array > 0
+    )
+    # M2 is summed from the mean, not from the sum of the squares, so it is as
+    # accurate as a full recalculation
+    m2_array = np.bincount(
+        group_index_array,
+        weights=(value_array - mean_array[group_index_array]) ** 2,
+        minlength=len(group_key_list),
+    )
+
+    group_stats_dict = {
+        group_key: (int(count), float(mean), float(m2))
+        for group_key, count, mean, m2 in zip(group_key_list, count_array, mean_array, m2_array)
+    }
+
+    return group_stats_dict
+
+
+def update_groups_stats(group_change_dict):
+    """Get the updated running statistics of many groups from their member changes.
+
+    The groups recalculated from all their members (Example: the first part_3
+    run) are seeded with one grouped reduction over all their values, and
+    the other groups only add their new (or changed) members to their kept
+    statistics with Welford's algorithm.
+
+    Parameters
+    ----------
+    group_change_dict : dict
+        {group_key: the 'group_member_changes' result of the group}
+
+    Returns
+    -------
+    dict
+        {group_key: (count, mean, M2)}
+    """
+    group_stats_dict = grouped_stats(
+        {
+            group_key: [m[2] for m in added_member_dict.values()]
+            for group_key, (kept_group_stats, added_member_dict, _) in group_change_dict.items()
+            if kept_group_stats is None
+        }
+    )
+    for group_key, (kept_group_stats, added_member_dict, _) in group_change_dict.items():
+        if kept_group_stats is not None:
+            group_stats_dict[group_key] = welford_add(
+                *kept_group_stats, [m[2] for m in added_member_dict.values()]
+            )
+
+    return group_stats_dict
+
+
+def table_column_set(connection, table_name):
+    """Get the set of a table's column names (empty if there is no such table)."""
+    return {c[1] for c in connection.execute(f"PRAGMA table_info({table_name})")}
+
+
+class ReplicateSummary:
+    """The per-group replicate summary store of a project."""
+
+    def __init__(self, summary_filename):
+        self.summary_filename = summary_filename
+        self.store_filename = os.path.join(
+            os.path.dirname(os.path.abspath(summary_filename)), summary_store_filename
+        )
+
+    def _connect(self):
+        """Open the store to write, creating (or migrating) its tables.
+
+        This changes the schema, so it is only used while holding the
+        exclusive lock (see 'write_groups').
+        """
+        os.makedirs(os.path.dirname(self.store_filename), exist_ok=True)
+        connection = sqlite3.connect(self.store_filename, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS replicate_groups ("
+            "group_key TEXT PRIMARY KEY, "
+            "excel_filename_wo_ext TEXT, "
+            "member_fingerprint TEXT, "
+            "dot_product_avg REAL, "
+            "dot_product_std_dev REAL, "
+            "replicate_count INTEGER, "
+            "dot_product_m2 REAL)"
+        )
+        # add the running statistics columns to a store made before they were stored
+        column_set = {c[1] for c in connection.execute("PRAGMA table_info(replicate_groups)")}
+        for column, column_type in (("replicate_count", "INTEGER"), ("dot_product_m2", "REAL")):
+            if column not in column_set:
+                connection.execute(
+                    f"ALTER TABLE replicate_groups ADD COLUMN {column} {column_type}"
+                )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS replicate_group_members ("
+            "group_key TEXT, "
+            "job_id TEXT, "
+            "output_mtime_ns INTEGER, "
+            "output_size INTEGER, "
+            "dot_product REAL, "
+            "PRIMARY KEY (group_key, job_id))"
+        )
+        return connection
+
+    def _connect_read_only(self):
+        """Open the store to read, without changing its schema (it can be older or partly made)."""
+        return sqlite3.connect(
+            f"file:{urllib.request.pathname2url(self.store_filename)}?mode=ro", uri=True, timeout=60
+        )
+
+    @contextlib.contextmanager
+    def lock(self, write_bool=True):
+        """Hold the summary's lock file, exclusive to write or shared to read.
+
+        SQLite's own locking is not reliable on a network/parallel filesystem,
+        so the store is only read or written while holding this lock (see the
+        'sqlite_lock.py' file).
+        """
+        os.makedirs(os.path.dirname(self.store_filename), exist_ok=True)
+        with open(f"{self.summary_filename}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if write_bool else fcntl.LOCK_SH)
+            yield
+
+    def read_fingerprints(self):
+        """Get the stored {group_key: member_fingerprint} of all the groups."""
+        if not os.path.isfile(self.store_filename):
+            return {}
+        with self.lock(write_bool=False), \
+                contextlib.closing(self._connect_read_only()) as connection:
+            if "member_fingerprint" not in table_column_set(connection, "replicate_groups"):
+                return {}
+            return dict(
+                connection.execute("SELECT group_key, member_fingerprint FROM replicate_groups")
+            )
+
+    def read_group_stats(self, group_key_list):
+        """Get the stored running statistics and members of the groups.
+
+        Returns
+        -------
+        dict
+            {group_key: ((count, mean, M2) or None,
+            {job_id: (output_mtime_ns, output_size, dot_product)})}
+        """
+        if not os.path.isfile(self.store_filename):
+            return {}
+        group_stats_dict = {}
+        with self.lock(write_bool=False), \
+                contextlib.closing(self._connect_read_only()) as connection:
+            # a store made before the running statistics were stored has no
+            # statistics columns or members table, so its groups are recalculated
+            stats_bool = {"replicate_count", "dot_product_avg", "dot_product_m2"}.issubset(
+                table_column_set(connection, "replicate_groups")
+            )
+            members_bool = bool(table_column_set(connection, "replicate_group_members"))
+            for group_key in group_key_list:
+                stats_row = None
+                if stats_bool:
+                    stats_row = connection.execute(
+                        "SELECT replicate_count, dot_product_avg, dot_product_m2 "
+                        "FROM replicate_groups WHERE group_key = ?",
+                        (group_key,),
+                    ).fetchone()
+                member_dict = {}
+                if members_bool:
+                    member_dict = {
+                        job_id: (output_mtime_ns, output_size, dot_product)
+                        for job_id, output_mtime_ns, output_size, dot_product in connection.execute(
+                            "SELECT job_id, output_mtime_ns, output_size, dot_product "
+                            "FROM replicate_group_members WHERE group_key = ?",
+                            (group_key,),
+                        )
+                    }
+                group_stats_dict[group_key] = (
+                    None if stats_row is None or None in stats_row else tuple(stats_row),
+                    member_dict,
+                )
+
+        return group_stats_dict
+
+    def write_groups(self, group_row_list, member_change_list=()):
+        """Store the groups' rows and rewrite the summary text file.
+
+        Parameters
+        ----------
+        group_row_list : list of tuples
+            (group_key, excel_filename_wo_ext, member_fingerprint,
+            replicate_count, dot_product_avg, dot_product_m2,
+            dot_product_std_dev) for each group.
+        member_change_list : list of tuples
+            (group_key, added_member_dict, removed_job_id_list) for each
+            group, from 'update_group_stats'.
+        """
+        with self.lock():
+            with contextlib.closing(self._connect()) as connection:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO replicate_groups (group_key, "
+                        "excel_filename_wo_ext, member_fingerprint, replicate_count, "
+                        "dot_product_avg, dot_product_m2, dot_product_std_dev) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        group_row_list,
+                    )
+                    for group_key, added_member_dict, removed_job_id_list in member_change_list:
+                        connection.executemany(
+                            "DELETE FROM replicate_group_members "
+                            "WHERE group_key = ? AND job_id = ?",
+                            [(group_key, job_id) for job_id in removed_job_id_list],
+                        )
+                        connection.executemany(
+                            "INSERT OR REPLACE INTO replicate_group_members VALUES (?, ?, ?, ?, ?)",
+                            [
+                                (group_key, job_id, *member)
+                                for job_id, member in added_member_dict.items()
+                            ],
+                        )
+                summary_row_list = connection.execute(
+                    "SELECT excel_filename_wo_ext, dot_product_avg, dot_product_std_dev, "
+                    "group_key FROM replicate_groups ORDER BY excel_filename_wo_ext, group_key"
+                ).fetchall()
+            sweep_value_list = [group_mult_vector_noise_range(row[3]) for row in summary_row_list]
+
+            # write to a temporary file and then replace the summary file, so
+            # the summary file is never seen partly written
+            with open(f"{self.summary_filename}.tmp", "w") as fp:
+                if all(sweep_values == (None, None) for sweep_values in sweep_value_list):
+                    fp.write(summary_header)
+                    for row in summary_row_list:
+                        fp.write(summary_row(*row[:3]))
+                else:
+                    fp.write(summary_sweep_header)
+                    for row, sweep_values in zip(summary_row_list, sweep_value_list):
+                        fp.write(summary_sweep_row(*row[:3], *sweep_values))
+            os.replace(f"{self.summary_filename}.tmp", self.summary_filename)
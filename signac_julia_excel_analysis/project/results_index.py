@@ -0,0 +1,310 @@
+"""Project-level index of the part_2 dot product results"""
+# results_index.py
+#
+# Stores the completion status and the parsed dot product of every job in a
+# single SQLite file in the 'analysis' directory, so the labels and the
+# pre/post conditions do not need to open and parse every job's
+# 'dot_product_output_file.txt' file on every 'status', 'run', or 'submit'.
+#
+# An index row is only reused if the output file's mtime and size are
+# unchanged, otherwise the output file is parsed again and the row updated.
+#
+# While signac-flow evaluates the labels and conditions (see the
+# 'Project._buffered' function in the 'project.py' file), a snapshot is used,
+# so every output file is checked at most once per evaluation pass, and the
+# project-wide checks are only calculated once, instead of once per aggregate.
+#
+# When the results store is used (see the 'results_store.py' file), this index
+# is only used for the jobs that are not in the store yet.
+#
+# On a network/parallel filesystem, each stat and read of an output file is
+# mostly a round trip to the file server, so 'prefetch' stats (and parses) the
+# output files of many jobs at the same time in a thread pool, and puts their
+# results in the snapshot before they are needed.
+#
+# The index file is only written by one process at a time, while holding its
+# lock (see the 'sqlite_lock.py' file), as SQLite's own locking is not
+# reliable on a network/parallel filesystem.
+
+import collections
+import contextlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlite_lock
+
+# The index file name, which is stored in the project's 'analysis' directory.
+results_index_filename = "results_index.sqlite"
+
+JobResult = collections.namedtuple(
+    "JobResult",
+    ["started", "completed", "dot_product", "output_mtime_ns", "output_size"],
+    defaults=(None, None),
+)
+
+_lock = threading.RLock()
+_indexes = {}
+_snapshot_depth = 0
+_snapshot_results = {}
+_snapshot_memo = {}
+
+
+def parse_dot_product_output(output_text):
+    """Parse the text of a 'dot_product_output_file.txt' file.
+
+    Returns a JobResult, where 'completed' is True only if the file has the
+    'Dot_Product Calculations Completed' line, and 'dot_product' is the
+    value on the single value line (None if the file format is wrong).
+    """
+    completed_bool = False
+    dot_product_list = []
+    format_error_bool = False
+    for line in output_text.splitlines():
+        split_line = line.split()
+        if len(split_line) == 1:
+            try:
+                dot_product_list.append(float(split_line[0]))
+            except ValueError:
+                format_error_bool = True
+        elif (
+            len(split_line) == 3
+            and split_line[0] == "Dot_Product"
+            and split_line[1] == "Calculations"
+            and split_line[2] == "Completed"
+        ):
+            completed_bool = True
+        elif len(split_line) != 0:
+            format_error_bool = True
+
+    dot_product = None
+    if not format_error_bool and len(dot_product_list) == 1:
+        dot_product = dot_product_list[0]
+
+    return JobResult(True, completed_bool, dot_product)
+
+
+def read_dot_product_output_file(output_filename):
+    """Parse a 'dot_product_output_file.txt' file (see 'parse_dot_product_output')."""
+    with open(output_filename, "r") as fp:
+        return parse_dot_product_output(fp.read())
+
+
+class ResultsIndex:
+    """The SQLite results index of a single signac project."""
+
+    def __init__(self, project_path):
+        self.index_filename = os.path.join(project_path, "analysis", results_index_filename)
+        self._rows = None
+        self._pending_rows = {}
+        self._pending_deletes = set()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.index_filename), exist_ok=True)
+        connection = sqlite3.connect(self.index_filename, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            "job_id TEXT PRIMARY KEY, "
+            "excel_filename_wo_ext TEXT, "
+            "replicate_number_int INTEGER, "
+            "output_mtime_ns INTEGER, "
+            "output_size INTEGER, "
+            "completed INTEGER, "
+            "dot_product REAL)"
+        )
+        return connection
+
+    def _load(self):
+        """Read the whole index into memory with one query."""
+        self._rows = {}
+        try:
+            with sqlite_lock.locked_connection(
+                self.index_filename, self._connect, write_bool=False
+            ) as connection:
+                for row in connection.execute(
+                    "SELECT job_id, output_mtime_ns, output_size, completed, dot_product "
+                    "FROM job_results"
+                ):
+                    self._rows[row[0]] = row[1:]
+        except (sqlite3.Error, OSError) as err:
+            # the index is only a cache, so the project still works without it
+            print(f"WARNING: Can not read the results index {self.index_filename}: {err}")
+
+    def read_output(self, job, output_filename):
+        """Stat a job's output file, and parse it only if it changed since it was indexed.
+
+        This only reads the loaded index rows, so many jobs can be read at
+        the same time (see 'prefetch').  Returns (the os.stat result or None
+        if there is no output file, the parsed JobResult or None if unchanged).
+        """
+        try:
+            output_stat = os.stat(job.fn(output_filename))
+        except FileNotFoundError:
+            return None, None
+
+        row = self._rows.get(job.id)
+        if (
+            row is not None
+            and row[0] == output_stat.st_mtime_ns
+            and row[1] == output_stat.st_size
+        ):
+            return output_stat, None
+
+        return output_stat, read_dot_product_output_file(job.fn(output_filename))
+
+    def job_result(self, job, output_filename):
+        """Get the JobResult of a job, only parsing the output file if it changed."""
+        with _lock:
+            if self._rows is None:
+                self._load()
+
+            return self.update_row(job, *self.read_output(job, output_filename))
+
+    def update_row(self, job, output_stat, parsed_result):
+        """Update a job's index row from 'read_output', and get its JobResult."""
+        with _lock:
+            if output_stat is None:
+                if job.id in self._rows:
+                    del self._rows[job.id]
+                    self._pending_deletes.add(job.id)
+                return JobResult(False, False, None)
+
+            if parsed_result is None:
+                row = self._rows[job.id]
+                return JobResult(True, bool(row[2]), row[3], row[0], row[1])
+
+            result = parsed_result._replace(
+                output_mtime_ns=output_stat.st_mtime_ns, output_size=output_stat.st_size
+            )
+            self._rows[job.id] = (
+                output_stat.st_mtime_ns,
+                output_stat.st_size,
+                int(result.completed),
+                result.dot_product,
+            )
+            self._pending_rows[job.id] = (
+                job.id,
+                job.cached_statepoint.get("excel_filename_wo_ext"),
+                job.cached_statepoint.get("replicate_number_int"),
+            ) + self._rows[job.id]
+            self._pending_deletes.discard(job.id)
+
+            return result
+
+    def flush(self):
+        """Write the changed rows to the index file in a single transaction."""
+        with _lock:
+            if not self._pending_rows and not self._pending_deletes:
+                return
+            try:
+                with sqlite_lock.locked_connection(
+                    self.index_filename, self._connect
+                ) as connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        list(self._pending_rows.values()),
+                    )
+                    connection.executemany(
+                        "DELETE FROM job_results WHERE job_id = ?",
+                        [(job_id,) for job_id in self._pending_deletes],
+                    )
+            except (sqlite3.Error, OSError) as err:
+                print(f"WARNING: Can not write the results index {self.index_filename}: {err}")
+            self._pending_rows = {}
+            self._pending_deletes = set()
+
+
+def get_index(project):
+    """Get the results index of a project."""
+    with _lock:
+        if project.path not in _indexes:
+            _indexes[project.path] = ResultsIndex(project.path)
+
+        return _indexes[project.path]
+
+
+def job_result(job, output_filename):
+    """Get the indexed JobResult of a job's output file."""
+    with _lock:
+        key = (job.id, output_filename)
+        if _snapshot_depth > 0 and key in _snapshot_results:
+            return _snapshot_results[key]
+
+        index = get_index(job.project)
+        result = index.job_result(job, output_filename)
+        if _snapshot_depth > 0:
+            _snapshot_results[key] = result
+        else:
+            index.flush()
+
+        return result
+
+
+def prefetch(jobs, output_filename, max_workers):
+    """Read the jobs' output files with 'max_workers' threads into the snapshot.
+
+    The following 'job_result' calls of these jobs in the snapshot do not
+    read their output files again.  This does nothing outside a snapshot, as
+    the results are only kept until the snapshot exits.
+    """
+    with _lock:
+        if _snapshot_depth == 0:
+            return
+        job_list = [job for job in jobs if (job.id, output_filename) not in _snapshot_results]
+        if not job_list:
+            return
+        index = get_index(job_list[0].project)
+        if index._rows is None:
+            index._load()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        read_output_list = list(
+            pool.map(lambda job: index.read_output(job, output_filename), job_list)
+        )
+
+    with _lock:
+        for job, (output_stat, parsed_result) in zip(job_list, read_output_list):
+            _snapshot_results[(job.id, output_filename)] = index.update_row(
+                job, output_stat, parsed_result
+            )
+
+
+def memoize(key, func):
+    """Only call 'func' once per snapshot for the given key (every time outside a snapshot)."""
+    with _lock:
+        if _snapshot_depth > 0 and key in _snapshot_memo:
+            return _snapshot_memo[key]
+
+        value = func()
+        if _snapshot_depth > 0:
+            _snapshot_memo[key] = value
+
+        return value
+
+
+def snapshot_active():
+    """Check if a snapshot is being used."""
+    return _snapshot_depth > 0
+
+
+@contextlib.contextmanager
+def snapshot():
+    """Check each output file at most once until the (outermost) snapshot exits.
+
+    This must only be used while no operations are run, as the output
+    files are assumed to not change inside the snapshot.
+    """
+    global _snapshot_depth
+    with _lock:
+        _snapshot_depth += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _snapshot_depth -= 1
+            if _snapshot_depth == 0:
+                _snapshot_results.clear()
+                _snapshot_memo.clear()
+                for index in _indexes.values():
+                    index.flush()
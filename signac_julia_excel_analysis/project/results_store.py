@@ -0,0 +1,241 @@
+"""Consolidated project-level store of the part_2 dot product results"""
+# results_store.py
+#
+# Every part_2 result is also appended to a single file in the project's
+# 'analysis' directory, as a fixed size binary record (see 'record_dtype')
+# keyed by the job id, so the labels, part_3, and any notebook can read all the
+# results with one open of one memory-mapped file, instead of opening
+# (or stat'ing) every job's 'dot_product_output_file.txt' file.
+#
+# The store is append-only, so many jobs can add their results at the same
+# time (each append holds a lock on the file), and the last record of a job id
+# is its current result.  A "deleted" record removes a job's result
+# (Example: when 'init.py' resets a job, or with the 'forget' command).
+# The 'compact' command rewrites the store with only the current results.
+#
+# Read the store in a notebook with:
+#   import results_store
+#   results = results_store.read_current_records("<project_path>")
+#   results["job_id"], results["dot_product"], ...
+
+import fcntl
+import os
+import threading
+
+import numpy as np
+
+import results_index
+
+# The store file name, which is stored in the project's 'analysis' directory.
+results_store_filename = "results_store_v1.bin"
+
+record_dtype = np.dtype(
+    [
+        ("job_id", "S32"),
+        ("dot_product", "<f8"),
+        ("output_mtime_ns", "<i8"),
+        ("output_size", "<i8"),
+        ("completed", "u1"),
+        ("deleted", "u1"),
+        ("padding", "V6"),
+    ]
+)
+
+_lock = threading.RLock()
+_stores = {}
+
+
+def store_filename(project_path):
+    """Get the store file name of a project."""
+    return os.path.join(project_path, "analysis", results_store_filename)
+
+
+def make_records(job_result_dict, deleted_bool=False):
+    """Get the store records of {job_id: JobResult} (JobResult is None if deleted_bool)."""
+    records = np.zeros(len(job_result_dict), dtype=record_dtype)
+    records["job_id"] = [job_id.encode() for job_id in job_result_dict]
+    if deleted_bool:
+        records["deleted"] = 1
+        records["dot_product"] = np.nan
+        return records
+
+    job_result_list = list(job_result_dict.values())
+    records["dot_product"] = [
+        np.nan if r.dot_product is None else r.dot_product for r in job_result_list
+    ]
+    records["output_mtime_ns"] = [r.output_mtime_ns or 0 for r in job_result_list]
+    records["output_size"] = [r.output_size or 0 for r in job_result_list]
+    records["completed"] = [int(bool(r.completed)) for r in job_result_list]
+
+    return records
+
+
+def append_records(project_path, records):
+    """Append the records to the store, holding the store's lock."""
+    if len(records) == 0:
+        return
+    filename = store_filename(project_path)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    while True:
+        fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # the store may have been compacted (replaced) before the lock
+            # was held, so then the new store file is opened again
+            if os.fstat(fd).st_ino != os.stat(filename).st_ino:
+                continue
+            # only whole records are ever read, so a partly written
+            # record at the end of the file is ignored until it is complete
+            os.write(fd, records.tobytes())
+            return
+        finally:
+            os.close(fd)
+
+
+def store_output_files(project_path, job_output_filename_dict):
+    """Parse the jobs' output files and append their results to the store.
+
+    Parameters
+    ----------
+    job_output_filename_dict : dict
+        {job_id: output file name} of the jobs.
+    """
+    job_result_dict = {}
+    for job_id, output_filename in job_output_filename_dict.items():
+        output_stat = os.stat(output_filename)
+        job_result_dict[job_id] = results_index.read_dot_product_output_file(
+            output_filename
+        )._replace(output_mtime_ns=output_stat.st_mtime_ns, output_size=output_stat.st_size)
+
+    append_records(project_path, make_records(job_result_dict))
+
+
+def forget(project_path, job_id_list):
+    """Remove the jobs' results from the store (with "deleted" records)."""
+    append_records(project_path, make_records({job_id: None for job_id in job_id_list}, True))
+
+
+def read_records(project_path):
+    """Memory-map all the (whole) records in the store, or None if there is no store."""
+    filename = store_filename(project_path)
+    try:
+        number_of_records = os.path.getsize(filename) // record_dtype.itemsize
+    except FileNotFoundError:
+        return None
+    if number_of_records == 0:
+        return np.zeros(0, dtype=record_dtype)
+
+    return np.memmap(filename, dtype=record_dtype, mode="r", shape=(number_of_records,))
+
+
+def read_current_records(project_path):
+    """Get the current (last, not deleted) record of every job in the store."""
+    records = read_records(project_path)
+    if records is None or len(records) == 0:
+        return np.zeros(0, dtype=record_dtype)
+
+    # the last record of each job id is found by searching the reversed records
+    _, reversed_index = np.unique(records["job_id"][::-1], return_index=True)
+    current_records = records[np.sort(len(records) - 1 - reversed_index)]
+
+    return current_records[current_records["deleted"] == 0]
+
+
+def compact(project_path):
+    """Rewrite the store with only the current record of every job."""
+    filename = store_filename(project_path)
+    if not os.path.isfile(filename):
+        return 0, 0
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        # hold the store's lock, so no records are added while it is rewritten
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        number_of_records = os.fstat(fd).st_size // record_dtype.itemsize
+        current_records = read_current_records(project_path)
+        with open(f"{filename}.tmp", "wb") as fp:
+            fp.write(current_records.tobytes())
+        os.replace(f"{filename}.tmp", filename)
+    finally:
+        os.close(fd)
+
+    return number_of_records, len(current_records)
+
+
+class ResultsStore:
+    """The in-memory {job_id: record index} of a project's store.
+
+    The store file is only mapped again when it changes, and as it is
+    append-only, only the records appended since the last read are indexed.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self._records = None
+        self._record_index_dict = {}
+        self._file_key = None
+
+    def update(self):
+        """Index any new records in the store file."""
+        with _lock:
+            try:
+                file_stat = os.stat(store_filename(self.project_path))
+                file_key = (file_stat.st_ino, file_stat.st_size)
+            except FileNotFoundError:
+                file_key = None
+            if file_key == self._file_key:
+                return
+
+            read_records_int = 0 if self._records is None else len(self._records)
+            if file_key is None or self._file_key is None or file_key[0] != self._file_key[0]:
+                # the store is new, removed, or compacted, so it is indexed again
+                self._record_index_dict = {}
+                read_records_int = 0
+            self._file_key = file_key
+            self._records = None if file_key is None else read_records(self.project_path)
+            if self._records is None:
+                return
+
+            for i, job_id in enumerate(
+                self._records["job_id"][read_records_int:], start=read_records_int
+            ):
+                self._record_index_dict[job_id.decode()] = i
+
+    def job_result(self, job_id):
+        """Get the JobResult of a job, or None if the job is not in the store."""
+        with _lock:
+            record_index = self._record_index_dict.get(job_id)
+            if record_index is None:
+                return None
+            record = self._records[record_index]
+            if record["deleted"]:
+                return None
+
+            dot_product = float(record["dot_product"])
+            return results_index.JobResult(
+                True,
+                bool(record["completed"]),
+                None if np.isnan(dot_product) else dot_product,
+                int(record["output_mtime_ns"]),
+                int(record["output_size"]),
+            )
+
+
+def get_store(project_path):
+    """Get the results store of a project."""
+    with _lock:
+        if project_path not in _stores:
+            _stores[project_path] = ResultsStore(project_path)
+
+        return _stores[project_path]
+
+
+def job_result(job):
+    """Get the stored JobResult of a job, or None if the job is not in the store.
+
+    In a results index snapshot (see the 'results_index.py' file), the store
+    file is only checked for new records once per snapshot.
+    """
+    store = get_store(job.project.path)
+    results_index.memoize(("results_store_update", job.project.path), store.update)
+
+    return store.job_result(job.id)
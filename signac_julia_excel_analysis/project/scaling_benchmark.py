@@ -0,0 +1,359 @@
+"""Scaling benchmark of init.py and the project parts with synthetic workbooks"""
+# scaling_benchmark.py
+#
+# Generates synthetic Excel workbooks with the 'value_0' to 'value_3' column
+# layout that part_1 and the 'src/julia/matrix.jl' file expect, and runs
+# 'init.py' and each part of the project at different numbers of jobs, in a
+# copy of this project, so this project's workspace is not changed.
+#
+# For every number of jobs and stage, the report (JSON) records:
+# - the wall time,
+# - the per-operation and per-job latency percentiles (an aggregate
+#   operation's time is split evenly between its jobs),
+# - the peak memory (RSS) of the stage's processes,
+# - the number of files opened by the stage's python processes
+#   (the files opened by Julia are not counted).
+#
+# Command line usage (run from the project directory):
+#   python scaling_benchmark.py --jobs 10 1000 10000 100000 --replicates 2
+#   python scaling_benchmark.py --jobs 1000 --set part_2_dot_product_engine_str='"numpy"'
+#   python scaling_benchmark.py --jobs 1000 --runner run-local --report numpy_run_local.json
+
+import argparse
+import atexit
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import re
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import openpyxl
+
+project_source_directory = os.path.dirname(os.path.abspath(__file__))
+
+# The stages, and the operations (regular expressions) run in each part
+stage_operation_dict = {
+    "part_1": "part_1_.*",
+    "part_2": "part_2_.*",
+    "part_3": "part_3_.*",
+}
+stage_list = ["init"] + list(stage_operation_dict)
+
+latency_percentile_list = [50, 90, 99]
+
+
+def generate_workbooks(excel_directory, number_of_workbooks, rows, seed=0):
+    """Write synthetic workbooks with the 'value_0' to 'value_3' columns.
+
+    Each workbook has the header row and 'rows' data rows of random
+    integers between 0 and 10 in 'Sheet1'.
+    """
+    os.makedirs(excel_directory, exist_ok=True)
+    rng = random.Random(seed)
+    number_of_digits = len(str(max(number_of_workbooks - 1, 0)))
+    for i in range(number_of_workbooks):
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+        sheet.append(["value_0", "value_1", "value_2", "value_3"])
+        for _ in range(rows):
+            sheet.append([rng.randint(0, 10) for _ in range(4)])
+        workbook.save(os.path.join(excel_directory, f"excel_file_{i:0{number_of_digits}d}.xlsx"))
+
+
+def set_script_variable(filename, variable_name, value_str):
+    """Replace the 'variable_name = ...' line of a script with the given value."""
+    with open(filename, "r") as fp:
+        script_str = fp.read()
+
+    script_str, number_of_replacements = re.subn(
+        rf"^{re.escape(variable_name)} = .*$",
+        lambda _: f"{variable_name} = {value_str}",
+        script_str,
+        flags=re.MULTILINE,
+    )
+    if number_of_replacements == 0:
+        raise ValueError(f"ERROR: The '{variable_name}' variable is not in the {filename} file.")
+
+    with open(filename, "w") as fp:
+        fp.write(script_str)
+
+
+def copy_project(benchmark_project_directory):
+    """Copy this project's code (not its workspace or data) to a new directory."""
+    os.makedirs(benchmark_project_directory)
+    for filename in os.listdir(project_source_directory):
+        if filename.endswith(".py"):
+            shutil.copy2(
+                os.path.join(project_source_directory, filename), benchmark_project_directory
+            )
+    shutil.copytree(
+        os.path.join(project_source_directory, "templates"),
+        os.path.join(benchmark_project_directory, "templates"),
+    )
+    shutil.copytree(
+        os.path.join(project_source_directory, "src", "julia"),
+        os.path.join(benchmark_project_directory, "src", "julia"),
+    )
+
+
+def run_instrumented_script(record_filename, script_argv):
+    """Run a python script, recording its operations' latency and opened files.
+
+    This is run in the stage's process (see 'run_stage').  Every process,
+    including the forked worker processes, appends its records to the
+    record file as JSON lines.
+    """
+    record_fd = os.open(record_filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    main_pid = os.getpid()
+    open_count = [0]
+
+    def write_record(record_dict):
+        os.write(record_fd, (json.dumps(record_dict) + "\n").encode())
+
+    def audit_hook(event, args):
+        if event == "open":
+            open_count[0] += 1
+
+    sys.addaudithook(audit_hook)
+    atexit.register(
+        lambda: os.getpid() == main_pid
+        and write_record({"pid": main_pid, "process_opens": open_count[0]})
+    )
+
+    if os.path.basename(script_argv[0]) == "project.py":
+        import flow
+
+        execute_operation = flow.FlowProject._execute_operation
+
+        def timed_execute_operation(self, operation, *args, **kwargs):
+            start_time = time.perf_counter()
+            start_open_count = open_count[0]
+            try:
+                return execute_operation(self, operation, *args, **kwargs)
+            finally:
+                write_record(
+                    {
+                        "pid": os.getpid(),
+                        "operation": operation.name,
+                        "jobs": len(operation._jobs),
+                        "seconds": time.perf_counter() - start_time,
+                        "opens": open_count[0] - start_open_count,
+                    }
+                )
+
+        flow.FlowProject._execute_operation = timed_execute_operation
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_argv[0])))
+    sys.argv = list(script_argv)
+    runpy.run_path(script_argv[0], run_name="__main__")
+
+
+def latency_percentiles(seconds_list):
+    """Get the latency percentiles (s) of a list of times."""
+    if len(seconds_list) == 0:
+        return {}
+    percentile_dict = {
+        f"p{p}": float(v) for p, v in zip(
+            latency_percentile_list, np.percentile(seconds_list, latency_percentile_list)
+        )
+    }
+    percentile_dict["max"] = float(max(seconds_list))
+
+    return percentile_dict
+
+
+def run_stage(benchmark_project_directory, script_argv, log_file):
+    """Run a stage's script in its own process and measure it."""
+    record_filename = os.path.join(benchmark_project_directory, "benchmark_records.jsonl")
+    if os.path.exists(record_filename):
+        os.remove(record_filename)
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "_run_instrumented", record_filename, "--"]
+        + script_argv,
+        cwd=benchmark_project_directory,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    # 'wait4' gives the peak RSS of this stage's process and its child processes
+    _, exit_status, resource_usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(exit_status)
+    wall_time_s = time.perf_counter() - start_time
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"ERROR: The benchmark stage '{' '.join(script_argv)}' failed, see {log_file.name}"
+        )
+
+    record_list = []
+    if os.path.exists(record_filename):
+        with open(record_filename, "r") as fp:
+            record_list = [json.loads(line) for line in fp]
+
+    # the main process' count already includes its own operations' files
+    operation_record_list = [r for r in record_list if "operation" in r]
+    main_record_list = [r for r in record_list if "process_opens" in r]
+    main_pid_set = {r["pid"] for r in main_record_list}
+    files_opened = sum(r["process_opens"] for r in main_record_list) + sum(
+        r["opens"] for r in operation_record_list if r["pid"] not in main_pid_set
+    )
+
+    per_job_seconds_list = []
+    for r in operation_record_list:
+        per_job_seconds_list.extend([r["seconds"] / max(r["jobs"], 1)] * r["jobs"])
+
+    return {
+        "command": " ".join(script_argv),
+        "wall_time_s": wall_time_s,
+        "operations": len(operation_record_list),
+        "jobs": sum(r["jobs"] for r in operation_record_list),
+        "operation_latency_s": latency_percentiles([r["seconds"] for r in operation_record_list]),
+        "job_latency_s": latency_percentiles(per_job_seconds_list),
+        "peak_rss_mb": resource_usage.ru_maxrss / 1024,
+        "files_opened": files_opened,
+    }
+
+
+def stage_argv(stage, runner):
+    """Get the command line of a stage."""
+    if stage == "init":
+        return ["init.py"]
+    if runner == "run":
+        return ["project.py", "run", "-o", stage_operation_dict[stage]]
+
+    return ["project.py", "run-local", "-o", stage_operation_dict[stage]]
+
+
+def benchmark(
+    jobs_list,
+    replicates,
+    rows,
+    stages,
+    runner,
+    setting_list,
+    work_directory,
+    keep,
+    seed,
+):
+    """Run the scaling benchmark and get the report dict."""
+    setting_dict = dict(s.split("=", 1) for s in setting_list)
+    report_dict = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "replicates": replicates,
+        "rows": rows,
+        "runner": runner,
+        "settings": setting_dict,
+        "runs": [],
+    }
+
+    temporary_directory = tempfile.mkdtemp(prefix="scaling_benchmark_", dir=work_directory)
+    try:
+        for number_of_jobs in jobs_list:
+            number_of_workbooks = math.ceil(number_of_jobs / replicates)
+            benchmark_project_directory = os.path.join(
+                temporary_directory, f"jobs_{number_of_jobs}"
+            )
+            copy_project(benchmark_project_directory)
+            set_script_variable(
+                os.path.join(benchmark_project_directory, "init.py"),
+                "replicate_number",
+                str(list(range(replicates))),
+            )
+            for variable_name, value_str in setting_dict.items():
+                set_script_variable(
+                    os.path.join(benchmark_project_directory, "project.py"),
+                    variable_name,
+                    value_str,
+                )
+
+            print('*********************************************')
+            print(f'number of jobs = {number_of_workbooks * replicates} '
+                  f'({number_of_workbooks} workbooks x {replicates} replicates)')
+            start_time = time.perf_counter()
+            generate_workbooks(
+                os.path.join(benchmark_project_directory, "src", "data"),
+                number_of_workbooks,
+                rows,
+                seed=seed,
+            )
+            print(f'    generated the workbooks in {time.perf_counter() - start_time:.2f} s')
+
+            run_dict = {
+                "jobs": number_of_workbooks * replicates,
+                "workbooks": number_of_workbooks,
+                "stages": {},
+            }
+            log_filename = os.path.join(benchmark_project_directory, "benchmark.log")
+            with open(log_filename, "w") as log_file:
+                for stage in stages:
+                    stage_dict = run_stage(
+                        benchmark_project_directory, stage_argv(stage, runner), log_file
+                    )
+                    run_dict["stages"][stage] = stage_dict
+                    print(f'    {stage}: {stage_dict["wall_time_s"]:.2f} s, '
+                          f'p50 job latency = {stage_dict["job_latency_s"].get("p50", 0):.4f} s, '
+                          f'peak RSS = {stage_dict["peak_rss_mb"]:.1f} MB, '
+                          f'files opened = {stage_dict["files_opened"]}')
+            report_dict["runs"].append(run_dict)
+    finally:
+        if keep:
+            print(f'The benchmark projects are kept in {temporary_directory}')
+        else:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    return report_dict
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "_run_instrumented" and sys.argv[3] == "--":
+        run_instrumented_script(sys.argv[2], sys.argv[4:])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="The numbers of jobs (workbooks x replicates) to benchmark.")
+    parser.add_argument("--replicates", type=int, default=2,
+                        help="The number of replicates per workbook.")
+    parser.add_argument("--rows", type=int, default=1,
+                        help="The number of data rows in each workbook.")
+    parser.add_argument("--stages", nargs="+", choices=stage_list, default=stage_list)
+    parser.add_argument("--runner", choices=["run", "run-local"], default="run",
+                        help="Run the parts with 'project.py run' or 'project.py run-local'.")
+    parser.add_argument("--set", dest="setting_list", action="append", default=[],
+                        metavar="VARIABLE=VALUE",
+                        help="Set a project.py variable (python syntax), "
+                             "Example: --set part_2_dot_product_engine_str='\"numpy\"'")
+    parser.add_argument("--work-directory", default=None,
+                        help="The directory of the benchmark projects (default: the temp directory).")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the benchmark projects and logs.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default="scaling_benchmark_report.json")
+    args = parser.parse_args()
+
+    report_dict = benchmark(
+        args.jobs,
+        args.replicates,
+        args.rows,
+        args.stages,
+        args.runner,
+        args.setting_list,
+        args.work_directory,
+        args.keep,
+        args.seed,
+    )
+    with open(args.report, "w") as fp:
+        json.dump(report_dict, fp, indent=2)
+    print('*********************************************')
+    print(f'The benchmark report is written to {args.report}')
@@ -0,0 +1,57 @@
+"""One writer at a time for the project's SQLite files"""
+# sqlite_lock.py
+#
+# SQLite's own locking (POSIX byte-range locks) is not reliable on many
+# network/parallel filesystems (Example: NFS, GPFS, or Lustre), so a SQLite
+# file written by jobs on many nodes at the same time can be corrupted.
+# The project's SQLite files (the workspace shards, the results index, the
+# operation profile store, and the Excel cache's hash index) are only opened
+# while holding a flock on a '<file>.lock' file next to them, the same way
+# the results store locks its appends (see the 'results_store.py' file):
+# - exclusive to write, so there is only one writer at a time.
+# - shared to read, so many jobs can read at the same time.
+# The connection is closed before the lock is released, so the next process
+# to get the lock reads the file from the file server, and SQLite's default
+# rollback journal is used (not WAL, which needs shared memory between the
+# processes, so it does not work on a network filesystem).
+#
+# The filesystem must support flock between nodes (Example: Lustre mounted
+# with '-o flock', not '-o localflock').  If it does not support flock at
+# all, an OSError is raised, instead of writing the file without a lock.
+
+import contextlib
+import fcntl
+import os
+
+
+@contextlib.contextmanager
+def locked_connection(db_filename, connect, write_bool=True):
+    """Open a SQLite file while holding its lock, in a single transaction.
+
+    Parameters
+    ----------
+    db_filename : str
+        The SQLite file name.
+    connect : callable
+        Opens (and creates the tables of) the SQLite file, and returns the
+        sqlite3 connection.
+    write_bool : bool
+        True to hold the exclusive (write) lock, False to hold the shared
+        (read) lock.  A SQLite file that does not exist yet is always opened
+        with the exclusive lock, as opening it creates its tables.
+
+    The transaction is committed if there is no exception, otherwise it is
+    rolled back, and the connection is closed before the lock is released.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_filename)), exist_ok=True)
+    if not os.path.isfile(db_filename):
+        write_bool = True
+
+    lock_fd = os.open(f"{db_filename}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX if write_bool else fcntl.LOCK_SH)
+        with contextlib.closing(connect()) as connection, connection:
+            yield connection
+    finally:
+        # closing the lock file releases the lock
+        os.close(lock_fd)
@@ -0,0 +1,43 @@
+# build_sysimage.jl
+#
+# Builds the pinned Julia project environment in this directory, and
+# optionally a PackageCompiler sysimage with every part_2 entry point
+# precompiled (see 'precompile_calc_dot_product.jl').  It is run via
+# 'python julia_environment.py build'.
+#
+# If there is no 'Manifest.toml' file yet, it is resolved from the
+# 'Project.toml' file (this needs network access), and it should be committed,
+# so every node installs the exact same package versions.  If it exists, the
+# pinned versions are installed without resolving again.
+#
+# Usage:
+#   julia build_sysimage.jl [sysimage_path]
+
+using Pkg
+
+Pkg.activate(@__DIR__)
+if !isfile(joinpath(@__DIR__, "Manifest.toml"))
+    println("Resolving the new Manifest.toml file (commit it to pin the package versions)")
+    Pkg.resolve()
+end
+Pkg.instantiate()
+Pkg.precompile()
+
+if isempty(ARGS)
+    exit()
+end
+sysimage_path = ARGS[1]
+
+# PackageCompiler is only needed for the build, so it is added to a
+# temporary environment instead of the pinned environment
+Pkg.activate(; temp=true)
+Pkg.add("PackageCompiler")
+
+using PackageCompiler
+
+create_sysimage(
+    ["XLSX"];
+    project=@__DIR__,
+    sysimage_path=sysimage_path,
+    precompile_execution_file=joinpath(@__DIR__, "precompile_calc_dot_product.jl"),
+)
@@ -0,0 +1,21 @@
+# check_environment.jl
+#
+# Checks that the pinned environment works like on a compute node without
+# network access: it is run with the package manager offline
+# ('JULIA_PKG_OFFLINE=true') via 'python julia_environment.py check', and
+# fails if there is no 'Manifest.toml' file (so nothing would be resolved
+# against the registry), or a pinned package is not installed.
+
+using Pkg
+
+if !isfile(joinpath(@__DIR__, "Manifest.toml"))
+    error("There is no Manifest.toml file in $(@__DIR__), so the package versions are not pinned.")
+end
+
+Pkg.activate(@__DIR__)
+Pkg.instantiate()
+
+import XLSX
+import Random
+
+println("OK")
@@ -0,0 +1,114 @@
+# dot_product_server.jl
+#
+# Long-lived Julia worker that loads and compiles 'matrix.jl' once, and then
+# runs the 'calc_dot_product' requests sent to it over a local (Unix domain)
+# socket.  This removes the Julia startup, JIT compile, and 'Pkg.add' time
+# from every part_2 job.  It is started and used via the 'julia_server.py' file.
+#
+# Usage:
+#   julia dot_product_server.jl <socket_path> [idle_timeout_s]
+#
+# Request protocol (one request per line, tab separated fields):
+#   calc_dot_product <excel_filename> <excel_sheetname> <output_txt_filename> <replicate_no>
+#                    [<mult_vector> <noise_range>]
+#   calc_dot_product_all_rows <excel_filename> <excel_sheetname> <output_txt_filename> 
+#                             <output_rows_filename> <output_summary_filename> <replicate_no>
+#                             [<mult_vector> <noise_range>]
+#   ping
+#   shutdown
+# where the optional <mult_vector> and <noise_range> are comma separated values
+# (Example: "9,8,7,6" and "1,10").
+# Every request is answered with a single line, "OK" or "ERROR <message>".
+
+include(joinpath(@__DIR__, "matrix.jl"))
+
+using Sockets
+
+# Get the optional (mult_vector, noise_range) arguments of a request
+function sweep_arguments(fields)
+    if isempty(fields)
+        return ()
+    end
+    return (parse.(Float64, split(fields[1], ',')), parse.(Int, split(fields[2], ',')))
+end
+
+function handle_request(line)
+    fields = split(chomp(line), '\t')
+    if fields[1] == "ping"
+        return "OK"
+
+    elseif fields[1] == "calc_dot_product" && length(fields) in (5, 7)
+        try
+            calc_dot_product(
+                String(fields[2]), String(fields[3]), String(fields[4]), String(fields[5]),
+                sweep_arguments(fields[6:end])...
+            )
+            return "OK"
+        catch err
+            return "ERROR " * replace(sprint(showerror, err), '\n' => ' ')
+        end
+
+    elseif fields[1] == "calc_dot_product_all_rows" && length(fields) in (7, 9)
+        try
+            calc_dot_product_all_rows(String.(fields[2:7])..., sweep_arguments(fields[8:end])...)
+            return "OK"
+        catch err
+            return "ERROR " * replace(sprint(showerror, err), '\n' => ' ')
+        end
+
+    end
+
+    return "ERROR unknown request: $(chomp(line))"
+end
+
+# Serve the requests sent to the socket until a 'shutdown' request, or until
+# it has been idle for 'idle_timeout_s' seconds.
+function serve(socket_path, idle_timeout_s=3600.0)
+    # remove any old socket file left by a server that did not exit cleanly
+    ispath(socket_path) && rm(socket_path)
+
+    server = listen(socket_path)
+    last_request_time = Ref(time())
+
+    # Stop the server if it has been idle for too long, so it does not
+    # outlive the job or the HPC allocation that started it.
+    idle_timer = Timer(60; interval=60) do t
+        if time() - last_request_time[] > idle_timeout_s
+            close(server)
+        end
+    end
+
+    while isopen(server)
+        sock = try
+            accept(server)
+        catch
+            break
+        end
+
+        @async begin
+            try
+                while isopen(sock) && !eof(sock)
+                    line = readline(sock)
+                    last_request_time[] = time()
+                    if chomp(line) == "shutdown"
+                        println(sock, "OK")
+                        close(server)
+                        break
+                    end
+                    println(sock, handle_request(line))
+                end
+            finally
+                close(sock)
+            end
+        end
+    end
+
+    close(idle_timer)
+    ispath(socket_path) && rm(socket_path)
+end
+
+# only serve when run as a script, so the sysimage build can include this
+# file and compile the request path (see 'precompile_calc_dot_product.jl')
+if abspath(PROGRAM_FILE) == @__FILE__
+    serve(ARGS[1], length(ARGS) >= 2 ? parse(Float64, ARGS[2]) : 3600.0)
+end
@@ -1,22 +1,31 @@
-using Pkg
-Pkg.add("XLSX")
+# Only install XLSX if it is not already available, Example: in the pinned
+# environment ('julia --project=src/julia') or the sysimage built with 
+# 'python julia_environment.py build', which do not need network access.
+if Base.find_package("XLSX") === nothing
+    using Pkg
+    Pkg.add("XLSX")
+end
 
 import XLSX
 import Random
 
-function calc_dot_product(excel_filename, excel_sheetname, output_txt_filename, replicate_no)
+# The optional 'mult_vector' (the dot multiplication vector, which is multiplied 
+# by the Excel input) and 'noise_range' (the scalar noise of each replicate is a
+# random value from noise_range[1]/10 to noise_range[2]/10) arguments are the 
+# job's 'mult_vector' and 'noise_range' statepoints (see the 'init.py' file).
+function calc_dot_product(
+    excel_filename, excel_sheetname, output_txt_filename, replicate_no,
+    mult_vector=[9, 8, 7, 6], noise_range=[1, 10]
+)
     try 
         XLSX.openxlsx(excel_filename, enable_cache=false) do f 
             sheet = f[excel_sheetname] 
             for row_i in XLSX.eachrow(sheet) 
                 
-                # add a dot multiplication vector which is multiplied by Excel input
-                mult_vector = [9, 8, 7, 6]
-                
                 row_number_j = XLSX.row_number(row_i) # `SheetRow` row number 
                 if row_number_j == 2
                     # add scalar noise to the data for each replicate with random values
-                    random_value = rand(1:10)/10
+                    random_value = rand(noise_range[1]:noise_range[2])/10
                     println("random_value=$random_value")
 
                     v_mult_1 = float(row_i[1]) * mult_vector[1]
@@ -46,4 +55,110 @@ function calc_dot_product(excel_filename, excel_sheetname, output_txt_filename,
         )
     end
 
-end
\ No newline at end of file
+end
+
+# Calculate the dot product of the Excel row 2 values, which were already read
+# in python (Example: by the fused part_1 and part_2 operation in the project.py
+# file), so the Excel file is not opened again.  This gives the same dot product
+# as 'calc_dot_product'.
+function calc_dot_product_values(
+    value_0, value_1, value_2, value_3, output_txt_filename, replicate_no,
+    mult_vector=[9, 8, 7, 6], noise_range=[1, 10]
+)
+    # add scalar noise to the data for each replicate with random values
+    random_value = rand(noise_range[1]:noise_range[2])/10
+    println("random_value=$random_value")
+
+    v_mult_1 = float(value_0) * mult_vector[1]
+    v_mult_2 = float(value_1) * mult_vector[2]
+    v_mult_3 = float(value_2) * mult_vector[3]
+    v_mult_4 = float(value_3) * mult_vector[4]
+    dot_product = (v_mult_1 + v_mult_2 + v_mult_3 + v_mult_4) * random_value 
+    println("dot_product=$dot_product")
+
+    file = open(output_txt_filename, "w")
+    write(file, string(dot_product))
+    write(file, "\nDot_Product                Calculations         Completed ")
+    close(file)
+
+end
+
+# Calculate the dot product of every data row (row 2 to the end of the sheet),
+# streaming the sheet row by row, so the memory used is the same for any
+# sheet length.  The row dot products are written to a binary file
+# (little-endian Float64, one value per row), the summary stats (rows, mean,
+# std. dev., min, max, sum) to a JSON file, and the mean row dot product to
+# the 'output_txt_filename' file, in the same format as 'calc_dot_product'.
+function calc_dot_product_all_rows(
+    excel_filename, excel_sheetname, output_txt_filename, 
+    output_rows_filename, output_summary_filename, replicate_no,
+    mult_vector=[9, 8, 7, 6], noise_range=[1, 10]
+)
+    # add scalar noise to the data for each replicate with random values
+    random_value = rand(noise_range[1]:noise_range[2])/10
+    println("random_value=$random_value")
+
+    # running stats of the row dot products (Welford)
+    rows = 0
+    mean = 0.0
+    m2 = 0.0
+    min_value = Inf
+    max_value = -Inf
+
+    try 
+        open(output_rows_filename, "w") do rows_file
+            XLSX.openxlsx(excel_filename, enable_cache=false) do f 
+                sheet = f[excel_sheetname] 
+                for row_i in XLSX.eachrow(sheet) 
+                    if XLSX.row_number(row_i) >= 2
+                        dot_product = (
+                            float(row_i[1]) * mult_vector[1] 
+                            + float(row_i[2]) * mult_vector[2] 
+                            + float(row_i[3]) * mult_vector[3] 
+                            + float(row_i[4]) * mult_vector[4]
+                        ) * random_value 
+                        write(rows_file, htol(Float64(dot_product)))
+
+                        rows += 1
+                        delta = dot_product - mean
+                        mean += delta / rows
+                        m2 += delta * (dot_product - mean)
+                        min_value = min(min_value, dot_product)
+                        max_value = max(max_value, dot_product)
+                    end
+                end 
+            end
+        end
+
+    catch
+        # Provide user input that file does not exist
+        error(
+            "The excel file does not exis or there is an error 
+             in the julia 'matrix.jl' file in the 'calc_dot_product_all_rows' fuction."
+        )
+    end
+
+    if rows == 0
+        error("The excel file $excel_filename has no data rows.")
+    end
+    std_dev = rows > 1 ? sqrt(m2 / (rows - 1)) : 0.0
+    println("rows=$rows, mean dot_product=$mean")
+
+    file = open(output_summary_filename, "w")
+    write(file, "{\n")
+    write(file, "  \"rows\": $rows,\n")
+    write(file, "  \"mean\": $(Float64(mean)),\n")
+    write(file, "  \"std_dev\": $(Float64(std_dev)),\n")
+    write(file, "  \"min\": $(Float64(min_value)),\n")
+    write(file, "  \"max\": $(Float64(max_value)),\n")
+    write(file, "  \"sum\": $(Float64(mean * rows))\n")
+    write(file, "}")
+    close(file)
+
+    # the mean row dot product is written last, as it marks the job as completed
+    file = open(output_txt_filename, "w")
+    write(file, string(Float64(mean)))
+    write(file, "\nDot_Product                Calculations         Completed ")
+    close(file)
+
+end
@@ -0,0 +1,68 @@
+# precompile_calc_dot_product.jl
+#
+# Runs every part_2 entry point once while the sysimage is built (see
+# 'build_sysimage.jl'), so they are compiled into the sysimage:
+# - 'calc_dot_product', 'calc_dot_product_values', and 'calc_dot_product_all_rows'
+#   (also with the 'mult_vector' and 'noise_range' arguments), as run by
+#   the per-process mode.
+# - the 'dot_product_server.jl' server and its request path (over a real
+#   socket), as run by the server mode.
+# The Excel file is a small temporary workbook in the same layout as the
+# project's Excel files, so the build does not need any of the project's files.
+
+include(joinpath(@__DIR__, "dot_product_server.jl"))
+
+precompile_dir = mktempdir()
+excel_filename = joinpath(precompile_dir, "precompile.xlsx")
+XLSX.writetable(
+    excel_filename,
+    [[1, 5, 9], [2, 6, 10], [3, 7, 11], [4, 8, 12]],
+    ["value_0", "value_1", "value_2", "value_3"];
+    sheetname="Sheet1",
+)
+output_txt_filename = joinpath(precompile_dir, "output.txt")
+output_rows_filename = joinpath(precompile_dir, "output_rows.bin")
+output_summary_filename = joinpath(precompile_dir, "output_summary.json")
+
+# the per-process mode
+calc_dot_product(excel_filename, "Sheet1", output_txt_filename, "0")
+calc_dot_product(excel_filename, "Sheet1", output_txt_filename, "0", [1.0, 2.0, 3.0, 4.0], [1, 10])
+calc_dot_product_values(1, 2, 3, 4, output_txt_filename, "0")
+calc_dot_product_values(1, 2, 3, 4, output_txt_filename, "0", [1.0, 2.0, 3.0, 4.0], [1, 10])
+calc_dot_product_all_rows(
+    excel_filename, "Sheet1", output_txt_filename, output_rows_filename, output_summary_filename, "0"
+)
+calc_dot_product_all_rows(
+    excel_filename, "Sheet1", output_txt_filename, output_rows_filename, output_summary_filename, "0",
+    [1.0, 2.0, 3.0, 4.0], [1, 10]
+)
+
+# the server mode, with every request type sent over the socket
+socket_path = joinpath(precompile_dir, "precompile.sock")
+server_task = @async serve(socket_path, 60.0)
+while !ispath(socket_path)
+    sleep(0.1)
+end
+request_list = [
+    "ping",
+    join(["calc_dot_product", excel_filename, "Sheet1", output_txt_filename, "0"], '\t'),
+    join(["calc_dot_product", excel_filename, "Sheet1", output_txt_filename, "0",
+          "1,2,3,4", "1,10"], '\t'),
+    join(["calc_dot_product_all_rows", excel_filename, "Sheet1", output_txt_filename,
+          output_rows_filename, output_summary_filename, "0"], '\t'),
+    join(["calc_dot_product_all_rows", excel_filename, "Sheet1", output_txt_filename,
+          output_rows_filename, output_summary_filename, "0", "1,2,3,4", "1,10"], '\t'),
+    "shutdown",
+]
+sock = connect(socket_path)
+for request in request_list
+    println(sock, request)
+    reply = readline(sock)
+    if reply != "OK"
+        error("The precompile request '$request' failed: $reply")
+    end
+end
+close(sock)
+wait(server_task)
+
+rm(precompile_dir; recursive=true, force=true)
@@ -0,0 +1,134 @@
+"""Startup time benchmark of 'python project.py status'"""
+# startup_benchmark.py
+#
+# Measures the wall time of:
+# - 'python -c "import flow"' : The python and signac-flow startup, which
+#                               every project.py command needs.
+# - 'python -c "import project"' : Importing the project (its modules, labels,
+#                                  and operations).
+# - 'python project.py status' : The whole status command, including the
+#                                label evaluation of every job.
+# in this project (so run it in a project with the workspace of interest).
+#
+# It also lists the slowest modules imported by 'status' (with
+# 'python -X importtime'), and checks that the analysis modules
+# (Example: pandas and openpyxl) are not imported by 'status'.
+#
+# Command line usage (run from the project directory):
+#   python startup_benchmark.py
+#   python startup_benchmark.py --repeats 10 --top 15 --report startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# The analysis modules, which should only be imported by the operations
+analysis_module_list = [
+    "pandas", "openpyxl", "excel_reader", "excel_cache", "numpy_engine", "parameter_sweep"
+]
+
+stage_argv_dict = {
+    "import flow": [sys.executable, "-c", "import flow"],
+    "import project": [sys.executable, "-c", "import project"],
+    "project.py status": [sys.executable, "project.py", "status"],
+}
+
+
+def time_command(argv, repeats):
+    """Get the wall times (s) of running the command 'repeats' times."""
+    seconds_list = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds_list.append(time.perf_counter() - start_time)
+
+    return seconds_list
+
+
+def import_times(argv):
+    """Get the {module: (self us, cumulative us)} imported by the command ('-X importtime')."""
+    process = subprocess.run(
+        [argv[0], "-X", "importtime"] + argv[1:],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    import_time_dict = {}
+    for line in process.stderr.splitlines():
+        # 'import time:   self [us] | cumulative | imported package'
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        import_time_dict[module.strip()] = (int(self_us), int(cumulative_us))
+
+    return import_time_dict
+
+
+def benchmark(repeats=5, top_int=10):
+    """Measure the startup times and imported modules of 'status'."""
+    report_dict = {"repeats": repeats, "stages": {}}
+    for stage, argv in stage_argv_dict.items():
+        seconds_list = time_command(argv, repeats)
+        report_dict["stages"][stage] = {
+            "min_s": min(seconds_list),
+            "median_s": statistics.median(seconds_list),
+            "max_s": max(seconds_list),
+        }
+
+    import_time_dict = import_times(stage_argv_dict["project.py status"])
+    report_dict["modules_imported"] = len(import_time_dict)
+    report_dict["analysis_modules_imported"] = [
+        m for m in analysis_module_list if m in import_time_dict
+    ]
+    report_dict["slowest_imports"] = [
+        {"module": module, "cumulative_s": cumulative_us / 1e6}
+        for module, (_, cumulative_us) in sorted(
+            import_time_dict.items(), key=lambda item: item[1][1], reverse=True
+        )
+        if "." not in module
+    ][:top_int]
+
+    return report_dict
+
+
+def print_report(report_dict):
+    print('*********************************************')
+    print(f'Startup times ({report_dict["repeats"]} repeats)')
+    print('*********************************************')
+    print(f"{'command': <24} {'min (s)': <10} {'median (s)': <12} {'max (s)': <10}")
+    for stage, stage_dict in report_dict["stages"].items():
+        print(f"{stage: <24} {stage_dict['min_s']: <10.3f} {stage_dict['median_s']: <12.3f} "
+              f"{stage_dict['max_s']: <10.3f}")
+    print('*********************************************')
+    print(f'modules imported by status = {report_dict["modules_imported"]}')
+    print(f'analysis modules imported by status = '
+          f'{report_dict["analysis_modules_imported"] or "none"}')
+    print('slowest top-level imports:')
+    for import_dict in report_dict["slowest_imports"]:
+        print(f"    {import_dict['module']: <30} {import_dict['cumulative_s']:.3f} s")
+    print('*********************************************')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="The number of times each command is run.")
+    parser.add_argument("--top", type=int, default=10,
+                        help="The number of slowest imported modules to list.")
+    parser.add_argument("--report", default=None,
+                        help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    if not os.path.isfile("project.py"):
+        sys.exit("ERROR: Run the startup benchmark from the project directory.")
+
+    startup_report_dict = benchmark(args.repeats, args.top)
+    print_report(startup_report_dict)
+    if args.report is not None:
+        with open(args.report, "w") as fp:
+            json.dump(startup_report_dict, fp, indent=2)
@@ -5,6 +5,7 @@
 {% set mem_per_cpu = operations|map(attribute='directives.mem-per-cpu')|max %}
 {% set cpus_per_task= operations|map(attribute='directives.cpus-per-task')|max  %}
 {% set gpus_per_task = operations|map(attribute='directives.gpus-per-task')|max  %}
+{% set packing = operations|node_packing_plan(parallel) %}
 
     {{- super () -}}
 
@@ -13,7 +14,11 @@
 #SBATCH --output=/dev/null
 #SBATCH --error=/dev/null
 #SBATCH -N 1
+{% if packing.enabled %}
+#SBATCH --ntasks-per-node={{ packing.ntasks }}
+{% else %}
 #SBATCH --ntasks-per-node={{ np_global }}
+{% endif %}
 #SBATCH --cpus-per-task={{ cpus_per_task }}
 #SBATCH --mem-per-cpu={{ mem_per_cpu }}G
 
@@ -44,9 +49,55 @@ conda activate signac_julia_excel_analysis
 
 {% endblock header %}
 
+{# When packing, the walltime is the number of back-to-back waves of the
+   jobs that fit on the node, times the max walltime of the jobs. #}
+{% block preamble %}
+{% set packing = operations|node_packing_plan(parallel) %}
+{% if packing.enabled %}
+#!/bin/bash
+#SBATCH --job-name="{{ id }}"
+#SBATCH -t {{ packing.walltime_hr|format_timedelta }}
+{% else %}
+    {{- super () -}}
+{% endif %}
+{% endblock preamble %}
+
+{% block tasks %}
+{% set packing = operations|node_packing_plan(parallel) %}
+{% if packing.enabled %}
+#SBATCH --ntasks={{ packing.ntasks }}
+{% else %}
+    {{- super () -}}
+{% endif %}
+{% endblock tasks %}
+
 {% block body %}
+{% set packing = operations|node_packing_plan(parallel) %}
+{% if packing.enabled %}
+# Node packing: run up to {{ packing.slots }} jobs at the same time,
+# each in its own srun step, starting the next job when one finishes.
+# A failed job is retried up to {{ packing.retries }} times, with a doubling backoff.
+run_with_retries() {
+    local backoff_s={{ packing.retry_backoff_s }}
+    for attempt in $(seq 0 {{ packing.retries }}); do
+        "$@" && return 0
+        if [ "$attempt" -lt {{ packing.retries }} ]; then
+            echo "The job failed, retrying in ${backoff_s} s: $*"
+            sleep "$backoff_s"
+            backoff_s=$((backoff_s * 2))
+        fi
+    done
+    return 1
+}
+{% for operation in operations %}
+
+# {{ "%s"|format(operation) }}
+while [ "$(jobs -rp | wc -l)" -ge {{ packing.slots }} ]; do wait -n || true; done
+run_with_retries srun --exact -N 1 -n {{ packing.np }} -c {{ packing.cpus_per_task }} --mem-per-cpu={{ packing.mem_per_cpu }}G {{ operation.cmd }} &
+{% endfor %}
+{% else %}
     {{- super () -}}
+{% endif %}
 
 
 {% endblock body %}
-
@@ -0,0 +1,10 @@
+# conftest.py
+#
+# The project's modules import each other by name (Example: 'import
+# results_index'), as they are run from the project directory, so the tests
+# import them from the project directory too.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
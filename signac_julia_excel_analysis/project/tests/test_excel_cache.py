@@ -0,0 +1,62 @@
+"""The Excel cache returns the same values as a cold read, and stays size bounded"""
+# test_excel_cache.py
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import os
+
+import openpyxl
+
+import excel_cache
+import excel_reader
+
+
+def write_workbook(excel_filename, first_data_row):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    sheet.append(excel_reader.value_column_name_list)
+    sheet.append(first_data_row)
+    workbook.save(excel_filename)
+
+
+def test_cache_hit_keeps_the_value_types(tmp_path):
+    excel_filename = str(tmp_path / "excel_file_0.xlsx")
+    write_workbook(excel_filename, [1, 2.5, "x", 4])
+    cache = excel_cache.ExcelCache(str(tmp_path / "excel_cache"), 1)
+
+    cold_values_dict = excel_reader.read_first_row_values_cached(excel_filename, "Sheet1", cache)
+    cached_values_dict = cache.get(
+        excel_filename, "Sheet1", excel_reader.value_column_name_list
+    )
+
+    assert cached_values_dict == cold_values_dict
+    assert [type(v) for v in cached_values_dict.values()] == [int, float, str, int]
+
+
+def test_put_only_lists_the_cache_when_over_its_max_size(tmp_path, monkeypatch):
+    excel_filename = str(tmp_path / "excel_file_0.xlsx")
+    write_workbook(excel_filename, [1, 2, 3, 4])
+    cache_directory = str(tmp_path / "excel_cache")
+    cache = excel_cache.ExcelCache(cache_directory, 0.001)
+
+    scandir_list = []
+    original_scandir = os.scandir
+
+    def counting_scandir(path):
+        scandir_list.append(path)
+        return original_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    for i in range(1000):
+        cache.put(excel_filename, f"Sheet{i}", ["value_0"], {"value_0": i})
+
+    entry_size_bytes = sum(
+        os.path.getsize(os.path.join(cache_directory, f))
+        for f in os.listdir(cache_directory)
+        if f.endswith(excel_cache.entry_extension_str)
+    )
+    assert entry_size_bytes <= cache.max_size_bytes
+    assert cache._add_size(0) == entry_size_bytes
+    assert len(scandir_list) < 100
@@ -0,0 +1,76 @@
+"""The pinned Julia environment is only used if its Manifest.toml pins every package"""
+# test_julia_environment.py
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import pytest
+
+import julia_environment
+
+xlsx_uuid = "fdbf4ff8-1666-58a4-91e7-1b58723a45e0"
+random_uuid = "9a3f8284-a2c9-5f02-9a11-845980a1fd5c"
+
+xlsx_manifest_entry = f"""
+[[deps.XLSX]]
+deps = ["Artifacts", "Dates", "EzXML", "Printf", "Tables", "ZipFile"]
+git-tree-sha1 = "0123456789abcdef0123456789abcdef01234567"
+uuid = "{xlsx_uuid}"
+version = "0.10.1"
+"""
+
+random_manifest_entry = f"""
+[[deps.Random]]
+deps = ["SHA"]
+uuid = "{random_uuid}"
+"""
+
+
+@pytest.fixture
+def julia_project(tmp_path, monkeypatch):
+    project_file = tmp_path / "Project.toml"
+    project_file.write_text(
+        f'[deps]\nRandom = "{random_uuid}"\nXLSX = "{xlsx_uuid}"\n\n'
+        '[compat]\nXLSX = "0.10"\njulia = "1.9"\n'
+    )
+    manifest_file = tmp_path / "Manifest.toml"
+    monkeypatch.setattr(julia_environment, "julia_project_file", str(project_file))
+    monkeypatch.setattr(julia_environment, "julia_manifest_file", str(manifest_file))
+
+    return manifest_file
+
+
+def test_no_manifest_is_not_pinned(julia_project):
+    assert len(julia_environment.manifest_problem_list()) == 1
+    assert not julia_environment.pinned_environment_built()
+    assert julia_environment.julia_command_list() == ["julia"]
+    assert julia_environment.julia_environment_variables() == {}
+
+
+def test_manifest_pinning_every_package(julia_project):
+    julia_project.write_text(
+        'julia_version = "1.10.4"\nmanifest_format = "2.0"\n'
+        + xlsx_manifest_entry + random_manifest_entry
+    )
+
+    assert julia_environment.manifest_problem_list() == []
+    assert julia_environment.pinned_environment_built()
+    assert julia_environment.julia_environment_variables() == {"JULIA_PKG_OFFLINE": "true"}
+
+
+@pytest.mark.parametrize(
+    "manifest_text",
+    [
+        # a package is missing
+        random_manifest_entry,
+        # a registered package has no pinned version
+        xlsx_manifest_entry.replace('version = "0.10.1"\n', "") + random_manifest_entry,
+        # a package has a different uuid
+        xlsx_manifest_entry.replace(xlsx_uuid, random_uuid) + random_manifest_entry,
+    ],
+)
+def test_manifest_not_pinning_every_package(julia_project, manifest_text):
+    julia_project.write_text('manifest_format = "2.0"\n' + manifest_text)
+
+    assert len(julia_environment.manifest_problem_list()) == 1
+    assert not julia_environment.pinned_environment_built()
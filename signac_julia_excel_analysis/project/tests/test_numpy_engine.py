@@ -0,0 +1,211 @@
+"""The NumPy engine gives the same dot products and output files as 'matrix.jl'"""
+# test_numpy_engine.py
+#
+# The 'calc_dot_product' function in the 'src/julia/matrix.jl' file calculates
+#   (row 2 values . [9, 8, 7, 6]) * rand(noise_range[1]:noise_range[2])/10
+# and writes the dot product (Julia's 'string(dot_product)') and the
+# 'Dot_Product Calculations Completed' line to the output file.
+#
+# The output file text is checked against the text Julia writes for the same
+# values, and if Julia is installed, the 'matrix.jl' functions are also run
+# on a small workbook and their output files compared with the NumPy engine's
+# (a noise range of [k, k] makes Julia's random value k/10 known).
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import julia_environment
+import numpy_engine
+import results_index
+
+# The Excel row 2 values of a few jobs
+row_values_matrix = np.array(
+    [
+        [1, 2, 3, 4],
+        [0, 0, 0, 0],
+        [10.5, -2, 7, 0.25],
+        [3, 3, 3, 3],
+    ]
+)
+
+# The 'matrix.jl' output file layout
+output_text_format = "{}\nDot_Product                Calculations         Completed "
+
+
+def matrix_jl_dot_product(row_values, random_value, mult_vector=(9, 8, 7, 6)):
+    """The 'calc_dot_product' dot product of 'matrix.jl', one value at a time."""
+    return sum(float(v) * m for v, m in zip(row_values, mult_vector)) * random_value
+
+
+@pytest.mark.parametrize("k", range(1, 11))
+def test_calc_dot_products_matches_matrix_jl(k):
+    random_value = k / 10
+    dot_products = numpy_engine.calc_dot_products(
+        row_values_matrix, [random_value] * len(row_values_matrix)
+    )
+
+    expected = [matrix_jl_dot_product(row, random_value) for row in row_values_matrix]
+    np.testing.assert_allclose(dot_products, expected, rtol=1e-12)
+
+
+def test_calc_dot_products_per_job_mult_vector():
+    mult_vector_matrix = [[9, 8, 7, 6], [1, 2, 3, 4], [0, 1, 0, 1], [2, 2, 2, 2]]
+    random_values = [0.1, 0.5, 1.0, 0.7]
+    dot_products = numpy_engine.calc_dot_products(
+        row_values_matrix, random_values, mult_vector_matrix
+    )
+
+    expected = [
+        matrix_jl_dot_product(row, r, m)
+        for row, r, m in zip(row_values_matrix, random_values, mult_vector_matrix)
+    ]
+    np.testing.assert_allclose(dot_products, expected, rtol=1e-12)
+
+
+def test_replicate_random_value_is_deterministic():
+    for replicate_number_int in range(20):
+        assert numpy_engine.replicate_random_value(
+            "excel_file_0", replicate_number_int, 12345
+        ) == numpy_engine.replicate_random_value("excel_file_0", replicate_number_int, 12345)
+
+
+def test_replicate_random_value_depends_on_the_replicate():
+    value_set = {
+        numpy_engine.replicate_random_value("excel_file_0", replicate_number_int, 12345)
+        for replicate_number_int in range(50)
+    }
+
+    assert len(value_set) > 1
+
+
+@pytest.mark.parametrize("noise_range", [(1, 10), (5, 10), (10, 10), (3, 4)])
+def test_replicate_random_value_in_noise_range(noise_range):
+    allowed_value_set = {k / 10 for k in range(noise_range[0], noise_range[1] + 1)}
+    for excel_filename_wo_ext in ("excel_file_0", "excel_file_1"):
+        for replicate_number_int in range(50):
+            random_value = numpy_engine.replicate_random_value(
+                excel_filename_wo_ext, replicate_number_int, 7, noise_range
+            )
+            assert random_value in allowed_value_set
+            assert noise_range[0] / 10 <= random_value <= noise_range[1] / 10
+
+
+# Julia's 'string(::Float64)' text of some values, which differs from Python's
+# 'repr' for small and large values
+julia_float_text_list = [
+    (25.2, "25.2"),
+    (0.0, "0.0"),
+    (119.0, "119.0"),
+    (1.0 / 3.0, "0.3333333333333333"),
+    (0.1 + 0.2, "0.30000000000000004"),
+    (0.0001, "0.0001"),
+    (1.0e-5, "1.0e-5"),
+    (-2.5e-7, "-2.5e-7"),
+    (100000.0, "100000.0"),
+    (999999.5, "999999.5"),
+    (1.0e6, "1.0e6"),
+    (1234567.0, "1.234567e6"),
+    (1.0e22, "1.0e22"),
+]
+
+
+@pytest.mark.parametrize("dot_product, julia_text", julia_float_text_list)
+def test_output_file_matches_matrix_jl_layout(tmp_path, dot_product, julia_text):
+    output_txt_filename = tmp_path / "dot_product_output_file.txt"
+    numpy_engine.write_dot_product_output_file(str(output_txt_filename), dot_product)
+
+    assert output_txt_filename.read_text() == output_text_format.format(julia_text)
+    assert list(tmp_path.iterdir()) == [output_txt_filename]
+
+    result = results_index.read_dot_product_output_file(str(output_txt_filename))
+    assert result.started
+    assert result.completed
+    assert result.dot_product == dot_product
+
+
+def test_matrix_jl_output_text_is_parsed_as_completed():
+    result = results_index.parse_dot_product_output(output_text_format.format("25.2"))
+
+    assert result.completed
+    assert result.dot_product == 25.2
+
+
+# The Excel row 2 values of the workbook run by 'matrix.jl', which give small
+# and large dot products (integer values, so the dot products are exact and
+# do not depend on the order of the sums)
+julia_row_values_matrix = np.array(
+    [
+        [1, 2, 3, 4],
+        [0, 0, 0, 0],
+        [100000, 20000, 3000, 400],
+        [-3, 5, 0, 1],
+    ]
+)
+
+
+def run_matrix_jl(julia_call_list):
+    subprocess.run(
+        julia_environment.julia_command_list()
+        + ["--load", julia_environment.julia_matrix_file, "-e", "\n".join(julia_call_list)],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        env=julia_environment.julia_subprocess_environment(),
+    )
+
+
+@pytest.mark.skipif(shutil.which("julia") is None, reason="Julia is not installed")
+@pytest.mark.parametrize("k", [1, 7, 10])
+def test_output_files_match_running_matrix_jl(tmp_path, k):
+    import openpyxl
+
+    random_value = k / 10
+    julia_call_list = []
+    for row_i, row_values in enumerate(julia_row_values_matrix):
+        excel_filename = tmp_path / f"excel_file_{row_i}.xlsx"
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Sheet1"
+        sheet.append(["value_0", "value_1", "value_2", "value_3"])
+        sheet.append([int(v) for v in row_values])
+        workbook.save(excel_filename)
+
+        julia_call_list.append(
+            f'calc_dot_product("{excel_filename}", "Sheet1", '
+            f'"{tmp_path}/julia_{row_i}.txt", "0", [9, 8, 7, 6], [{k}, {k}])'
+        )
+        julia_call_list.append(
+            f'calc_dot_product_all_rows("{excel_filename}", "Sheet1", '
+            f'"{tmp_path}/julia_all_rows_{row_i}.txt", "{tmp_path}/julia_rows_{row_i}.bin", '
+            f'"{tmp_path}/julia_summary_{row_i}.json", "0", [9, 8, 7, 6], [{k}, {k}])'
+        )
+    run_matrix_jl(julia_call_list)
+
+    dot_products = numpy_engine.calc_dot_products(
+        julia_row_values_matrix, [random_value] * len(julia_row_values_matrix)
+    )
+    for row_i, dot_product in enumerate(dot_products):
+        numpy_txt_filename = tmp_path / f"numpy_{row_i}.txt"
+        numpy_engine.write_dot_product_output_file(str(numpy_txt_filename), dot_product)
+        julia_text = (tmp_path / f"julia_{row_i}.txt").read_text()
+
+        assert numpy_txt_filename.read_text() == julia_text
+        assert results_index.parse_dot_product_output(julia_text).dot_product == dot_product
+
+        # a one data row sheet: the mean, min, max, and sum are the dot product
+        julia_summary_dict = json.loads((tmp_path / f"julia_summary_{row_i}.json").read_text())
+        assert julia_summary_dict == {
+            "rows": 1, "mean": dot_product, "std_dev": 0.0,
+            "min": dot_product, "max": dot_product, "sum": dot_product,
+        }
+        np.testing.assert_array_equal(
+            numpy_engine.read_row_dot_products(str(tmp_path / f"julia_rows_{row_i}.bin")),
+            [dot_product],
+        )
+        assert (tmp_path / f"julia_all_rows_{row_i}.txt").read_text() == julia_text
@@ -0,0 +1,105 @@
+"""The operation profiles only record what is measured"""
+# test_operation_profiler.py
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import os
+import subprocess
+
+import pytest
+from flow import FlowProject
+
+import operation_profiler
+
+
+class ProfiledProject(FlowProject):
+    pass
+
+
+@ProfiledProject.label
+def value_set(job):
+    return "value" in job.doc
+
+
+@ProfiledProject.pre(lambda job: True)
+@ProfiledProject.post(value_set)
+@ProfiledProject.operation
+def set_value(job):
+    with operation_profiler.timed_subprocess():
+        subprocess.run(["sleep", "0.2"], check=True)
+    job.doc.value = 1
+
+
+@ProfiledProject.operation(cmd=True)
+def echo_value(job):
+    return "true"
+
+
+@pytest.fixture
+def profiled_project(tmp_path):
+    project = ProfiledProject.init_project(str(tmp_path))
+    project.open_job({"i": 0}).init()
+    profiler = operation_profiler.OperationProfiler(project, cmd_operation_names={"echo_value"})
+    profiler.install(project)
+
+    return project, profiler
+
+
+def test_subprocess_runtime_is_only_the_timed_subprocesses(profiled_project):
+    project, profiler = profiled_project
+    project.run(names=["set_value", "echo_value"])
+
+    record_dict = {r["operation"]: r for r in profiler.read_profiles()}
+    assert 0.2 <= record_dict["set_value"]["subprocess_s"] < record_dict["set_value"]["wall_s"]
+    # a 'cmd' operation is the subprocess, so its runtime is not recorded again
+    assert record_dict["echo_value"]["subprocess_s"] is None
+
+
+def test_every_label_and_condition_evaluation_is_recorded(profiled_project):
+    project, profiler = profiled_project
+    job = next(iter(project))
+    for _ in range(3):
+        dict(project.labels(job))
+    profiler.write_evaluations()
+
+    evaluation_dict = {(r["kind"], r["name"]): r for r in profiler.read_evaluation_profiles()}
+    assert evaluation_dict[("label", "value_set")]["evaluations"] == 3
+    assert evaluation_dict[("label", "value_set")]["max_s"] <= (
+        evaluation_dict[("label", "value_set")]["total_s"]
+    )
+
+    project.run(names=["set_value"])
+    profiler.write_evaluations()
+    name_set = {(r["kind"], r["name"]) for r in profiler.read_evaluation_profiles()}
+    assert ("pre", "set_value [0] <lambda>") in name_set
+    assert ("post", "set_value [0] value_set") in name_set
+
+
+def test_read_does_not_create_the_tables(profiled_project):
+    _, profiler = profiled_project
+    os.makedirs(os.path.dirname(profiler.store_filename))
+    open(profiler.store_filename, "w").close()
+
+    assert profiler.read_profiles() == []
+    assert profiler.read_evaluation_profiles() == []
+    with open(profiler.store_filename, "rb") as fp:
+        assert fp.read() == b""
+
+
+@pytest.mark.parametrize("value_list", [[0.004], [0.004] * 5, [120.0, 120.0]])
+def test_single_value_histogram_has_no_negative_edges(value_list):
+    line_list = operation_profiler.text_histogram(value_list, unit=" s")
+
+    assert len(line_list) == 1
+    low, high = (float(v) for v in line_list[0].split("|")[0].replace(" s", "").split(" - "))
+    assert low == high == pytest.approx(value_list[0], rel=1e-3)
+    assert line_list[0].endswith(f" {len(value_list)}")
+
+
+def test_histogram_edges_are_the_min_and_max_values():
+    line_list = operation_profiler.text_histogram([0.5, 1.0, 3.0], bins=4)
+
+    assert len(line_list) == 4
+    assert float(line_list[0].split(" - ")[0]) == 0.5
+    assert float(line_list[-1].split(" - ")[1].split("|")[0]) == 3.0
@@ -0,0 +1,165 @@
+"""The running replicate statistics match a full recalculation"""
+# test_replicate_summary.py
+#
+# Part_3 stores each replicate group's running (count, mean, M2) statistics
+# and only adds (or removes) the new (or changed) replicates, so after any
+# number of updates they must match np.mean and np.std(ddof=1) of all the
+# group's current values to floating-point tolerance.
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+import replicate_summary
+
+
+class GroupStore:
+    """The stored statistics and members of some groups, updated like part_3 does."""
+
+    def __init__(self):
+        self.group_stats_dict = {}
+        self.stored_member_dict = {}
+
+    def update(self, group_value_dict):
+        """Update the groups from their current {job_id: (mtime_ns, dot_product)} members."""
+        group_change_dict = {}
+        for group_key, value_dict in group_value_dict.items():
+            group_change_dict[group_key] = replicate_summary.group_member_changes(
+                self.group_stats_dict.get(group_key),
+                self.stored_member_dict.get(group_key, {}),
+                {job_id: (mtime_ns, 1) for job_id, (mtime_ns, _) in value_dict.items()},
+                lambda job_id, value_dict=value_dict: value_dict[job_id][1],
+            )
+
+        self.group_stats_dict.update(replicate_summary.update_groups_stats(group_change_dict))
+        for group_key, (_, added_member_dict, removed_job_id_list) in group_change_dict.items():
+            member_dict = self.stored_member_dict.setdefault(group_key, {})
+            for job_id in removed_job_id_list:
+                del member_dict[job_id]
+            member_dict.update(added_member_dict)
+
+        return group_change_dict
+
+
+def assert_matches_full_recalculation(group_stats, value_list):
+    count, mean, m2 = group_stats
+    assert count == len(value_list)
+    np.testing.assert_allclose(mean, np.mean(value_list), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(
+        replicate_summary.running_std_dev(count, m2),
+        np.std(value_list, ddof=1),
+        rtol=1e-9,
+        atol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batches_with_changed_replicates_match_a_full_recalculation(seed):
+    rng = np.random.default_rng(seed)
+    group_value_dict = {"group_a": {}, "group_b": {}}
+    store = GroupStore()
+    job_counter = iter(range(10**6))
+
+    for batch_i in range(6):
+        # add a batch of replicates to each group (the offset makes a naive
+        # sum of squares lose precision)
+        for value_dict in group_value_dict.values():
+            for _ in range(rng.integers(1, 8)):
+                value_dict[f"job_{next(job_counter)}"] = (0, 1e6 + rng.normal(scale=3.0))
+
+        # change a replicate's result (a new mtime), which is removed and added again
+        if batch_i > 0:
+            value_dict = group_value_dict["group_a"]
+            stored_job_id_list = sorted(store.stored_member_dict["group_a"])
+            changed_job_id = stored_job_id_list[rng.integers(len(stored_job_id_list))]
+            value_dict[changed_job_id] = (batch_i, 1e6 + rng.normal(scale=3.0))
+
+        group_change_dict = store.update(group_value_dict)
+        if batch_i > 0:
+            assert changed_job_id in group_change_dict["group_a"][2]
+            assert changed_job_id in group_change_dict["group_a"][1]
+
+        for group_key, value_dict in group_value_dict.items():
+            assert_matches_full_recalculation(
+                store.group_stats_dict[group_key], [v for _, v in value_dict.values()]
+            )
+
+
+def test_removed_replicates_match_a_full_recalculation():
+    group_value_dict = {"group_a": {f"job_{i}": (0, float(i) ** 1.5) for i in range(20)}}
+    store = GroupStore()
+    store.update(group_value_dict)
+
+    for job_id in ("job_3", "job_11", "job_19"):
+        del group_value_dict["group_a"][job_id]
+    store.update(group_value_dict)
+
+    assert_matches_full_recalculation(
+        store.group_stats_dict["group_a"],
+        [v for _, v in group_value_dict["group_a"].values()],
+    )
+
+
+def test_first_pass_is_one_grouped_reduction_of_every_group():
+    rng = np.random.default_rng(7)
+    group_value_dict = {
+        f"group_{i}": list(rng.normal(loc=i, size=rng.integers(1, 30))) for i in range(50)
+    }
+
+    group_stats_dict = replicate_summary.grouped_stats(group_value_dict)
+
+    assert list(group_stats_dict) == list(group_value_dict)
+    for group_key, value_list in group_value_dict.items():
+        count, mean, m2 = group_stats_dict[group_key]
+        assert count == len(value_list)
+        np.testing.assert_allclose(mean, np.mean(value_list), rtol=1e-12)
+        np.testing.assert_allclose(m2, np.var(value_list) * len(value_list), rtol=1e-9, atol=1e-12)
+        if count > 1:
+            assert_matches_full_recalculation((count, mean, m2), value_list)
+
+
+def store_schema(store_filename):
+    with sqlite3.connect(store_filename) as connection:
+        return sorted(connection.execute("SELECT name, sql FROM sqlite_master"))
+
+
+def test_reads_do_not_change_an_older_store(tmp_path):
+    store = replicate_summary.ReplicateSummary(str(tmp_path / "summary.txt"))
+    group_key = json.dumps([["excel_filename_wo_ext", "excel_file_0"]])
+
+    # an empty store file, and a store made before the running statistics were stored
+    open(store.store_filename, "w").close()
+    assert store.read_fingerprints() == {}
+    assert store.read_group_stats([group_key]) == {group_key: (None, {})}
+    assert store_schema(store.store_filename) == []
+
+    with sqlite3.connect(store.store_filename) as connection:
+        connection.execute(
+            "CREATE TABLE replicate_groups (group_key TEXT PRIMARY KEY, "
+            "excel_filename_wo_ext TEXT, member_fingerprint TEXT, "
+            "dot_product_avg REAL, dot_product_std_dev REAL)"
+        )
+        connection.execute(
+            "INSERT INTO replicate_groups VALUES (?, 'excel_file_0', 'fp', 1.0, 0.0)", (group_key,)
+        )
+    old_schema = store_schema(store.store_filename)
+
+    assert store.read_fingerprints() == {group_key: "fp"}
+    assert store.read_group_stats([group_key]) == {group_key: (None, {})}
+    assert store_schema(store.store_filename) == old_schema
+
+    # the schema is only migrated by a write
+    store.write_groups(
+        [(group_key, "excel_file_0", "fp_2", 2, 1.5, 0.5, 0.5 ** 0.5)],
+        [(group_key, {"job_0": (1, 2, 1.0), "job_1": (1, 2, 2.0)}, [])],
+    )
+    assert store_schema(store.store_filename) != old_schema
+    assert store.read_fingerprints() == {group_key: "fp_2"}
+    assert store.read_group_stats([group_key]) == {
+        group_key: ((2, 1.5, 0.5), {"job_0": (1, 2, 1.0), "job_1": (1, 2, 2.0)})
+    }
@@ -0,0 +1,81 @@
+"""The project's SQLite files are only written by one process at a time"""
+# test_sqlite_lock.py
+#
+# Run from the project directory with:
+#   python -m pytest tests
+
+import fcntl
+import multiprocessing
+import os
+import sqlite3
+
+import pytest
+
+import sqlite_lock
+import workspace_shards
+
+
+def connect_function(db_filename):
+    def connect():
+        connection = sqlite3.connect(db_filename)
+        connection.execute("CREATE TABLE IF NOT EXISTS t (v INTEGER)")
+        return connection
+
+    return connect
+
+
+def lock_is_free(db_filename, lock_operation):
+    lock_fd = os.open(f"{db_filename}.lock", os.O_RDWR)
+    try:
+        fcntl.flock(lock_fd, lock_operation | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+    finally:
+        os.close(lock_fd)
+
+
+def test_write_holds_the_exclusive_lock(tmp_path):
+    db_filename = str(tmp_path / "test.sqlite")
+    with sqlite_lock.locked_connection(db_filename, connect_function(db_filename)) as connection:
+        connection.execute("INSERT INTO t VALUES (1)")
+        assert not lock_is_free(db_filename, fcntl.LOCK_SH)
+
+    assert lock_is_free(db_filename, fcntl.LOCK_EX)
+    with sqlite_lock.locked_connection(
+        db_filename, connect_function(db_filename), write_bool=False
+    ) as connection:
+        assert connection.execute("SELECT v FROM t").fetchall() == [(1,)]
+        assert lock_is_free(db_filename, fcntl.LOCK_SH)
+        assert not lock_is_free(db_filename, fcntl.LOCK_EX)
+
+
+def test_write_is_rolled_back_on_an_exception(tmp_path):
+    db_filename = str(tmp_path / "test.sqlite")
+    with pytest.raises(ValueError):
+        with sqlite_lock.locked_connection(db_filename, connect_function(db_filename)) as connection:
+            connection.execute("INSERT INTO t VALUES (1)")
+            raise ValueError
+
+    with sqlite_lock.locked_connection(db_filename, connect_function(db_filename)) as connection:
+        assert connection.execute("SELECT v FROM t").fetchall() == []
+
+
+def update_shard_documents(project_path, process_i):
+    shards = workspace_shards.WorkspaceShards(project_path, 1)
+    for document_i in range(25):
+        shards.update_documents({f"{process_i:08x}{document_i:024x}": {"v": document_i}})
+
+
+def test_parallel_shard_writers_keep_every_document(tmp_path):
+    process_list = [
+        multiprocessing.Process(target=update_shard_documents, args=(str(tmp_path), process_i))
+        for process_i in range(8)
+    ]
+    for process in process_list:
+        process.start()
+    for process in process_list:
+        process.join()
+
+    assert all(process.exitcode == 0 for process in process_list)
+    assert len(workspace_shards.read_all_document_job_ids(str(tmp_path))) == 8 * 25
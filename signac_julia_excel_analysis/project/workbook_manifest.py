@@ -0,0 +1,98 @@
+"""Manifest of the Excel files used to initialize the project"""
+# workbook_manifest.py
+#
+# Records the name, size, mtime, content hash, replicate numbers, and any
+# multiplier vector, noise range, and parameter sweep statepoints of every
+# Excel file that jobs were created for, so the incremental 'init.py' mode
+# only creates (or resets) the jobs of the new or changed Excel files.
+
+import json
+import os
+
+from excel_cache import workbook_content_hash
+
+manifest_filename = "workbook_manifest.json"
+
+
+def load_manifest(project_path):
+    """Load the manifest, or an empty manifest if there is none yet."""
+    try:
+        with open(os.path.join(project_path, manifest_filename), "r") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(project_path, manifest_dict):
+    """Atomically write the manifest."""
+    write_filename = os.path.join(project_path, manifest_filename)
+    with open(f"{write_filename}.tmp", "w") as fp:
+        json.dump(manifest_dict, fp, indent=2, sort_keys=True)
+    os.replace(f"{write_filename}.tmp", write_filename)
+
+
+def diff_workbooks(
+    excel_directory, manifest_dict, replicate_number_list, extension=".xlsx",
+    statepoint_sweep_dict=None,
+):
+    """Compare the Excel files in a directory with the manifest.
+
+    The content hash of a file is only calculated if its size or mtime changed,
+    so unchanged files are only stat'ed.  The 'statepoint_sweep_dict' is the
+    multiplier vector, noise range, and parameter sweep statepoints (None if 
+    they are only the default values).
+
+    Returns
+    -------
+    (new_dict, changed_dict, unchanged_list, removed_list)
+        The new and changed dicts are the new manifest entries by
+        'excel_filename_wo_ext', and the lists are 'excel_filename_wo_ext' names.
+        A file whose replicate numbers (or statepoint sweep) changed is also
+        in the changed dict.
+    """
+    new_dict = {}
+    changed_dict = {}
+    unchanged_list = []
+    found_set = set()
+    with os.scandir(excel_directory) as it:
+        for entry in sorted(it, key=lambda e: e.name):
+            excel_filename_wo_ext, file_ext = os.path.splitext(entry.name)
+            if file_ext != extension or not entry.is_file():
+                continue
+            found_set.add(excel_filename_wo_ext)
+
+            entry_stat = entry.stat()
+            old_entry_dict = manifest_dict.get(excel_filename_wo_ext)
+            new_entry_dict = {
+                "size": entry_stat.st_size,
+                "mtime_ns": entry_stat.st_mtime_ns,
+                "sha256": None,
+                "replicate_number_list": sorted(replicate_number_list),
+            }
+            if statepoint_sweep_dict is not None:
+                new_entry_dict["statepoint_sweep"] = statepoint_sweep_dict
+            if (
+                old_entry_dict is not None
+                and old_entry_dict["size"] == entry_stat.st_size
+                and old_entry_dict["mtime_ns"] == entry_stat.st_mtime_ns
+            ):
+                new_entry_dict["sha256"] = old_entry_dict["sha256"]
+            else:
+                new_entry_dict["sha256"] = workbook_content_hash(entry.path)
+
+            if old_entry_dict is None:
+                new_dict[excel_filename_wo_ext] = new_entry_dict
+            elif (
+                old_entry_dict["sha256"] != new_entry_dict["sha256"]
+                or old_entry_dict["replicate_number_list"] != new_entry_dict["replicate_number_list"]
+                or old_entry_dict.get("statepoint_sweep") != new_entry_dict.get("statepoint_sweep")
+            ):
+                changed_dict[excel_filename_wo_ext] = new_entry_dict
+            else:
+                # keep the new mtime, so the file is not re-hashed next time
+                manifest_dict[excel_filename_wo_ext] = new_entry_dict
+                unchanged_list.append(excel_filename_wo_ext)
+
+    removed_list = sorted(set(manifest_dict) - found_set)
+
+    return new_dict, changed_dict, unchanged_list, removed_list
@@ -0,0 +1,224 @@
+"""Sharded container files for the job documents and the part_2 output files"""
+# workspace_shards.py
+#
+# On a parallel filesystem (Example: GPFS or Lustre), creating and stat'ing
+# many small files is slow, and the inode quota is often reached long before
+# the disk quota.  In the "sharded" workspace mode, each job's document
+# (the part_1 values) and part_2 output files are not kept as separate files
+# in the job's directory, but packed into one of a fixed number of SQLite
+# shard files in the project's 'workspace_shards' directory (a job's shard is
+# picked from its job id).
+#
+# signac still needs the job's directory and its 'signac_statepoint.json'
+# file, so the shards remove all the other per-job files.  The part_2
+# operations write their output files as usual, and they are packed into the
+# shard (and removed from the job's directory) as soon as the operation is
+# done, so the files only exist while the job is running.
+#
+# Each packed file keeps the mtime and size it had when it was packed, so the
+# results index/store and the replicate group fingerprints work the same way.
+#
+# Many jobs on many nodes pack their files at the same time, so each shard is
+# only written by one process at a time, while holding the shard's lock (see
+# the 'sqlite_lock.py' file), as SQLite's own locking is not reliable on a
+# network/parallel filesystem.
+
+import functools
+import glob
+import json
+import os
+import sqlite3
+
+import sqlite_lock
+
+# The shards directory name, which is stored in the project's directory.
+shards_directory_name = "workspace_shards"
+
+
+def shards_directory(project_path):
+    """Get the shards directory of a project."""
+    return os.path.join(project_path, shards_directory_name)
+
+
+def shard_index(job_id, shards_int):
+    """Get the shard index of a job id."""
+    return int(job_id[:8], 16) % shards_int
+
+
+def _connect(shard_filename):
+    os.makedirs(os.path.dirname(shard_filename), exist_ok=True)
+    connection = sqlite3.connect(shard_filename, timeout=60)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS job_documents ("
+        "job_id TEXT PRIMARY KEY, "
+        "document TEXT)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS job_files ("
+        "job_id TEXT, "
+        "filename TEXT, "
+        "content BLOB, "
+        "mtime_ns INTEGER, "
+        "size INTEGER, "
+        "PRIMARY KEY (job_id, filename))"
+    )
+    return connection
+
+
+def _locked_connection(shard_filename, write_bool=True):
+    """Open a shard while holding its lock (see the 'sqlite_lock.py' file)."""
+    return sqlite_lock.locked_connection(
+        shard_filename, functools.partial(_connect, shard_filename), write_bool
+    )
+
+
+def shard_filename_list(project_path):
+    """Get the file names of all the existing shards of a project."""
+    return sorted(glob.glob(os.path.join(shards_directory(project_path), "shard_*.sqlite")))
+
+
+class WorkspaceShards:
+    """The sharded job documents and files of a project.
+
+    Parameters
+    ----------
+    project_path : str
+        The project's directory.
+    shards_int : int
+        The number of shards (Example: the number of jobs / 1000).  Do not
+        change it after files are packed, as a job's shard depends on it.
+    """
+
+    def __init__(self, project_path, shards_int):
+        self.project_path = project_path
+        self.shards_int = shards_int
+
+    def shard_filename(self, job_id):
+        """Get the shard file name of a job."""
+        return os.path.join(
+            shards_directory(self.project_path),
+            f"shard_{shard_index(job_id, self.shards_int):05d}.sqlite",
+        )
+
+    def _shard_job_ids(self, job_ids):
+        """Get the {shard file name: [job ids]} of the jobs."""
+        shard_job_ids_dict = {}
+        for job_id in job_ids:
+            shard_job_ids_dict.setdefault(self.shard_filename(job_id), []).append(job_id)
+
+        return shard_job_ids_dict
+
+    def read_document(self, job_id):
+        """Get a job's document as a dict (None if it is not in the shard)."""
+        if not os.path.isfile(self.shard_filename(job_id)):
+            return None
+        with _locked_connection(self.shard_filename(job_id), write_bool=False) as connection:
+            row = connection.execute(
+                "SELECT document FROM job_documents WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def update_documents(self, job_document_dict):
+        """Update the documents of the jobs ({job_id: dict of the values to set})."""
+        for shard_filename, job_id_list in self._shard_job_ids(job_document_dict).items():
+            with _locked_connection(shard_filename) as connection:
+                for job_id in job_id_list:
+                    row = connection.execute(
+                        "SELECT document FROM job_documents WHERE job_id = ?", (job_id,)
+                    ).fetchone()
+                    document = {} if row is None else json.loads(row[0])
+                    document.update(job_document_dict[job_id])
+                    connection.execute(
+                        "INSERT OR REPLACE INTO job_documents VALUES (?, ?)",
+                        (job_id, json.dumps(document)),
+                    )
+
+    def read_file(self, job_id, filename):
+        """Get the (content, mtime_ns, size) of a job's packed file (None if not packed)."""
+        if not os.path.isfile(self.shard_filename(job_id)):
+            return None
+        with _locked_connection(self.shard_filename(job_id), write_bool=False) as connection:
+            return connection.execute(
+                "SELECT content, mtime_ns, size FROM job_files WHERE job_id = ? AND filename = ?",
+                (job_id, filename),
+            ).fetchone()
+
+    def pack_files(self, jobs, filename_list):
+        """Move the jobs' files (that exist) into their shards."""
+        job_dict = {job.id: job for job in jobs}
+        for shard_filename, job_id_list in self._shard_job_ids(job_dict).items():
+            packed_filename_list = []
+            with _locked_connection(shard_filename) as connection:
+                for job_id in job_id_list:
+                    for filename in filename_list:
+                        job_filename = job_dict[job_id].fn(filename)
+                        try:
+                            file_stat = os.stat(job_filename)
+                            with open(job_filename, "rb") as fp:
+                                content = fp.read()
+                        except FileNotFoundError:
+                            continue
+                        connection.execute(
+                            "INSERT OR REPLACE INTO job_files VALUES (?, ?, ?, ?, ?)",
+                            (job_id, filename, content, file_stat.st_mtime_ns, file_stat.st_size),
+                        )
+                        packed_filename_list.append(job_filename)
+
+            # only remove the files once they are committed to the shard
+            for job_filename in packed_filename_list:
+                os.remove(job_filename)
+
+    def unpack(self, job):
+        """Move a job's document and files from its shard back into the job's directory."""
+        document = self.read_document(job.id)
+        if document is not None:
+            job.doc.update(document)
+        if not os.path.isfile(self.shard_filename(job.id)):
+            return
+        with _locked_connection(self.shard_filename(job.id)) as connection:
+            for filename, content, mtime_ns in connection.execute(
+                "SELECT filename, content, mtime_ns FROM job_files WHERE job_id = ?", (job.id,)
+            ).fetchall():
+                with open(job.fn(filename), "wb") as fp:
+                    fp.write(content)
+                # keep the mtime, so the results index/store stay up to date
+                os.utime(job.fn(filename), ns=(mtime_ns, mtime_ns))
+            connection.execute("DELETE FROM job_documents WHERE job_id = ?", (job.id,))
+            connection.execute("DELETE FROM job_files WHERE job_id = ?", (job.id,))
+
+
+def read_all_document_job_ids(project_path):
+    """Get the set of job ids with a document in any shard."""
+    job_id_set = set()
+    for shard_filename in shard_filename_list(project_path):
+        with _locked_connection(shard_filename, write_bool=False) as connection:
+            job_id_set.update(j for (j,) in connection.execute("SELECT job_id FROM job_documents"))
+
+    return job_id_set
+
+
+def read_all_files(project_path, filename):
+    """Get the {job_id: (content, mtime_ns, size)} of a packed file name in all the shards."""
+    job_file_dict = {}
+    for shard_filename in shard_filename_list(project_path):
+        with _locked_connection(shard_filename, write_bool=False) as connection:
+            for job_id, content, mtime_ns, size in connection.execute(
+                "SELECT job_id, content, mtime_ns, size FROM job_files WHERE filename = ?",
+                (filename,),
+            ):
+                job_file_dict[job_id] = (content, mtime_ns, size)
+
+    return job_file_dict
+
+
+def forget(project_path, job_id_list):
+    """Remove the jobs' documents and files from every shard (Example: a reset job)."""
+    for shard_filename in shard_filename_list(project_path):
+        with _locked_connection(shard_filename) as connection:
+            connection.executemany(
+                "DELETE FROM job_documents WHERE job_id = ?", [(j,) for j in job_id_list]
+            )
+            connection.executemany(
+                "DELETE FROM job_files WHERE job_id = ?", [(j,) for j in job_id_list]
+            )